@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Apply Prediction Artifacts to PostGIS
+
+Loads a prediction artifact into <schema>.graphsage_predictions. The
+artifact names nodes by the vertex ids of the export the predictions were
+made on. If the schema still has exactly those vertices in the same places,
+the rows are written as they are. If the schema has been re-noded since the
+export, every current vertex is instead matched by position to the nearest
+predicted node within the tolerance (spatial_index.py) and takes its
+prediction and confidence. Vertices with no predicted node nearby get no
+row.
+
+The export's coordinates come from --dataset, or from the `source_path` the
+trainers record in the artifact's sidecar. --output also writes the mapped
+predictions, keyed by the schema's current vertex ids, as a new artifact;
+with --dry-run that is the only thing written.
+
+Usage:
+    python scripts/graphsage/apply_predictions.py test-output/high_confidence_graphsage_predictions.gspred carthorse_staging
+    python scripts/graphsage/apply_predictions.py predictions.gspred carthorse_staging --dataset export.json --tolerance-m 2 --dry-run
+    python scripts/graphsage/apply_predictions.py predictions.gspred carthorse_staging --dry-run --output mapped.gspred
+"""
+
+import argparse
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from prediction_artifact import read_prediction_artifact, write_prediction_artifact
+from spatial_index import DEFAULT_TOLERANCE_M, dataset_nodes, mapping_report, match_nodes, unchanged_rows
+from train_graphsage_direct import PostGISGraphLoader, write_predictions
+
+def artifact_coordinates(arrays: Dict[str, np.ndarray], sidecar: Dict[str, Any],
+                         dataset_path: Optional[str] = None) -> np.ndarray:
+    """[N, 2] lon/lat of an artifact's rows, read from the dataset the predictions were made on"""
+    path = dataset_path or sidecar.get('metadata', {}).get('source_path')
+    if path is None:
+        raise ValueError("The artifact does not record its dataset, pass --dataset")
+    node_ids, lon_lat = dataset_nodes(path)
+    if not np.array_equal(node_ids, arrays['node_id']):
+        raise ValueError(f"{path} does not hold the nodes these predictions were made on")
+    return lon_lat
+
+def map_predictions(node_ids: np.ndarray, lon_lat: np.ndarray, vertex_ids: np.ndarray,
+                    vertex_lon_lat: np.ndarray, tolerance_m: float = DEFAULT_TOLERANCE_M) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Artifact row for every current vertex (-1 if none), by id while the
+    vertices are unchanged and by position otherwise, plus a report.
+    """
+    rows = unchanged_rows(node_ids, lon_lat, vertex_ids, vertex_lon_lat, tolerance_m)
+    if rows is not None:
+        return rows, {'remapped': False, 'matched': int(len(rows)), 'unmatched': 0}
+    matched, distance_m = match_nodes(lon_lat, vertex_lon_lat, tolerance_m)
+    return matched, {'remapped': True, **mapping_report(matched, distance_m, node_ids, vertex_ids)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Load a prediction artifact into a schema, remapping re-noded vertices')
+    parser.add_argument('artifact', help='Prediction artifact (.gspred)')
+    parser.add_argument('schema', help='PostGIS schema name')
+    parser.add_argument('--dataset', default=None, help='Export or binary dataset the predictions were made on (default: recorded in the artifact)')
+    parser.add_argument('--tolerance-m', type=float, default=DEFAULT_TOLERANCE_M, help='Match tolerance in meters for re-noded vertices')
+    parser.add_argument('--dry-run', action='store_true', help='Report the mapping without writing predictions')
+    parser.add_argument('--output', default=None, help='Also write the mapped predictions to this artifact')
+    parser.add_argument('--swap-predictions', action='store_true', help='Load predictions into a new table and swap it in atomically')
+    parser.add_argument('--host', default='localhost', help='Database host')
+    parser.add_argument('--port', default='5432', help='Database port')
+    parser.add_argument('--database', default='trail_master_db', help='Database name')
+    parser.add_argument('--user', default='postgres', help='Database user')
+    parser.add_argument('--password', default=None, help='Database password (default: PGPASSWORD)')
+    args = parser.parse_args()
+
+    arrays, sidecar = read_prediction_artifact(args.artifact)
+    lon_lat = artifact_coordinates(arrays, sidecar, args.dataset)
+    print(f"📁 {len(lon_lat)} predictions from {args.artifact}")
+
+    loader = PostGISGraphLoader({
+        'host': args.host,
+        'port': args.port,
+        'database': args.database,
+        'user': args.user,
+        'password': args.password
+    })
+    try:
+        loader.connect()
+        vertices = loader.copy_query_to_array(loader.vertex_query(args.schema), 4)
+        vertex_ids = vertices[:, 0].astype(np.int64)
+
+        start = time.time()
+        rows, report = map_predictions(arrays['node_id'], lon_lat, vertex_ids, vertices[:, 1:3], args.tolerance_m)
+        if report['remapped']:
+            print(f"🔀 {args.schema} has changed since the export, matched {report['matched']}/{len(vertex_ids)} "
+                  f"vertices within {args.tolerance_m} m ({time.time() - start:.2f}s)")
+            print(f"   • Unmatched: {report['unmatched']}")
+            print(f"   • Matched under a different id: {report['renumbered']}")
+            print(f"   • Largest match distance: {report['max_distance_m']:.3f} m")
+        else:
+            print(f"✅ {args.schema} has the exported vertices, applying predictions by id")
+
+        found = rows >= 0
+        if args.output:
+            write_prediction_artifact(args.output, arrays['probabilities'][rows[found]], vertex_ids[found],
+                                      {'schema': args.schema, 'source_artifact': args.artifact,
+                                       'remapped': report['remapped'], 'tolerance_m': args.tolerance_m},
+                                      class_names=sidecar.get('class_names'),
+                                      predictions=arrays['prediction'][rows[found]])
+            print(f"💾 Mapped predictions saved to: {args.output}")
+        if args.dry_run:
+            print(f"🧪 Dry run, nothing written to {args.schema}")
+            return
+        write_predictions(loader.connection, args.schema, vertex_ids[found], arrays['prediction'][rows[found]],
+                          arrays['confidence'][rows[found]], args.swap_predictions)
+        print(f"💾 Saved {int(found.sum())} predictions to {args.schema}.graphsage_predictions")
+    finally:
+        loader.disconnect()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Batch GraphSAGE Prediction Across Schemas and Regions
+
+Predicts many staging schemas and/or exported regions in one command. A
+process pool loads the model once per worker and keeps one database
+connection per worker, so each target only pays for its own graph load,
+forward pass and write-back. Schemas get their graphsage_predictions table
+replaced with one COPY; export files get a prediction artifact (.gspred) in
+the output directory. A failing target is reported and the rest of the batch goes on.
+
+Targets that look like paths are read as JSON exports or binary datasets,
+anything else is treated as a schema name. Export predictions are named
+after the file, with as many parent directories as it takes to keep exports
+of the same name apart (a/seattle.json and b/seattle.json write
+a_seattle_predictions.gspred and b_seattle_predictions.gspred). The model is a trainer's state
+dict (.pth) or a TorchScript export from export_model.py.
+
+Usage:
+    python scripts/graphsage/batch_predict.py --model output/model.pth staging_boulder staging_denver exports/seattle.json
+    python scripts/graphsage/batch_predict.py --model output/model.int8.pt --targets-file schemas.txt --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import torch
+
+from graph_preprocess import canonical_edges, load_canonical_arrays
+from graphsage_runtime import GraphSAGERuntime
+from model_io import load_model, class_probabilities
+from prediction_artifact import write_prediction_artifact
+from train_distributed import MODEL_CHOICES
+from train_graphsage_direct import PostGISGraphLoader, FEATURE_MODES, write_predictions
+
+# Per-worker state set up by the pool initializer
+_predict = None
+_loader: Optional[PostGISGraphLoader] = None
+_settings: Dict[str, Any] = {}
+
+def load_predictor(model_path: str, model_type: Optional[str] = None):
+    """predict(x, edge_index) -> [N, C] probabilities for a state dict or an exported model"""
+    if os.path.exists(f"{model_path}.json"):
+        return GraphSAGERuntime(model_path).predict_proba
+
+    model, info = load_model(model_path, model_type)
+
+    @torch.no_grad()
+    def predict(x: np.ndarray, edge_index: np.ndarray, canonical: bool = False) -> np.ndarray:
+        if not canonical:
+            edge_index, _, _ = canonical_edges(edge_index, len(x))
+        out = model(torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32)),
+                    torch.from_numpy(np.ascontiguousarray(edge_index, dtype=np.int64)))
+        return class_probabilities(out, info['model']).numpy()
+    return predict
+
+def is_file_target(target: str) -> bool:
+    """Paths (existing or not) are exports; bare identifiers are schema names"""
+    return os.path.exists(target) or os.sep in target or target.endswith(('.json', '.graphsage'))
+
+def output_names(file_targets: List[str]) -> Dict[str, str]:
+    """
+    Prediction file stem of each export target: its file name without the
+    extension, prefixed with parent directories until it is unique. Targets
+    naming the same file get the same stem.
+    """
+    parts = {}
+    for target in file_targets:
+        path = os.path.normpath(os.path.abspath(target.rstrip(os.sep))).split(os.sep)
+        parts[target] = [part for part in path[:-1] if part] + [os.path.splitext(path[-1])[0]]
+
+    names = {}
+    by_stem: Dict[str, List[str]] = {}
+    for target in file_targets:
+        by_stem.setdefault(parts[target][-1], []).append(target)
+    for stem, group in by_stem.items():
+        distinct = len({tuple(parts[target]) for target in group})
+        depth = 1
+        while len({tuple(parts[target][-depth:]) for target in group}) < distinct:
+            depth += 1
+        for target in group:
+            names[target] = '_'.join(parts[target][-depth:])
+
+    # A prefixed stem can still match another export's plain one (a/seattle.json, a_seattle.json)
+    paths_by_name: Dict[str, set] = {}
+    for target, name in names.items():
+        paths_by_name.setdefault(name, set()).add(tuple(parts[target]))
+    for target in file_targets:
+        if len(paths_by_name[names[target]]) > 1:
+            names[target] = '_'.join(parts[target])
+    return names
+
+def _init_worker(model_path: str, model_type: Optional[str], threads: int, settings: Dict[str, Any]):
+    global _predict, _settings
+    torch.set_num_threads(threads)
+    _predict = load_predictor(model_path, model_type)
+    _settings = settings
+
+def _connection() -> PostGISGraphLoader:
+    global _loader
+    if _loader is None or _loader.connection is None or _loader.connection.closed:
+        _loader = PostGISGraphLoader(_settings['db_config'])
+        _loader.connect()
+    return _loader
+
+def predict_target(target: str, output_name: Optional[str] = None) -> Dict[str, Any]:
+    """Load, predict and write back one schema or export in this worker; never raises"""
+    row = {'target': target, 'kind': 'file' if is_file_target(target) else 'schema', 'pid': os.getpid()}
+    try:
+        start = time.time()
+        if row['kind'] == 'file':
+            arrays, _ = load_canonical_arrays(target, verbose=False)
+            x, edge_index = arrays['x'], np.asarray(arrays['edge_index'])
+            node_ids = np.asarray(arrays['node_id']) if 'node_id' in arrays else np.arange(len(x))
+        else:
+            node_ids, x, edge_index = _connection().load_topology(target, _settings['feature_mode'])
+        row['load_time'] = time.time() - start
+
+        start = time.time()
+        # Exports and load_topology() both yield canonical edge lists
+        probabilities = _predict(x, edge_index, canonical=True)
+        predictions = probabilities.argmax(axis=1)
+        confidences = probabilities.max(axis=1)
+        row['inference_time'] = time.time() - start
+
+        start = time.time()
+        if row['kind'] == 'file':
+            name = output_name or os.path.splitext(os.path.basename(target.rstrip(os.sep)))[0]
+            row['output'] = os.path.join(_settings['output_dir'], f"{name}_predictions.gspred")
+            write_prediction_artifact(row['output'], probabilities, node_ids, {
+                'source_path': os.path.abspath(target),
+                'num_nodes': int(len(predictions)),
+            })
+        else:
+            write_predictions(_connection().connection, target, node_ids, predictions, confidences,
+                              atomic_swap=_settings['atomic_swap'])
+            row['output'] = f"{target}.graphsage_predictions"
+        row['write_time'] = time.time() - start
+
+        total = row['load_time'] + row['inference_time'] + row['write_time']
+        row.update({
+            'status': 'ok',
+            'num_nodes': int(len(predictions)),
+            'num_edges': int(edge_index.shape[1]),
+            'split_predictions': int((predictions == 2).sum()),
+            'total_time': total,
+            'nodes_per_sec': len(predictions) / max(total, 1e-9),
+        })
+    except Exception as e:
+        row.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()})
+        if _loader is not None and _loader.connection is not None and not _loader.connection.closed:
+            _loader.connection.rollback()
+    return row
+
+def print_summary(rows: List[Dict[str, Any]], wall_time: float):
+    """Per-target throughput table and batch totals"""
+    print(f"\n📊 Batch prediction summary:")
+    print(f"   {'target':<32} {'nodes':>9} {'load':>7} {'infer':>7} {'write':>7} {'nodes/sec':>10}  status")
+    for row in rows:
+        if row['status'] == 'ok':
+            print(f"   {row['target'][-32:]:<32} {row['num_nodes']:>9} {row['load_time']:>6.2f}s "
+                  f"{row['inference_time']:>6.2f}s {row['write_time']:>6.2f}s {row['nodes_per_sec']:>10.0f}  ✅")
+        else:
+            print(f"   {row['target'][-32:]:<32} {'-':>9} {'-':>7} {'-':>7} {'-':>7} {'-':>10}  ❌ {row['error']}")
+
+    done = [row for row in rows if row['status'] == 'ok']
+    total_nodes = sum(row['num_nodes'] for row in done)
+    print(f"\n⏱️  {len(done)}/{len(rows)} targets, {total_nodes} nodes in {wall_time:.1f}s "
+          f"({total_nodes / max(wall_time, 1e-9):.0f} nodes/sec overall)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Predict many schemas / exports in parallel with one model')
+    parser.add_argument('targets', nargs='*', help='Schema names or export / binary dataset paths')
+    parser.add_argument('--targets-file', default=None, help='File with one target per line')
+    parser.add_argument('--model', required=True, help='Saved state dict (.pth) or TorchScript export (.pt)')
+    parser.add_argument('--model-type', choices=MODEL_CHOICES, default=None, help='Trainer architecture (inferred for intersection models)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: cores / threads per worker)')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='Torch threads per worker process')
+    parser.add_argument('--feature-mode', choices=FEATURE_MODES, default='bincount', help='Node feature extraction for schemas')
+    parser.add_argument('--swap-predictions', action='store_true', help='Load each schema\'s predictions into a new table and swap it in atomically')
+    parser.add_argument('--output-dir', default='test-output/batch-predictions', help='Output directory for export predictions and the summary')
+    parser.add_argument('--host', default='localhost', help='Database host')
+    parser.add_argument('--port', default='5432', help='Database port')
+    parser.add_argument('--database', default='trail_master_db', help='Database name')
+    parser.add_argument('--user', default='postgres', help='Database user')
+    parser.add_argument('--password', default='', help='Database password')
+
+    args = parser.parse_args()
+
+    targets = list(args.targets)
+    if args.targets_file:
+        with open(args.targets_file) as f:
+            targets.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    # A target listed twice would be predicted twice, racing for the same output
+    targets = list(dict.fromkeys(targets))
+    if not targets:
+        parser.error('no targets given')
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return
+
+    # Convert JSON exports and build their canonical graphs once here rather than racing in the workers
+    for target in targets:
+        if os.path.exists(target):
+            try:
+                load_canonical_arrays(target)
+            except Exception as e:
+                print(f"⚠️  Could not prepare {target}: {e}")
+
+    names = output_names([target for target in targets if is_file_target(target)])
+    os.makedirs(args.output_dir, exist_ok=True)
+    settings = {
+        'db_config': {
+            'host': args.host,
+            'port': args.port,
+            'database': args.database,
+            'user': args.user,
+            'password': args.password
+        },
+        'feature_mode': args.feature_mode,
+        'atomic_swap': args.swap_predictions,
+        'output_dir': args.output_dir,
+    }
+
+    workers = min(len(targets), args.workers or max(1, (os.cpu_count() or 1) // args.threads_per_worker))
+    print(f"🚀 Predicting {len(targets)} targets on {workers} workers...")
+
+    start = time.time()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(args.model, args.model_type, args.threads_per_worker, settings)) as pool:
+        futures = {pool.submit(predict_target, target, names.get(target)): target for target in targets}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                row = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory or a failed model load)
+                row = {'target': futures[future], 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            rows.append(row)
+            if row['status'] == 'ok':
+                print(f"   ✅ [{done}/{len(targets)}] {row['target']}: {row['num_nodes']} nodes, "
+                      f"{row['nodes_per_sec']:.0f} nodes/sec")
+            else:
+                print(f"   ❌ [{done}/{len(targets)}] {row['target']}: {row['error']}")
+    wall_time = time.time() - start
+
+    rows.sort(key=lambda row: targets.index(row['target']))
+    print_summary(rows, wall_time)
+
+    summary_path = os.path.join(args.output_dir, 'batch_predictions_summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump({'model': os.path.abspath(args.model), 'workers': workers, 'wall_time': wall_time, 'results': rows}, f, indent=2)
+    print(f"💾 Summary saved to: {summary_path}")
+
+    failures = sum(row['status'] != 'ok' for row in rows)
+    if failures:
+        print(f"⚠️  {failures} targets failed")
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for the Python Tools
+
+Times the data, training and export paths on synthetic trail networks
+(synthetic_trails.py) at several sizes:
+- load_graphsage_data from a JSON export (cold conversion and cached) and
+  from a binary dataset
+- PostGISGraphLoader bulk and legacy loads against an in-process stand-in
+  that serves the loader's own queries from the synthetic graph, so the
+  client-side parsing and aggregation are measured without a database
+- one full-graph training epoch of every trainer's model
+- prediction saving as a prediction artifact and as a COPY buffer for write_predictions
+- extract-routes.py on a synthetic route_recommendations database
+- calculate_path_length.py on a long MultiLineString
+
+Results are written as JSON. Given --baseline, each timing is compared with
+the baseline's median for the same benchmark and size, and the run exits
+non-zero on a regression. A missing baseline file, or --update-baseline,
+writes this run as the new baseline.
+
+Usage:
+    python scripts/graphsage/benchmark_suite.py --sizes 1000 10000 100000 --baseline test-output/benchmarks/baseline.json
+    python scripts/graphsage/benchmark_suite.py --sizes 1000000 10000000 --only loader train --repeats 1
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Callable, Optional
+
+import numpy as np
+import torch
+
+import train_graphsage
+import train_intersection_graphsage
+from graph_dataset import write_binary_dataset
+from node_features import incident_edge_stats
+from prediction_artifact import read_prediction_artifact, sidecar_path
+from synthetic_trails import (generate_trail_network, training_arrays, dataset_metadata, write_json_export,
+                              write_routes_db, multilinestring)
+from train_distributed import MODEL_CHOICES, build_model, load_training_graph
+from train_graphsage_direct import PostGISGraphLoader, write_predictions, predictions_copy_buffer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RESULTS_FORMAT_VERSION = 1
+STAND_IN_SCHEMA = 'synthetic'
+
+def load_repo_script(filename: str):
+    """Import a script from the repository root by file name (they are not packages)"""
+    path = os.path.join(REPO_ROOT, filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0].replace('-', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class StandInCursor:
+    def __init__(self, connection: 'StandInConnection'):
+        self.connection = connection
+        self.rows = None
+
+    def execute(self, query: str, params=None):
+        self.rows = self.connection.rows_for(query)
+
+    def fetchall(self):
+        return self.rows
+
+    def copy_expert(self, sql: str, stream):
+        if sql.startswith('COPY (') and sql.endswith(') TO STDOUT'):
+            stream.write(self.connection.copy_text_for(sql[len('COPY ('):-len(') TO STDOUT')]))
+        else:
+            # COPY ... FROM STDIN: consume the client's buffer like the server would
+            self.connection.copied_bytes += len(stream.read())
+
+    def close(self):
+        pass
+
+class StandInConnection:
+    """
+    psycopg2-like connection answering PostGISGraphLoader's queries for one
+    synthetic graph. Results are rendered once and reused, so timings cover
+    the client side only.
+    """
+
+    closed = 0
+
+    def __init__(self, graph: Dict[str, np.ndarray], schema: str = STAND_IN_SCHEMA):
+        self.graph = graph
+        self.loader = PostGISGraphLoader({})
+        self.schema = schema
+        self.copied_bytes = 0
+        self._text: Dict[str, bytes] = {}
+        self._rows: Dict[str, list] = {}
+
+    def _result(self, query: str) -> np.ndarray:
+        graph = self.graph
+        loader = self.loader
+        if query == loader.vertex_query(self.schema):
+            return np.column_stack([graph['node_id'], graph['coords']])
+        if query == loader.edge_stats_query(self.schema):
+            return np.column_stack([graph['source'], graph['target'], graph['length_km'], np.ones(len(graph['source']))])
+        if query == loader.edge_query(self.schema):
+            edges = np.column_stack([graph['source'], graph['target']])
+            return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+        if query in (loader.node_feature_query(self.schema, mode) for mode in ('legacy', 'union')):
+            degree, avg_length = incident_edge_stats(graph['node_id'], graph['source'], graph['target'], graph['length_km'])
+            return np.column_stack([graph['node_id'], graph['coords'], degree, avg_length])
+        raise ValueError(f"Stand-in has no result for query: {query.strip()[:80]}")
+
+    def _integer_columns(self, query: str) -> int:
+        return 2 if query == self.loader.edge_query(self.schema) else 1
+
+    def copy_text_for(self, query: str) -> bytes:
+        if query not in self._text:
+            result = self._result(query)
+            integer_columns = self._integer_columns(query)
+            formats = ['%d'] * integer_columns + ['%.17g'] * (result.shape[1] - integer_columns)
+            text = io.BytesIO()
+            np.savetxt(text, result, fmt=formats, delimiter='\t')
+            self._text[query] = text.getvalue()
+        return self._text[query]
+
+    def rows_for(self, query: str):
+        if query.lstrip().startswith(('CREATE', 'DELETE', 'DROP', 'ALTER')):
+            return None
+        if query not in self._rows:
+            integer_columns = self._integer_columns(query)
+            self._rows[query] = [tuple(map(int, row[:integer_columns])) + tuple(row[integer_columns:])
+                                 for row in self._result(query).tolist()]
+        return self._rows[query]
+
+    def cursor(self) -> StandInCursor:
+        return StandInCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def time_call(fn: Callable, repeats: int, setup: Optional[Callable] = None, warmup: bool = True) -> Dict[str, float]:
+    """Median and min wall time of `fn()` over `repeats` runs, with its output silenced"""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        if warmup:
+            if setup:
+                setup()
+            fn()
+        for _ in range(repeats):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return {'median_s': float(np.median(times)), 'min_s': float(np.min(times)), 'repeats': repeats}
+
+def prepare_inputs(num_nodes: int, seed: int, work_dir: str, json_max_nodes: int) -> Dict[str, Any]:
+    """Generate (or reuse) the synthetic graph and its dataset, JSON export and route database"""
+    graph = generate_trail_network(num_nodes, seed)
+    base = os.path.join(work_dir, f"synthetic-{num_nodes}-{seed}")
+    inputs = {'graph': graph, 'dataset': f"{base}.graphsage", 'json': None,
+              'routes_db': f"{base}-routes.db", 'num_routes': int(np.clip(num_nodes // 100, 10, 5000))}
+
+    if not os.path.exists(inputs['dataset']):
+        arrays = training_arrays(graph, seed)
+        write_binary_dataset(arrays, dataset_metadata(arrays, seed), inputs['dataset'])
+    if num_nodes <= json_max_nodes:
+        inputs['json'] = f"{base}.json"
+        if not os.path.exists(inputs['json']):
+            arrays = training_arrays(graph, seed)
+            write_json_export(arrays, dataset_metadata(arrays, seed), inputs['json'])
+    if not os.path.exists(inputs['routes_db']):
+        write_routes_db(graph, inputs['routes_db'], inputs['num_routes'], seed)
+    return inputs
+
+def run_benchmarks(num_nodes: int, inputs: Dict[str, Any], args, selected: Callable[[str], bool],
+                   work_dir: str) -> List[Dict[str, Any]]:
+    """All selected benchmarks for one graph size"""
+    graph = inputs['graph']
+    results = []
+
+    def record(name: str, timing: Dict[str, float], items: int, unit: str):
+        row = {'name': name, 'nodes': num_nodes, **timing, 'items': items, 'unit': unit,
+               'items_per_sec': items / max(timing['median_s'], 1e-12)}
+        results.append(row)
+        print(f"   • {name:<62} {timing['median_s'] * 1000:>10.1f} ms  "
+              f"({row['items_per_sec']:,.0f} {unit}/sec)")
+
+    # load_graphsage_data
+    if selected('load_graphsage_data'):
+        cache_root = tempfile.mkdtemp(prefix='graphsage-bench-cache-', dir=work_dir)
+        previous_cache = os.environ.get('CARTHORSE_GRAPHSAGE_CACHE')
+        try:
+            for trainer in (train_graphsage, train_intersection_graphsage):
+                label = trainer.__name__
+                load = lambda path: trainer.load_graphsage_data(path)
+                if inputs['json']:
+                    def fresh_cache():
+                        shutil.rmtree(cache_root, ignore_errors=True)
+                        os.environ['CARTHORSE_GRAPHSAGE_CACHE'] = cache_root
+                    record(f"load_graphsage_data[{label},json-cold]",
+                           time_call(lambda: load(inputs['json']), args.repeats, setup=fresh_cache),
+                           num_nodes, 'nodes')
+                    record(f"load_graphsage_data[{label},json-cached]",
+                           time_call(lambda: load(inputs['json']), args.repeats), num_nodes, 'nodes')
+                record(f"load_graphsage_data[{label},binary]",
+                       time_call(lambda: load(inputs['dataset']), args.repeats), num_nodes, 'nodes')
+        finally:
+            shutil.rmtree(cache_root, ignore_errors=True)
+            if previous_cache is None:
+                os.environ.pop('CARTHORSE_GRAPHSAGE_CACHE', None)
+            else:
+                os.environ['CARTHORSE_GRAPHSAGE_CACHE'] = previous_cache
+
+    # PostGISGraphLoader against the stand-in connection
+    if selected('loader'):
+        loader = PostGISGraphLoader({})
+        loader.connection = StandInConnection(graph)
+        record('loader.load_graph_data_bulk[bincount]',
+               time_call(lambda: loader.load_graph_data_bulk(STAND_IN_SCHEMA, 'bincount'), args.repeats),
+               num_nodes, 'nodes')
+        record('loader.load_graph_data_bulk[union]',
+               time_call(lambda: loader.load_graph_data_bulk(STAND_IN_SCHEMA, 'union'), args.repeats),
+               num_nodes, 'nodes')
+        if num_nodes <= args.legacy_max_nodes:
+            record('loader.load_graph_data[legacy]',
+                   time_call(lambda: loader.load_graph_data(STAND_IN_SCHEMA, 'legacy'), args.repeats),
+                   num_nodes, 'nodes')
+
+    # One full-graph epoch per trainer model
+    if selected('train') and num_nodes <= args.train_max_nodes:
+        data = load_training_graph(inputs['dataset'])
+        num_features, num_classes = data.num_node_features, 3
+        for name in MODEL_CHOICES:
+            torch.manual_seed(0)
+            model, loss_fn = build_model(name, num_features, num_classes, args.hidden_dim)
+            optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+            model.train()
+
+            def epoch():
+                optimizer.zero_grad()
+                out = model(data.x, data.edge_index)
+                loss = loss_fn(out[data.train_mask], data.y[data.train_mask])
+                loss.backward()
+                optimizer.step()
+            record(f"train_epoch[{name}]", time_call(epoch, args.repeats), num_nodes, 'nodes')
+
+    # Prediction saving
+    if selected('save_predictions'):
+        rng = np.random.default_rng(0)
+        probabilities = rng.dirichlet(np.ones(3), size=num_nodes).astype(np.float32)
+        predictions = probabilities.argmax(axis=1)
+        confidences = probabilities.max(axis=1)
+        output_path = os.path.join(work_dir, 'bench_predictions.gspred')
+        metadata = {'num_nodes': num_nodes, 'num_edges': int(len(graph['source']))}
+        record('save_predictions[graphsage,gspred]',
+               time_call(lambda: train_graphsage.save_predictions(probabilities, output_path, metadata,
+                                                                   graph['node_id']), args.repeats),
+               num_nodes, 'nodes')
+        record('save_predictions[intersection,gspred]',
+               time_call(lambda: train_intersection_graphsage.save_predictions(
+                   torch.from_numpy(probabilities), metadata, output_path, graph['node_id']), args.repeats),
+               num_nodes, 'nodes')
+        record('read_prediction_artifact',
+               time_call(lambda: read_prediction_artifact(output_path, mmap=False), args.repeats),
+               num_nodes, 'nodes')
+        record('predictions_copy_buffer',
+               time_call(lambda: predictions_copy_buffer(graph['node_id'], predictions, confidences), args.repeats),
+               num_nodes, 'nodes')
+        connection = StandInConnection(graph)
+        record('write_predictions[stand-in]',
+               time_call(lambda: write_predictions(connection, STAND_IN_SCHEMA, graph['node_id'], predictions,
+                                                   confidences), args.repeats),
+               num_nodes, 'nodes')
+        os.remove(output_path)
+        os.remove(sidecar_path(output_path))
+
+    # extract-routes.py
+    if selected('extract_routes'):
+        extract_routes = load_repo_script('extract-routes.py').extract_routes
+        output_path = os.path.join(work_dir, 'bench_routes.geojson')
+        record('extract_routes',
+               time_call(lambda: extract_routes(inputs['routes_db'], output_path), args.repeats),
+               inputs['num_routes'], 'routes')
+        os.remove(output_path)
+
+    # calculate_path_length.py
+    if selected('calculate_path_length'):
+        calculate_path_length = load_repo_script('calculate_path_length.py').calculate_path_length
+        num_trails = int(max(1, min(num_nodes, args.path_max_points) // 8))
+        geometry = multilinestring(graph, num_trails, np.random.default_rng(0))
+        num_points = sum(len(line) for line in geometry['coordinates'])
+        record('calculate_path_length',
+               time_call(lambda: calculate_path_length(geometry), args.repeats),
+               num_points, 'points')
+
+    return results
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'git_commit': commit,
+    }
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float,
+                          min_seconds: float) -> List[str]:
+    """Benchmarks whose median got slower than the baseline by more than `threshold` and `min_seconds`"""
+    previous = {(row['name'], row['nodes']): row for row in baseline.get('results', [])}
+    regressions = []
+    for row in results:
+        base = previous.get((row['name'], row['nodes']))
+        if base is None:
+            continue
+        before, after = base['median_s'], row['median_s']
+        if after > before * (1 + threshold) and after - before > min_seconds:
+            regressions.append(f"{row['name']} @ {row['nodes']} nodes: {before * 1000:.1f} ms -> "
+                               f"{after * 1000:.1f} ms (+{100 * (after - before) / before:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the GraphSAGE Python tools on synthetic trail networks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Graph sizes in vertices')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic graph seed')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per benchmark (after one warm-up run)')
+    parser.add_argument('--only', nargs='+', default=None,
+                        help='Benchmark groups to run: load_graphsage_data, loader, train, save_predictions, extract_routes, calculate_path_length')
+    parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension of the trainer models')
+    parser.add_argument('--json-max-nodes', type=int, default=1000000, help='Largest size that also gets a JSON export')
+    parser.add_argument('--train-max-nodes', type=int, default=1000000, help='Largest size to time training epochs on')
+    parser.add_argument('--legacy-max-nodes', type=int, default=100000, help='Largest size to time the row-by-row legacy loader on')
+    parser.add_argument('--path-max-points', type=int, default=1000000, help='Largest MultiLineString for calculate_path_length')
+    parser.add_argument('--work-dir', default='test-output/benchmarks', help='Directory for generated inputs (reused across runs)')
+    parser.add_argument('--output', default=None, help='Results JSON (default: <work-dir>/results.json)')
+    parser.add_argument('--baseline', default=None, help='Baseline results JSON to compare against (created if missing)')
+    parser.add_argument('--update-baseline', action='store_true', help='Overwrite the baseline with this run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Relative slowdown that counts as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='Ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    selected = lambda group: args.only is None or group in args.only
+
+    results = []
+    start = time.time()
+    for num_nodes in args.sizes:
+        print(f"\n🗺️  Synthetic trail network with {num_nodes} vertices")
+        prepare_start = time.time()
+        inputs = prepare_inputs(num_nodes, args.seed, args.work_dir, args.json_max_nodes)
+        print(f"   ({len(inputs['graph']['source'])} edges, inputs ready in {time.time() - prepare_start:.1f}s)")
+        results.extend(run_benchmarks(num_nodes, inputs, args, selected, args.work_dir))
+
+    report = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment_info(),
+        'settings': {'seed': args.seed, 'repeats': args.repeats, 'hidden_dim': args.hidden_dim},
+        'results': results,
+    }
+    output_path = args.output or os.path.join(args.work_dir, 'results.json')
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n⏱️  {len(results)} benchmarks in {time.time() - start:.1f}s")
+    print(f"💾 Results saved to: {output_path}")
+
+    if not args.baseline:
+        return
+    if args.update_baseline or not os.path.exists(args.baseline):
+        baseline_dir = os.path.dirname(args.baseline)
+        if baseline_dir:
+            os.makedirs(baseline_dir, exist_ok=True)
+        shutil.copyfile(output_path, args.baseline)
+        print(f"💾 Baseline written to: {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('platform') != report['environment']['platform']:
+        print(f"⚠️  Baseline was recorded on {baseline.get('environment', {}).get('platform')}, timings may not be comparable")
+    regressions = compare_with_baseline(results, baseline, args.threshold, args.min_seconds)
+    if regressions:
+        print(f"\n⚠️  {len(regressions)} regressions against {args.baseline}:")
+        for line in regressions:
+            print(f"   • {line}")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Cluster-Partitioned Training for GraphSAGE
+
+Cuts a large routing graph into spatially coherent clusters by recursive
+coordinate bisection on the node x/y features, then trains on a few
+clusters at a time with their halo (the in-neighbors within `halo_hops`
+hops outside the chosen clusters). Unlike neighbor sampling, a step's work
+is bounded by the cluster sizes and does not re-expand dense neighborhoods
+around trailheads, and each step reads a compact, mostly contiguous slice
+of the node arrays.
+
+Partitions are computed once per dataset and stored inside its binary
+dataset directory as `partition-spatial-<k>.npy`.
+
+Usage:
+    python scripts/graphsage/cluster_partition.py <export.json | dataset.graphsage> --partitions 64
+"""
+
+import argparse
+import math
+import os
+import time
+from typing import List, Optional, Tuple, Callable
+
+import numpy as np
+import torch
+from torch_geometric.data import Data
+
+from graph_dataset import dataset_dir_for
+from graph_preprocess import load_canonical_arrays
+from minibatch import graph_csr, model_depth
+
+DEFAULT_CLUSTERS_PER_BATCH = 4
+PARTITION_FILE = 'partition-spatial-{}.npy'
+
+def spatial_partition(coords: np.ndarray, num_parts: int) -> np.ndarray:
+    """
+    Recursive coordinate bisection: split at the median of the wider axis
+    until there are `num_parts` clusters of near-equal size. Coordinates are
+    treated as lon/lat, with longitude scaled by cos(latitude).
+    """
+    coords = np.nan_to_num(np.asarray(coords, dtype=np.float64)[:, :2])
+    if len(coords):
+        coords[:, 0] *= math.cos(math.radians(np.clip(coords[:, 1].mean(), -90, 90)))
+
+    part = np.zeros(len(coords), dtype=np.int64)
+    stack = [(np.arange(len(coords)), num_parts, 0)]
+    while stack:
+        nodes, parts, first_part = stack.pop()
+        if parts == 1 or len(nodes) <= 1:
+            part[nodes] = first_part
+            continue
+
+        points = coords[nodes]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        left_parts = parts // 2
+        split = len(nodes) * left_parts // parts
+        order = np.argpartition(points[:, axis], split) if 0 < split < len(nodes) else np.arange(len(nodes))
+
+        stack.append((nodes[order[:split]], left_parts, first_part))
+        stack.append((nodes[order[split:]], parts - left_parts, first_part + left_parts))
+    return part
+
+def load_partition(coords: np.ndarray, num_parts: int, dataset_path: Optional[str] = None) -> np.ndarray:
+    """Cluster id per node, cached in the dataset directory when one is given"""
+    partition_path = None
+    if dataset_path:
+        partition_path = os.path.join(dataset_dir_for(dataset_path), PARTITION_FILE.format(num_parts))
+        if os.path.exists(partition_path):
+            return np.load(partition_path)
+
+    start = time.time()
+    part = spatial_partition(coords, num_parts)
+    print(f"🗺️  Partitioned {len(part)} nodes into {num_parts} spatial clusters ({time.time() - start:.2f}s)")
+
+    if partition_path:
+        tmp_path = f"{partition_path}.tmp-{os.getpid()}.npy"
+        try:
+            np.save(tmp_path, part)
+            os.replace(tmp_path, partition_path)
+        except OSError as e:
+            print(f"⚠️  Could not cache partition: {e}")
+    return part
+
+class ClusterBatchRunner:
+    """
+    Training and inference over groups of spatial clusters. Exposes the same
+    train_epoch()/predict() interface as minibatch.MiniBatchRunner.
+    """
+
+    def __init__(self, model: torch.nn.Module, data: Data, num_parts: int,
+                 clusters_per_batch: int = DEFAULT_CLUSTERS_PER_BATCH, halo_hops: int = 1,
+                 dataset_path: Optional[str] = None, seed: Optional[int] = None, verbose: bool = True):
+        self.model = model
+        self.data = data
+        self.clusters_per_batch = clusters_per_batch
+        self.halo_hops = halo_hops
+        self.depth = model_depth(model)
+        self.rng = np.random.default_rng(seed)
+
+        self.indptr, self.indices = graph_csr(data)
+        part = load_partition(data.x[:, :2].numpy(), num_parts, dataset_path)
+
+        # Nodes grouped by cluster (ascending ids within each cluster)
+        self.cluster_nodes = np.argsort(part, kind='stable')
+        self.cluster_ptr = np.zeros(num_parts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(part, minlength=num_parts), out=self.cluster_ptr[1:])
+        self._local = np.full(data.num_nodes, -1, dtype=np.int64)
+
+        if verbose:
+            sizes = np.diff(self.cluster_ptr)
+            print(f"🧩 Cluster mode: {num_parts} clusters ({sizes.min()}-{sizes.max()} nodes), "
+                  f"{clusters_per_batch} per batch, {halo_hops}-hop halo")
+
+    def _core_nodes(self, clusters: np.ndarray) -> np.ndarray:
+        return np.sort(np.concatenate([
+            self.cluster_nodes[self.cluster_ptr[c]:self.cluster_ptr[c + 1]] for c in clusters
+        ]))
+
+    def _in_neighbors(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(position of the target in `nodes`, source node) for every incoming edge"""
+        starts = self.indptr[nodes]
+        degrees = self.indptr[nodes + 1] - starts
+        owner = np.repeat(np.arange(len(nodes)), degrees)
+        offsets = np.arange(len(owner)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        return owner, self.indices[starts[owner] + offsets]
+
+    def subgraph(self, core: np.ndarray, hops: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Induced subgraph on the core nodes plus their `hops`-hop halo.
+        Returns (n_id, edge_index) with the core nodes first.
+        """
+        self._local[core] = np.arange(len(core))
+        node_chunks = [core]
+        num_nodes = len(core)
+
+        frontier = core
+        for _ in range(hops):
+            _, sources = self._in_neighbors(frontier)
+            halo = np.unique(sources[self._local[sources] < 0])
+            self._local[halo] = np.arange(num_nodes, num_nodes + len(halo))
+            num_nodes += len(halo)
+            node_chunks.append(halo)
+            frontier = halo
+
+        n_id = np.concatenate(node_chunks)
+        owner, sources = self._in_neighbors(n_id)
+        inside = self._local[sources] >= 0
+        edge_index = np.stack([self._local[sources[inside]], owner[inside]])
+        self._local[n_id] = -1
+        return torch.from_numpy(n_id), torch.from_numpy(edge_index)
+
+    def _cluster_groups(self, shuffle: bool) -> List[np.ndarray]:
+        num_parts = len(self.cluster_ptr) - 1
+        clusters = self.rng.permutation(num_parts) if shuffle else np.arange(num_parts)
+        return [clusters[i:i + self.clusters_per_batch] for i in range(0, num_parts, self.clusters_per_batch)]
+
+    def train_epoch(self, optimizer: torch.optim.Optimizer, criterion: Callable,
+                    clip_grad_norm: Optional[float] = None) -> torch.Tensor:
+        """One pass over all clusters in shuffled groups; returns the mean loss over training nodes"""
+        self.model.train()
+        total_loss = 0.0
+        total_nodes = 0
+        for clusters in self._cluster_groups(shuffle=True):
+            core = self._core_nodes(clusters)
+            core_train = self.data.train_mask[core]
+            num_train = int(core_train.sum())
+            if num_train == 0:
+                continue
+
+            n_id, edge_index = self.subgraph(core, self.halo_hops)
+            optimizer.zero_grad()
+            out = self.model(self.data.x[n_id], edge_index)[:len(core)]
+            loss = criterion(out[core_train], self.data.y[n_id[:len(core)]][core_train])
+            loss.backward()
+            if clip_grad_norm is not None:
+                torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=clip_grad_norm)
+            optimizer.step()
+            total_loss += loss.item() * num_train
+            total_nodes += num_train
+
+        return torch.tensor(total_loss / max(total_nodes, 1))
+
+    @torch.no_grad()
+    def predict(self, mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Model outputs for the nodes selected by `mask` (all nodes by default).
+        Uses a halo as deep as the model, so outputs match a full-graph pass.
+        """
+        self.model.eval()
+        outputs = None
+        for clusters in self._cluster_groups(shuffle=False):
+            core = self._core_nodes(clusters)
+            if mask is not None and not bool(mask[core].any()):
+                continue
+            n_id, edge_index = self.subgraph(core, self.depth)
+            out = self.model(self.data.x[n_id], edge_index)[:len(core)]
+            if outputs is None:
+                outputs = torch.zeros(self.data.num_nodes, out.size(1), dtype=out.dtype)
+            outputs[torch.from_numpy(core)] = out
+
+        if outputs is None:
+            return torch.empty(0)
+        return outputs if mask is None else outputs[mask]
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute and inspect spatial cluster partitions')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--partitions', type=int, required=True, help='Number of spatial clusters')
+    args = parser.parse_args()
+
+    arrays, _ = load_canonical_arrays(args.data_path)
+    part = load_partition(arrays['x'][:, :2], args.partitions, args.data_path)
+
+    edge_index = np.asarray(arrays['edge_index'])
+    cut = part[edge_index[0]] != part[edge_index[1]]
+    sizes = np.bincount(part, minlength=args.partitions)
+
+    print(f"✅ {args.partitions} clusters over {len(part)} nodes")
+    print(f"   • Cluster size: min {sizes.min()}, mean {sizes.mean():.0f}, max {sizes.max()}")
+    print(f"   • Cut edges: {int(cut.sum())}/{len(cut)} ({cut.mean() * 100 if len(cut) else 0:.1f}%)")
+    print(f"   • Cached at: {os.path.join(dataset_dir_for(args.data_path), PARTITION_FILE.format(args.partitions))}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Export Trained GraphSAGE Models for CPU Inference
+
+Rewrites a trained model (any of the trainers' architectures, loaded from
+its saved state dict) as plain PyTorch: SAGEConv mean aggregation becomes
+a product with a sparse CSR adjacency built once per forward pass, and
+each layer's two linear maps are fused into one. The result needs no
+torch-geometric and can be compiled. The export is a TorchScript file with the linear
+layers dynamically quantized to int8 (or kept float32 with --no-quantize),
+and optionally an ONNX graph (float32). Exported models take
+(x [N, F] float32, edge_index [2, E] int64) and return class
+probabilities; graphsage_runtime.py loads them with torch alone. The
+model's feature normalization is part of the export, so x holds raw
+features.
+
+Usage:
+    python scripts/graphsage/export_model.py output/model.pth --output output/model.int8.pt --benchmark data.json
+"""
+
+import argparse
+import copy
+import importlib.util
+import json
+import os
+import time
+from typing import Dict, Any, List
+
+import torch
+import torch.nn.functional as F
+
+from feature_normalization import FeatureNormalizer
+from model_io import load_model, class_probabilities
+from train_distributed import MODEL_CHOICES, load_training_graph
+
+EXPORT_FORMAT_VERSION = 1
+
+def mean_adjacency(edge_index: torch.Tensor, num_nodes: int) -> torch.Tensor:
+    """Sparse CSR [N, N] operator whose row v averages the features of v's in-neighbors"""
+    degree = torch.zeros(num_nodes, dtype=torch.float32).index_add_(
+        0, edge_index[1], torch.ones(edge_index.size(1), dtype=torch.float32))
+    weights = (1.0 / degree.clamp(min=1.0))[edge_index[1]]
+    adjacency = torch.sparse_coo_tensor(torch.stack([edge_index[1], edge_index[0]]), weights, (num_nodes, num_nodes))
+    return adjacency.coalesce().to_sparse_csr()
+
+class PlainSAGEConv(torch.nn.Module):
+    """
+    SAGEConv with mean aggregation, lin_l(mean of in-neighbors) + lin_r(x),
+    with lin_l and lin_r fused into one linear layer. When the layer narrows
+    the features, the neighbors are projected before they are averaged, so
+    the sparse product runs on the narrower side.
+    """
+
+    def __init__(self, in_channels: int, out_channels: int):
+        super(PlainSAGEConv, self).__init__()
+        self.out_channels = out_channels
+        self.project_first = out_channels < in_channels
+        if self.project_first:
+            # [W_l; W_r] x: neighbor and root projections side by side
+            self.lin = torch.nn.Linear(in_channels, 2 * out_channels, bias=False)
+            self.bias = torch.nn.Parameter(torch.zeros(out_channels))
+        else:
+            # [W_l W_r] [mean; x]
+            self.lin = torch.nn.Linear(2 * in_channels, out_channels)
+            self.bias = torch.nn.Parameter(torch.zeros(0))
+
+    def load_sage_weights(self, lin_l_weight: torch.Tensor, lin_l_bias: torch.Tensor, lin_r_weight: torch.Tensor):
+        with torch.no_grad():
+            if self.project_first:
+                self.lin.weight.copy_(torch.cat([lin_l_weight, lin_r_weight], dim=0))
+                self.bias.copy_(lin_l_bias)
+            else:
+                self.lin.weight.copy_(torch.cat([lin_l_weight, lin_r_weight], dim=1))
+                self.lin.bias.copy_(lin_l_bias)
+
+    def forward(self, x: torch.Tensor, adjacency: torch.Tensor) -> torch.Tensor:
+        if self.project_first:
+            projected = self.lin(x)
+            neighbors = torch.sparse.mm(adjacency, projected[:, :self.out_channels])
+            return neighbors + projected[:, self.out_channels:] + self.bias
+        return self.lin(torch.cat([torch.sparse.mm(adjacency, x), x], dim=1))
+
+class PlainSAGEBlock(torch.nn.Module):
+    """torch_geometric.nn.GraphSAGE(num_layers=2): conv, ReLU, conv"""
+
+    def __init__(self, first: PlainSAGEConv, second: PlainSAGEConv):
+        super(PlainSAGEBlock, self).__init__()
+        self.first = first
+        self.second = second
+
+    def forward(self, x: torch.Tensor, adjacency: torch.Tensor) -> torch.Tensor:
+        return self.second(F.relu(self.first(x, adjacency)), adjacency)
+
+class PlainBlockModel(torch.nn.Module):
+    """The graphsage / improved / balanced / high_confidence models: ReLU'd blocks, optional skip, classifier"""
+
+    def __init__(self, normalizer: FeatureNormalizer, blocks: List[PlainSAGEBlock], classifier: torch.nn.Sequential,
+                 residual: bool):
+        super(PlainBlockModel, self).__init__()
+        self.normalizer = normalizer
+        self.blocks = torch.nn.ModuleList(blocks)
+        self.classifier = classifier
+        self.residual = residual
+
+    def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        x = self.normalizer(x)
+        adjacency = mean_adjacency(edge_index, x.size(0))
+        outputs: List[torch.Tensor] = []
+        for block in self.blocks:
+            x = F.relu(block(x, adjacency))
+            outputs.append(x)
+        if self.residual:
+            x = outputs[0] + outputs[-1]
+        return F.softmax(self.classifier(x), dim=1)
+
+class PlainStackModel(torch.nn.Module):
+    """The intersection model: SAGEConv layers with ReLU in between"""
+
+    def __init__(self, normalizer: FeatureNormalizer, convs: List[PlainSAGEConv]):
+        super(PlainStackModel, self).__init__()
+        self.normalizer = normalizer
+        self.hidden = torch.nn.ModuleList(convs[:-1])
+        self.output = convs[-1]
+
+    def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        x = self.normalizer(x)
+        adjacency = mean_adjacency(edge_index, x.size(0))
+        for conv in self.hidden:
+            x = F.relu(conv(x, adjacency))
+        return F.softmax(self.output(x, adjacency), dim=1)
+
+def plain_conv(conv: torch.nn.Module) -> PlainSAGEConv:
+    """Copy a PyG SAGEConv (mean aggregation, root weight, no projection/normalization)"""
+    if conv.aggr != 'mean' or conv.project or conv.normalize or not conv.root_weight:
+        raise ValueError(f"unsupported SAGEConv configuration: {conv}")
+    out_channels, in_channels = conv.lin_l.weight.shape
+    plain = PlainSAGEConv(in_channels, out_channels)
+    plain.load_sage_weights(conv.lin_l.weight, conv.lin_l.bias, conv.lin_r.weight)
+    return plain
+
+def to_plain(model: torch.nn.Module, name: str) -> torch.nn.Module:
+    """Plain-PyTorch twin of a trained model that outputs class probabilities"""
+    normalizer = copy.deepcopy(model.normalizer)
+    if name == 'intersection':
+        plain = PlainStackModel(normalizer, [plain_conv(conv) for conv in model.convs])
+    else:
+        blocks = []
+        for block_name in ('sage1', 'sage2', 'sage3'):
+            block = getattr(model, block_name, None)
+            if block is None:
+                continue
+            if len(block.convs) != 2:
+                raise ValueError(f"{block_name} has {len(block.convs)} layers, expected 2")
+            blocks.append(PlainSAGEBlock(plain_conv(block.convs[0]), plain_conv(block.convs[1])))
+
+        # Dropout is a no-op at inference
+        layers = model.classifier if isinstance(model.classifier, torch.nn.Sequential) else [model.classifier]
+        classifier = torch.nn.Sequential(*[
+            type(layer)(layer.in_features, layer.out_features) if isinstance(layer, torch.nn.Linear) else layer
+            for layer in layers if not isinstance(layer, torch.nn.Dropout)
+        ])
+        trained = [layer for layer in layers if isinstance(layer, torch.nn.Linear)]
+        for target, source in zip([layer for layer in classifier if isinstance(layer, torch.nn.Linear)], trained):
+            target.load_state_dict(source.state_dict())
+        plain = PlainBlockModel(normalizer, blocks, classifier, residual=name == 'improved')
+    return plain.eval()
+
+def compile_model(plain: torch.nn.Module, quantize: bool = True) -> torch.jit.ScriptModule:
+    """TorchScript module, with int8 dynamic quantization of the linear layers"""
+    if quantize:
+        plain = torch.ao.quantization.quantize_dynamic(plain, {torch.nn.Linear}, dtype=torch.qint8)
+    return torch.jit.script(plain)
+
+def export_onnx(plain: torch.nn.Module, num_features: int, path: str, opset: int = 17):
+    """Float32 ONNX graph with dynamic node and edge counts"""
+    x = torch.randn(4, num_features)
+    edge_index = torch.tensor([[0, 1, 2, 3], [1, 2, 3, 0]])
+    torch.onnx.export(
+        plain, (x, edge_index), path,
+        input_names=['x', 'edge_index'],
+        output_names=['probabilities'],
+        dynamic_axes={'x': {0: 'num_nodes'}, 'edge_index': {1: 'num_edges'}, 'probabilities': {0: 'num_nodes'}},
+        opset_version=opset,
+        dynamo=False
+    )
+
+def time_inference(model, x: torch.Tensor, edge_index: torch.Tensor, repeats: int) -> float:
+    """Best-of-`repeats` forward pass time in seconds"""
+    times = []
+    with torch.no_grad():
+        model(x, edge_index)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x, edge_index)
+            times.append(time.perf_counter() - start)
+    return min(times)
+
+def benchmark(model: torch.nn.Module, info: Dict[str, Any], plain: torch.nn.Module, data_path: str,
+              repeats: int) -> Dict[str, Any]:
+    """Latency and agreement of eager, float TorchScript and int8 TorchScript inference on a dataset"""
+    data = load_training_graph(data_path)
+    x = torch.nan_to_num(data.x)
+    with torch.no_grad():
+        reference = class_probabilities(model(x, data.edge_index), info['model'])
+
+    variants = {
+        'eager (torch-geometric)': model,
+        'torchscript float32': compile_model(plain, quantize=False),
+        'torchscript int8': compile_model(plain, quantize=True),
+    }
+    rows = {}
+    for label, variant in variants.items():
+        with torch.no_grad():
+            probabilities = variant(x, data.edge_index)
+            if label.startswith('eager'):
+                probabilities = class_probabilities(probabilities, info['model'])
+        rows[label] = {
+            'seconds': time_inference(variant, x, data.edge_index, repeats),
+            'max_abs_diff': float((probabilities - reference).abs().max()),
+            'agreement': float((probabilities.argmax(dim=1) == reference.argmax(dim=1)).float().mean()),
+        }
+
+    print(f"\n📊 Inference on {data.num_nodes} nodes / {data.num_edges} edges (best of {repeats}):")
+    print(f"   {'variant':<26} {'ms':>9} {'speedup':>8} {'max |Δp|':>9} {'agree':>7}")
+    baseline = rows['eager (torch-geometric)']['seconds']
+    for label, row in rows.items():
+        print(f"   {label:<26} {row['seconds'] * 1000:>9.2f} {baseline / row['seconds']:>7.2f}x "
+              f"{row['max_abs_diff']:>9.4f} {row['agreement']:>7.2%}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a trained GraphSAGE model as quantized TorchScript / ONNX')
+    parser.add_argument('model', help='Saved model (state dict .pth)')
+    parser.add_argument('--model-type', choices=MODEL_CHOICES, default=None, help='Trainer architecture (inferred for intersection models)')
+    parser.add_argument('--output', default=None, help='TorchScript output path (default: <model>.int8.pt)')
+    parser.add_argument('--no-quantize', action='store_true', help='Keep float32 linear layers')
+    parser.add_argument('--onnx', default=None, help='Also write a float32 ONNX graph to this path')
+    parser.add_argument('--benchmark', default=None, help='Dataset to compare eager vs exported inference on')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repetitions per variant in --benchmark')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return
+
+    model, info = load_model(args.model, args.model_type)
+    plain = to_plain(model, info['model'])
+    quantize = not args.no_quantize
+    output_path = args.output or f"{os.path.splitext(args.model)[0]}.{'int8' if quantize else 'float32'}.pt"
+
+    scripted = compile_model(plain, quantize)
+    scripted.save(output_path)
+    metadata = {
+        'format_version': EXPORT_FORMAT_VERSION,
+        'model': info['model'],
+        'num_features': info['num_features'],
+        'num_classes': info['num_classes'],
+        'quantized': quantize,
+        # Applied inside the exported model; recorded here for reference
+        'normalization': {'mean': model.normalizer.mean.tolist(), 'std': model.normalizer.std.tolist()}
+                         if info['normalized'] else None,
+        'source': info['path'],
+        'outputs': 'probabilities',
+        'class_mapping': {0: 'keep', 1: 'merge_degree_2', 2: 'split_y_t_intersection'}
+    }
+    with open(f"{output_path}.json", 'w') as f:
+        json.dump(metadata, f, indent=2)
+    print(f"✅ Exported {info['model']} model to {output_path} "
+          f"({os.path.getsize(output_path) / 1024:.0f} KiB, {'int8' if quantize else 'float32'} linear layers)")
+
+    if args.onnx:
+        if importlib.util.find_spec('onnx') is None:
+            print("⚠️  ONNX export needs the onnx package (pip install onnx), skipping")
+        else:
+            export_onnx(plain, info['num_features'], args.onnx)
+            print(f"✅ Exported ONNX graph to {args.onnx}")
+
+    if args.benchmark:
+        benchmark(model, info, plain, args.benchmark, args.repeats)
+
+if __name__ == '__main__':
+    main()
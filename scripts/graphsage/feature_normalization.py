@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Streaming Feature Normalization
+
+The node features (longitude, latitude, elevation, degree, average edge
+length) have very different scales. Every model standardizes them with a
+FeatureNormalizer as its first layer. The normalizer's mean and std are
+buffers, so they are saved in the model's state dict and exported with it,
+and inference applies them without any extra step.
+
+The statistics are computed in one pass over fixed-size chunks of the
+(memory-mapped) feature matrix. The running mean and sum of squared
+deviations are merged chunk by chunk (Welford's update in Chan's pairwise
+form). This works for datasets larger than memory, and statistics of
+several regions can be merged the same way. Missing values (NaN, e.g.
+NULL elevations) are left out of the statistics. For datasets, the
+statistics are cached in the binary dataset directory.
+
+Usage:
+    python scripts/graphsage/feature_normalization.py <export.json | dataset.graphsage> [--rebuild]
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, Any, Optional
+
+import numpy as np
+import torch
+
+from graph_dataset import load_graph_arrays, dataset_dir_for
+
+FEATURE_STATS_FILE = 'feature-stats.json'
+DEFAULT_CHUNK_ROWS = 1 << 20
+FEATURE_NAMES = ['x', 'y', 'z', 'degree', 'avg_incident_edge_length']
+
+class RunningStats:
+    """Per-feature count, mean and sum of squared deviations, updatable chunk by chunk"""
+
+    def __init__(self, num_features: int):
+        self.count = np.zeros(num_features, dtype=np.float64)
+        self.mean = np.zeros(num_features, dtype=np.float64)
+        self.m2 = np.zeros(num_features, dtype=np.float64)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with the statistics of another set of rows"""
+        total = self.count + other.count
+        # Features with no values on either side keep zeros
+        share = np.divide(other.count, total, out=np.zeros_like(total), where=total > 0)
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * share
+        self.m2 = self.m2 + other.m2 + delta * delta * self.count * share
+        self.count = total
+        return self
+
+    def update(self, chunk: np.ndarray) -> 'RunningStats':
+        """Add the finite values of a [rows, F] chunk"""
+        chunk = np.asarray(chunk, dtype=np.float64)
+        finite = np.isfinite(chunk)
+        part = RunningStats(chunk.shape[1])
+        part.count = finite.sum(axis=0).astype(np.float64)
+        part.mean = np.divide(np.where(finite, chunk, 0.0).sum(axis=0), part.count,
+                              out=np.zeros_like(part.count), where=part.count > 0)
+        part.m2 = (np.where(finite, chunk - part.mean, 0.0) ** 2).sum(axis=0)
+        return self.merge(part)
+
+    def std(self, min_std: float = 1e-6) -> np.ndarray:
+        """Population standard deviation; constant or empty features get 1"""
+        variance = np.divide(self.m2, self.count, out=np.ones_like(self.m2), where=self.count > 0)
+        std = np.sqrt(variance)
+        return np.where(std > min_std, std, 1.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist()}
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> 'RunningStats':
+        stats = cls(len(record['mean']))
+        stats.count = np.asarray(record['count'], dtype=np.float64)
+        stats.mean = np.asarray(record['mean'], dtype=np.float64)
+        stats.m2 = np.asarray(record['m2'], dtype=np.float64)
+        return stats
+
+def feature_statistics(x: np.ndarray, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> RunningStats:
+    """Statistics of a [N, F] feature matrix in one pass over `chunk_rows`-row chunks"""
+    stats = RunningStats(x.shape[1])
+    for start in range(0, len(x), chunk_rows):
+        stats.update(x[start:start + chunk_rows])
+    return stats
+
+def dataset_feature_stats(path: str, rebuild: bool = False, verbose: bool = True) -> RunningStats:
+    """feature_statistics() of a dataset's features, computed once and cached with the dataset"""
+    arrays, _ = load_graph_arrays(path)
+    cache_path = os.path.join(dataset_dir_for(path), FEATURE_STATS_FILE)
+    if not rebuild and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            record = json.load(f)
+        if record.get('num_nodes') == len(arrays['x']):
+            return RunningStats.from_dict(record)
+
+    stats = feature_statistics(arrays['x'])
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump({'num_nodes': len(arrays['x']), **stats.to_dict()}, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    if verbose:
+        print(f"📏 Computed feature statistics over {len(arrays['x'])} nodes (cached)")
+    return stats
+
+class FeatureNormalizer(torch.nn.Module):
+    """(x - mean) / std with mean and std stored as buffers; the identity until fitted"""
+
+    def __init__(self, num_features: int):
+        super(FeatureNormalizer, self).__init__()
+        self.register_buffer('mean', torch.zeros(num_features))
+        self.register_buffer('std', torch.ones(num_features))
+
+    def fit(self, stats: RunningStats):
+        self.mean.copy_(torch.from_numpy(stats.mean))
+        self.std.copy_(torch.from_numpy(stats.std()))
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return (x - self.mean) / self.std
+
+def fit_normalizer(model: torch.nn.Module, stats: Optional[RunningStats], verbose: bool = True):
+    """Fit the FeatureNormalizer of a model (unwrapping DistributedDataParallel)"""
+    if stats is None:
+        return
+    model = getattr(model, 'module', model)
+    model.normalizer.fit(stats)
+    if verbose:
+        print(f"📏 Feature normalization: mean {np.round(stats.mean, 4).tolist()}, "
+              f"std {np.round(stats.std(), 4).tolist()}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute (or recompute) the cached feature statistics of a dataset')
+    parser.add_argument('path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute even if cached statistics exist')
+    args = parser.parse_args()
+
+    stats = dataset_feature_stats(args.path, rebuild=args.rebuild, verbose=False)
+    std = stats.std()
+    names = FEATURE_NAMES if len(stats.mean) == len(FEATURE_NAMES) else [f"f{i}" for i in range(len(stats.mean))]
+    print(f"✅ Feature statistics of {args.path}:")
+    print(f"   {'feature':<26} {'count':>10} {'mean':>14} {'std':>14}")
+    for name, count, mean, sd in zip(names, stats.count, stats.mean, std):
+        print(f"   {name:<26} {int(count):>10} {mean:>14.6f} {sd:>14.6f}")
+    print(f"📁 Cached in: {dataset_dir_for(args.path)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Geometric Node Features from Exported Trail Networks
+
+The export's five node features say nothing about the shape of the trails
+around a vertex. This module reads the routing_nodes / routing_edges tables
+of a SQLite export in bulk and adds per-vertex geometry features:
+- min_angle_deg / max_angle_deg: smallest and largest angle between
+  neighboring incident edges (a T junction has about 90 / 180, a straight
+  degree-2 pass-through 180 / 180, a dead end 360 / 360)
+- mean_abs_grade / max_abs_grade: average absolute grade of the incident
+  edges (total climb and descent over length)
+- mean_sinuosity: path length over straight-line length of the incident
+  edges, as a measure of curvature
+- near_miss_m: distance to the nearest edge that does not touch the vertex
+  or its neighbors, capped at --near-miss-m. A dead end a few meters from another trail
+  is usually a missed intersection.
+
+All edge geometries are parsed into one flat coordinate buffer with
+per-edge offsets, and every feature is computed for all vertices at once
+with NumPy (plus a KD-tree for the near-miss search). Coordinates are
+projected to km around the network's mean latitude, which is accurate at
+trail-network scale.
+
+The features can be appended to an existing dataset (JSON export or binary
+dataset). Its vertices are matched to routing_nodes by node_id, and the
+result is written as a new binary dataset in the training format.
+
+Usage:
+    python scripts/graphsage/geometric_features.py region.db
+    python scripts/graphsage/geometric_features.py region.db --base graphsage-data.json --output extended.graphsage
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import time
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from graph_dataset import load_graph_arrays, write_binary_dataset
+from node_features import remap_vertex_ids
+
+GEOMETRIC_FEATURE_NAMES = ['min_angle_deg', 'max_angle_deg', 'mean_abs_grade', 'max_abs_grade',
+                           'mean_sinuosity', 'near_miss_m']
+KM_PER_DEGREE = 111.32
+# Edge directions at a vertex are taken this far along the edge, past GPS jitter
+BEARING_DISTANCE_KM = 0.02
+DEFAULT_NEAR_MISS_M = 50.0
+MAX_SINUOSITY = 5.0
+EDGE_CHUNK_ROWS = 100000
+
+_COORDINATE_SEPARATORS = str.maketrans('[],', '   ')
+
+def parse_linestrings(geojson: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flat [P, 3] (lon, lat, z) coordinate buffer and [E + 1] offsets from
+    LineString GeoJSON. z is NaN for 2D geometries, and MultiLineString
+    parts are joined into one line.
+    """
+    texts, points, dims = [], np.zeros(len(geojson), dtype=np.int64), np.zeros(len(geojson), dtype=np.int64)
+    for i, geometry in enumerate(geojson):
+        if not geometry or '"coordinates"' not in geometry:
+            texts.append('')
+            continue
+        text = geometry[geometry.index('"coordinates"') + len('"coordinates"') + 1:geometry.rindex(']') + 1]
+        parts = text.count('[[') if '"MultiLineString"' in geometry else 0
+        points[i] = text.count('[') - 1 - parts
+        if points[i] > 0:
+            dims[i] = (text.count(',') + 1) // points[i]
+        texts.append(text)
+
+    numbers = np.array(' '.join(texts).translate(_COORDINATE_SEPARATORS).split(), dtype=np.float64)
+    if len(numbers) != int((points * dims).sum()):
+        raise ValueError('unsupported GeoJSON geometry (expected LineString or MultiLineString)')
+
+    # Position of each point's first number in `numbers`
+    point_dims = np.repeat(dims, points)
+    starts = np.concatenate([[0], np.cumsum(point_dims)[:-1]]).astype(np.int64)
+    coords = np.full((len(starts), 3), np.nan)
+    coords[:, 0] = numbers[starts]
+    coords[:, 1] = numbers[starts + 1]
+    has_z = point_dims >= 3
+    coords[has_z, 2] = numbers[starts[has_z] + 2]
+
+    offsets = np.zeros(len(geojson) + 1, dtype=np.int64)
+    np.cumsum(points, out=offsets[1:])
+    return coords, offsets
+
+def _straight_fallback(coords: np.ndarray, offsets: np.ndarray, start_xyz: np.ndarray,
+                       end_xyz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Replace geometries with fewer than 2 points by the straight line between the edge's vertices"""
+    counts = np.diff(offsets)
+    broken = counts < 2
+    if not broken.any():
+        return coords, offsets
+    new_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(np.where(broken, 2, counts), out=new_offsets[1:])
+    new_coords = np.empty((new_offsets[-1], 3))
+
+    # Copy the intact geometries to their shifted positions
+    kept = counts * ~broken
+    within = np.arange(kept.sum()) - np.repeat(np.cumsum(kept) - kept, kept)
+    new_coords[np.repeat(new_offsets[:-1], kept) + within] = coords[np.repeat(offsets[:-1], kept) + within]
+    new_coords[new_offsets[:-1][broken]] = start_xyz[broken]
+    new_coords[new_offsets[:-1][broken] + 1] = end_xyz[broken]
+    return new_coords, new_offsets
+
+def read_routing_network(db_path: str) -> Dict[str, np.ndarray]:
+    """
+    Vertices and edge geometries of a SQLite export. Returns node_id [N]
+    (sorted), node_xyz [N, 3], source / target [E] (node ids), length_km [E],
+    coords [P, 3] and offsets [E + 1].
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        nodes = np.array(conn.execute(
+            'SELECT id, lng, lat, COALESCE(elevation, 0) FROM routing_nodes ORDER BY id').fetchall(),
+            dtype=np.float64).reshape(-1, 4)
+
+        sources, targets, lengths, coord_chunks, offset_chunks = [], [], [], [], []
+        cursor = conn.execute('SELECT source, target, length_km, geojson FROM routing_edges ORDER BY id')
+        num_points = 0
+        while True:
+            rows = cursor.fetchmany(EDGE_CHUNK_ROWS)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            sources.append(np.asarray(columns[0], dtype=np.int64))
+            targets.append(np.asarray(columns[1], dtype=np.int64))
+            lengths.append(np.asarray([np.nan if value is None else value for value in columns[2]], dtype=np.float64))
+            coords, offsets = parse_linestrings(columns[3])
+            coord_chunks.append(coords)
+            offset_chunks.append(offsets[:-1] + num_points)
+            num_points += len(coords)
+    finally:
+        conn.close()
+
+    node_ids = nodes[:, 0].astype(np.int64)
+    node_xyz = nodes[:, 1:]
+    source = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    target = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+    coords = np.concatenate(coord_chunks) if coord_chunks else np.zeros((0, 3))
+    offsets = np.concatenate(offset_chunks + [[num_points]]).astype(np.int64)
+
+    # Edges without usable geometry become straight lines between their vertices
+    src_idx, src_found = remap_vertex_ids(node_ids, source)
+    dst_idx, dst_found = remap_vertex_ids(node_ids, target)
+    fallback = np.full((len(source), 3), np.nan)
+    start_xyz, end_xyz = fallback.copy(), fallback.copy()
+    start_xyz[src_found] = node_xyz[src_idx[src_found]]
+    end_xyz[dst_found] = node_xyz[dst_idx[dst_found]]
+    coords, offsets = _straight_fallback(coords, offsets, start_xyz, end_xyz)
+
+    return {'node_id': node_ids, 'node_xyz': node_xyz, 'source': source, 'target': target,
+            'length_km': np.concatenate(lengths) if lengths else np.zeros(0), 'coords': coords, 'offsets': offsets}
+
+def project_km(lon_lat: np.ndarray, lat0: float) -> np.ndarray:
+    """Equirectangular projection of [.., 2] lon/lat to km around latitude lat0"""
+    return np.column_stack([lon_lat[:, 0] * KM_PER_DEGREE * math.cos(math.radians(lat0)),
+                            lon_lat[:, 1] * KM_PER_DEGREE])
+
+def edge_geometry_stats(points: np.ndarray, z: np.ndarray, offsets: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-edge path length (km), sinuosity, absolute grade and the direction
+    vectors leaving each end of the edge, from the projected [P, 2] points.
+    """
+    num_edges = len(offsets) - 1
+    counts = np.diff(offsets)
+    point_edge = np.repeat(np.arange(num_edges), counts)
+    first, last = offsets[:-1], offsets[1:] - 1
+
+    # Segment i joins points i and i + 1 of the same edge
+    in_edge = point_edge[:-1] == point_edge[1:]
+    segment_km = np.where(in_edge, np.hypot(*np.diff(points, axis=0).T), 0.0)
+    segment_edge = point_edge[:-1]
+    path_km = np.bincount(segment_edge, segment_km, minlength=num_edges)
+    chord_km = np.hypot(*(points[last] - points[first]).T)
+    sinuosity = np.ones(num_edges)
+    closed = chord_km <= 1e-9
+    np.divide(path_km, chord_km, out=sinuosity, where=~closed)
+    sinuosity[closed & (path_km > 1e-9)] = MAX_SINUOSITY
+    sinuosity = np.clip(sinuosity, 1.0, MAX_SINUOSITY)
+
+    # Grade over the segments with elevations on both ends (z in m, lengths in km)
+    dz = np.abs(np.diff(z))
+    with_z = in_edge & np.isfinite(dz)
+    climb_m = np.bincount(segment_edge[with_z], dz[with_z], minlength=num_edges)
+    covered_km = np.bincount(segment_edge[with_z], segment_km[with_z], minlength=num_edges)
+    grade = np.full(num_edges, np.nan)
+    np.divide(climb_m, covered_km * 1000.0, out=grade, where=covered_km > 1e-9)
+
+    # Direction at each end: toward the first point BEARING_DISTANCE_KM along the edge
+    # (or the far end of shorter edges), found by binary search on the cumulative length
+    cumulative = np.concatenate([[0.0], np.cumsum(segment_km)])
+    reach = np.minimum(BEARING_DISTANCE_KM, path_km)
+    ahead = np.clip(np.searchsorted(cumulative, cumulative[first] + reach, side='left'), first + 1, last)
+    behind = np.clip(np.searchsorted(cumulative, cumulative[last] - reach, side='right') - 1, first, last - 1)
+    return {
+        'path_km': path_km,
+        'sinuosity': sinuosity,
+        'grade': grade,
+        'start_direction': points[ahead] - points[first],
+        'end_direction': points[behind] - points[last],
+    }
+
+def junction_angles(nodes: np.ndarray, angles: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Smallest and largest angle (degrees) between circularly neighboring edge
+    directions at each node. Dead ends get 360 and isolated nodes 0.
+    """
+    order = np.lexsort((angles, nodes))
+    nodes, angles = nodes[order], angles[order]
+    counts = np.bincount(nodes, minlength=num_nodes)
+    group_start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    # Each direction's circular successor at the same node
+    position = np.arange(len(nodes))
+    successor = position + 1
+    group_last = np.repeat(group_start + counts - 1, counts)
+    successor[position == group_last] = np.repeat(group_start, counts)[position == group_last]
+    gap = np.mod(angles[successor] - angles, 2 * np.pi)
+    gap[successor == position] = 2 * np.pi
+
+    min_angle, max_angle = np.zeros(num_nodes), np.zeros(num_nodes)
+    present = counts > 0
+    if present.any():
+        min_angle[present] = np.minimum.reduceat(gap, group_start[present])
+        max_angle[present] = np.maximum.reduceat(gap, group_start[present])
+    return np.degrees(min_angle), np.degrees(max_angle)
+
+def near_miss_distances(node_km: np.ndarray, points: np.ndarray, offsets: np.ndarray, src: np.ndarray,
+                        dst: np.ndarray, cap_m: float, chunk_rows: int = 1 << 16) -> np.ndarray:
+    """
+    Distance (m) from each node to the nearest edge that touches neither the
+    node nor one of its neighbors, capped at cap_m. Skipping the neighbors'
+    edges keeps a vertex from matching the next segment of its own trail.
+    Segments are split into pieces no longer than the cap and indexed by
+    their midpoints in a KD-tree, so every piece within the cap of a node
+    has its midpoint within 1.5x the cap. All of those pieces are checked,
+    however many belong to the node's own trails.
+    """
+    cap_km = cap_m / 1000.0
+    num_nodes = len(node_km)
+    counts = np.diff(offsets)
+    point_edge = np.repeat(np.arange(len(counts)), counts)
+    segments = np.flatnonzero(point_edge[:-1] == point_edge[1:])
+    distances = np.full(num_nodes, float(cap_m))
+    if len(segments) == 0 or num_nodes == 0:
+        return distances
+
+    a, b = points[segments], points[segments + 1]
+    pieces = np.maximum(1, np.ceil(np.hypot(*(b - a).T) / cap_km)).astype(np.int64)
+    owner = np.repeat(np.arange(len(segments)), pieces)
+    step = np.arange(len(owner)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    direction = (b - a)[owner] / pieces[owner, None]
+    piece_a = a[owner] + direction * step[:, None]
+    piece_b = piece_a + direction
+    piece_edge = point_edge[segments][owner]
+
+    # Sorted (node, neighbor) keys, to skip edges touching a neighbor as well
+    valid = (src >= 0) & (dst >= 0)
+    pair_keys = np.unique(np.concatenate([src[valid] * num_nodes + dst[valid], dst[valid] * num_nodes + src[valid]]))
+
+    def adjacent(node: np.ndarray, other: np.ndarray) -> np.ndarray:
+        if len(pair_keys) == 0:
+            return np.zeros(np.broadcast(node, other).shape, dtype=bool)
+        keys = node * num_nodes + other
+        found = np.searchsorted(pair_keys, keys).clip(max=len(pair_keys) - 1)
+        return (pair_keys[found] == keys) & (other >= 0)
+
+    tree = cKDTree((piece_a + piece_b) / 2)
+    for begin in range(0, num_nodes, chunk_rows):
+        query = node_km[begin:begin + chunk_rows]
+        neighborhoods = tree.query_ball_point(query, 1.5 * cap_km)
+        sizes = np.fromiter(map(len, neighborhoods), dtype=np.int64, count=len(query))
+        if not sizes.any():
+            continue
+        # One (node, piece) pair per candidate, grouped by node
+        candidates = np.concatenate(neighborhoods).astype(np.int64)
+        row = np.repeat(np.arange(len(query)), sizes)
+
+        # Point-to-segment distance to every candidate piece
+        start, vector = piece_a[candidates], direction[candidates]
+        offset = query[row] - start
+        length2 = (vector * vector).sum(axis=1)
+        t = np.clip(np.divide((offset * vector).sum(axis=1), length2, out=np.zeros_like(length2),
+                              where=length2 > 0), 0.0, 1.0)
+        gap_km = np.hypot(*(offset - t[:, None] * vector).T)
+
+        node = begin + row
+        edge = piece_edge[candidates]
+        own = (src[edge] == node) | (dst[edge] == node) | adjacent(node, src[edge]) | adjacent(node, dst[edge])
+        gap_km[own] = np.inf
+        nearest = np.full(len(query), np.inf)
+        present = sizes > 0
+        nearest[present] = np.minimum.reduceat(gap_km, (np.cumsum(sizes) - sizes)[present])
+        distances[begin:begin + len(query)] = np.minimum(nearest * 1000.0, cap_m)
+    return distances
+
+def compute_geometric_features(network: Dict[str, np.ndarray],
+                               near_miss_m: float = DEFAULT_NEAR_MISS_M) -> np.ndarray:
+    """[N, len(GEOMETRIC_FEATURE_NAMES)] features aligned with network['node_id']"""
+    node_ids, node_xyz = network['node_id'], network['node_xyz']
+    num_nodes = len(node_ids)
+    src, src_found = remap_vertex_ids(node_ids, network['source'])
+    dst, dst_found = remap_vertex_ids(node_ids, network['target'])
+    valid = src_found & dst_found
+    # Edges with unknown endpoints are left out of every feature
+    src, dst = np.where(valid, src, -1), np.where(valid, dst, -1)
+
+    lat0 = float(np.mean(node_xyz[:, 1])) if num_nodes else 0.0
+    node_km = project_km(node_xyz[:, :2], lat0)
+    points = project_km(network['coords'][:, :2], lat0)
+    offsets = network['offsets']
+    stats = edge_geometry_stats(points, network['coords'][:, 2], offsets)
+
+    # Edges without z fall back to the grade between their vertices' elevations
+    length_km = np.where(np.isfinite(network['length_km']) & (network['length_km'] > 0),
+                         network['length_km'], stats['path_km'])
+    rise_m = np.abs(node_xyz[dst, 2] - node_xyz[src, 2])
+    node_grade = np.divide(rise_m, length_km * 1000.0, out=np.zeros_like(rise_m), where=length_km > 0)
+    grade = np.where(np.isfinite(stats['grade']), stats['grade'], node_grade)
+
+    # Geometries stored target-to-source start at the target vertex
+    first = points[offsets[:-1]]
+    reversed_geometry = (np.hypot(*(first - node_km[dst]).T) < np.hypot(*(first - node_km[src]).T))
+    src_direction = np.where(reversed_geometry[:, None], stats['end_direction'], stats['start_direction'])
+    dst_direction = np.where(reversed_geometry[:, None], stats['start_direction'], stats['end_direction'])
+
+    # One row per edge end: (node, direction, edge)
+    end_nodes = np.concatenate([src[valid], dst[valid]])
+    end_edges = np.concatenate([np.flatnonzero(valid)] * 2)
+    directions = np.concatenate([src_direction[valid], dst_direction[valid]])
+    min_angle, max_angle = junction_angles(end_nodes, np.arctan2(directions[:, 1], directions[:, 0]), num_nodes)
+
+    degree = np.bincount(end_nodes, minlength=num_nodes).astype(np.float64)
+    incident = degree > 0
+    mean_grade = np.divide(np.bincount(end_nodes, grade[end_edges], minlength=num_nodes), degree,
+                           out=np.zeros(num_nodes), where=incident)
+    max_grade = np.zeros(num_nodes)
+    np.maximum.at(max_grade, end_nodes, grade[end_edges])
+    mean_sinuosity = np.divide(np.bincount(end_nodes, stats['sinuosity'][end_edges], minlength=num_nodes), degree,
+                               out=np.ones(num_nodes), where=incident)
+
+    near_miss = near_miss_distances(node_km, points, offsets, src, dst, near_miss_m)
+    return np.column_stack([min_angle, max_angle, mean_grade, max_grade, mean_sinuosity, near_miss])
+
+def extend_dataset(base_path: str, network: Dict[str, np.ndarray], features: np.ndarray,
+                   output_path: str) -> Dict[str, Any]:
+    """
+    Append geometric features to a dataset's node features, matching its rows
+    to routing_nodes by node_id, and write the result as a binary dataset.
+    """
+    arrays, metadata = load_graph_arrays(base_path)
+    num_nodes = len(arrays['x'])
+    if 'node_id' in arrays:
+        positions, found = remap_vertex_ids(network['node_id'], np.asarray(arrays['node_id']))
+    elif num_nodes == len(network['node_id']):
+        # Exports without node ids list vertices in id order
+        positions, found = np.arange(num_nodes), np.ones(num_nodes, dtype=bool)
+    else:
+        raise ValueError(f"{base_path} has no node ids and {num_nodes} nodes, "
+                         f"but the network has {len(network['node_id'])} vertices")
+
+    extra = np.zeros((num_nodes, features.shape[1]), dtype=np.float32)
+    extra[found] = features[positions[found]]
+    unmatched = int(num_nodes - found.sum())
+    if unmatched:
+        print(f"⚠️  {unmatched} dataset nodes have no routing_nodes row; their geometric features are 0")
+
+    extended = {name: np.asarray(array) for name, array in arrays.items()}
+    extended['x'] = np.hstack([np.asarray(arrays['x'], dtype=np.float32), extra])
+    base_names = metadata.get('feature_names') or [f"f{i}" for i in range(arrays['x'].shape[1])]
+    extended_metadata = {
+        **metadata,
+        'num_features': int(extended['x'].shape[1]),
+        'feature_names': list(base_names) + GEOMETRIC_FEATURE_NAMES,
+        'geometric_features': {'source': base_path, 'unmatched_nodes': unmatched},
+    }
+    write_binary_dataset(extended, extended_metadata, output_path)
+    return extended_metadata
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute geometric node features from a SQLite trail network export')
+    parser.add_argument('db_path', help='SQLite export with routing_nodes and routing_edges')
+    parser.add_argument('--base', default=None, help='Dataset (JSON export or binary) to append the features to')
+    parser.add_argument('--output', default=None, help='Binary dataset to write (default: <base>-geometric.graphsage)')
+    parser.add_argument('--near-miss-m', type=float, default=DEFAULT_NEAR_MISS_M, help='Cap of the near-miss distance in meters')
+    args = parser.parse_args()
+
+    start = time.time()
+    network = read_routing_network(args.db_path)
+    read_time = time.time() - start
+    print(f"🗺️  Read {len(network['node_id'])} vertices, {len(network['source'])} edges and "
+          f"{len(network['coords'])} coordinates in {read_time:.2f}s")
+
+    start = time.time()
+    features = compute_geometric_features(network, args.near_miss_m)
+    print(f"✅ Computed {len(GEOMETRIC_FEATURE_NAMES)} geometric features in {time.time() - start:.2f}s")
+    print(f"   {'feature':<16} {'mean':>10} {'min':>10} {'max':>10}")
+    for name, column in zip(GEOMETRIC_FEATURE_NAMES, features.T):
+        print(f"   {name:<16} {column.mean():>10.3f} {column.min():>10.3f} {column.max():>10.3f}")
+    near = int((features[:, -1] < args.near_miss_m).sum())
+    print(f"   • {near} vertices within {args.near_miss_m:g} m of a trail they are not connected to")
+
+    if args.base:
+        output = args.output or f"{os.path.splitext(args.base.rstrip(os.sep))[0]}-geometric.graphsage"
+        metadata = extend_dataset(args.base, network, features, output)
+        print(f"💾 Extended dataset ({metadata['num_features']} features) saved to: {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Binary GraphSAGE Dataset Format
+
+Stores a GraphSAGE export as a directory of aligned NumPy arrays that can be
+memory-mapped straight into PyTorch tensors, plus a cache keyed by the content
+hash of the source JSON so repeated training runs on the same export skip
+parsing entirely.
+
+Layout of a `.graphsage` dataset directory:
+    metadata.json                         export metadata + array dtypes/shapes
+    x.npy                                 float32 [num_nodes, num_features]
+    edge_index.npy                        int64   [2, num_edges]
+    y.npy                                 int64   [num_nodes]
+    train_mask.npy, val_mask.npy,
+    test_mask.npy                         bool    [num_nodes]
+    node_id.npy                           int64   [num_nodes] (optional)
+    edge_y.npy                            int64   [num_edges] edge labels, aligned with edge_index (optional)
+    partition-spatial-<k>.npy             int64   [num_nodes] cluster ids (cluster_partition.py)
+
+Usage:
+    python scripts/graphsage/graph_dataset.py convert <export.json> [<output.graphsage>]
+    python scripts/graphsage/graph_dataset.py info <export.json | dataset.graphsage>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Any, Tuple, Optional
+
+import numpy as np
+
+from graph_json_stream import stream_graphsage_json
+
+FORMAT_VERSION = 1
+DATASET_SUFFIX = '.graphsage'
+METADATA_FILE = 'metadata.json'
+DIGEST_INDEX_FILE = 'digests.json'
+
+REQUIRED_ARRAYS = ['x', 'edge_index', 'y', 'train_mask', 'val_mask', 'test_mask']
+ARRAY_DTYPES = {
+    'x': np.float32,
+    'edge_index': np.int64,
+    'y': np.int64,
+    'train_mask': np.bool_,
+    'val_mask': np.bool_,
+    'test_mask': np.bool_,
+    'node_id': np.int64,
+    'edge_y': np.int64,
+}
+
+def default_cache_dir() -> str:
+    """Directory holding converted datasets, overridable via CARTHORSE_GRAPHSAGE_CACHE"""
+    return os.environ.get(
+        'CARTHORSE_GRAPHSAGE_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'carthorse', 'graphsage')
+    )
+
+def is_binary_dataset(path: str) -> bool:
+    """Check whether a path points at a binary dataset directory"""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, METADATA_FILE))
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in fixed-size chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _write_json_atomic(path: str, payload: Any):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+def cached_file_digest(path: str, cache_dir: str) -> str:
+    """
+    Content hash of a file, memoized by (path, size, mtime) so an unchanged
+    export is never re-read just to find its cache entry.
+    """
+    stat = os.stat(path)
+    real_path = os.path.realpath(path)
+    index_path = os.path.join(cache_dir, DIGEST_INDEX_FILE)
+    index = _read_json(index_path, {})
+
+    entry = index.get(real_path)
+    if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return entry['digest']
+
+    digest = file_digest(path)
+    index[real_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json_atomic(index_path, index)
+    return digest
+
+def write_binary_dataset(arrays: Dict[str, np.ndarray], metadata: Dict[str, Any], output_dir: str) -> str:
+    """Write aligned arrays and metadata as a binary dataset directory"""
+    missing = [name for name in REQUIRED_ARRAYS if name not in arrays]
+    if missing:
+        raise ValueError(f"Missing required arrays: {', '.join(missing)}")
+
+    tmp_dir = f"{output_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    array_info = {}
+    for name, array in arrays.items():
+        dtype = ARRAY_DTYPES.get(name, array.dtype)
+        array = np.ascontiguousarray(array, dtype=dtype)
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        array_info[name] = {'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    _write_json_atomic(os.path.join(tmp_dir, METADATA_FILE), {
+        'format_version': FORMAT_VERSION,
+        'arrays': array_info,
+        'metadata': metadata,
+    })
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(tmp_dir, output_dir)
+    return output_dir
+
+def read_binary_dataset(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Read a binary dataset directory. With mmap=True arrays are copy-on-write
+    memory maps, so torch.from_numpy() wraps them without copying.
+    """
+    header = _read_json(os.path.join(path, METADATA_FILE), None)
+    if header is None:
+        raise ValueError(f"Not a GraphSAGE binary dataset: {path}")
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format version {header.get('format_version')} in {path}")
+
+    arrays = {}
+    for name in header['arrays']:
+        arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='c' if mmap else None)
+    return arrays, header['metadata']
+
+def arrays_from_json(json_path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Convert a JSON export from GraphSAGEDataPreparationService into aligned
+    arrays, streaming it so the document is never held as Python objects.
+    """
+    return stream_graphsage_json(json_path)
+
+def cache_path_for(json_path: str, cache_dir: Optional[str] = None) -> str:
+    """Location of the cached binary dataset for a JSON export"""
+    cache_dir = cache_dir or default_cache_dir()
+    return os.path.join(cache_dir, cached_file_digest(json_path, cache_dir) + DATASET_SUFFIX)
+
+def dataset_dir_for(path: str, cache_dir: Optional[str] = None) -> str:
+    """Binary dataset directory backing a path (the path itself or the cached conversion)"""
+    return path if is_binary_dataset(path) else cache_path_for(path, cache_dir)
+
+def load_graph_arrays(path: str, cache_dir: Optional[str] = None,
+                      use_cache: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Load a dataset as NumPy arrays from either a binary dataset directory or a
+    JSON export. JSON exports are converted once and cached by content hash.
+    """
+    if is_binary_dataset(path):
+        return read_binary_dataset(path)
+
+    if not use_cache:
+        return arrays_from_json(path)
+
+    dataset_path = cache_path_for(path, cache_dir)
+    if is_binary_dataset(dataset_path):
+        print(f"⚡ Using cached binary dataset: {dataset_path}")
+        return read_binary_dataset(dataset_path)
+
+    print(f"🔄 Converting JSON export to binary dataset (cached at {dataset_path})...")
+    arrays, metadata = arrays_from_json(path)
+    write_binary_dataset(arrays, metadata, dataset_path)
+    return read_binary_dataset(dataset_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert and inspect binary GraphSAGE datasets')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Convert a JSON export to a binary dataset')
+    convert_parser.add_argument('json_path', help='Path to GraphSAGE JSON data file')
+    convert_parser.add_argument('output', nargs='?', help='Output dataset directory (defaults to the cache)')
+
+    info_parser = subparsers.add_parser('info', help='Show arrays and metadata of a dataset')
+    info_parser.add_argument('path', help='JSON export or binary dataset directory')
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        start = time.time()
+        if args.output:
+            arrays, metadata = arrays_from_json(args.json_path)
+            output = write_binary_dataset(arrays, metadata, args.output)
+        else:
+            load_graph_arrays(args.json_path)
+            output = cache_path_for(args.json_path)
+        print(f"✅ Binary dataset written to: {output} ({time.time() - start:.2f}s)")
+    else:
+        start = time.time()
+        arrays, metadata = load_graph_arrays(args.path)
+        print(f"✅ Loaded in {time.time() - start:.3f}s")
+        for name, array in arrays.items():
+            print(f"   • {name}: {array.dtype} {tuple(array.shape)}")
+        print(f"   • metadata: {json.dumps(metadata)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Streaming Parser for GraphSAGE JSON Exports
+
+Reads the JSON written by GraphSAGEDataPreparationService.exportToJSON and
+CoordinateBasedGraphSAGEDataPreparationService.exportToJSON in fixed-size
+chunks. The numeric arrays (`x`, `edge_index`, `y`, `edge_y` and the masks) are
+parsed per chunk and written straight into NumPy buffers preallocated from
+the trailing `metadata` block, so peak memory stays close to the size of the
+final arrays instead of a full Python object tree.
+
+Usage:
+    python scripts/graphsage/graph_json_stream.py <export.json>
+"""
+
+import argparse
+import json
+import re
+import resource
+import time
+from typing import Dict, Any, Tuple, Optional
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Keys streamed into NumPy buffers; anything else is parsed as regular JSON
+STREAMED_ARRAYS = {
+    'x': np.float32,
+    'edge_index': np.int64,
+    'y': np.int64,
+    'train_mask': np.bool_,
+    'val_mask': np.bool_,
+    'test_mask': np.bool_,
+    'node_id': np.int64,
+    'edge_y': np.int64,
+}
+
+_ARRAY_NOISE = b'[] \t\r\n'
+_STRUCTURAL = re.compile(rb'["\[\]{},]')
+_STRING_END = re.compile(rb'["\\]')
+_WHITESPACE = b' \t\r\n'
+
+def read_trailing_metadata(path: str, tail_bytes: int = 65536) -> Optional[Dict[str, Any]]:
+    """
+    Read the `metadata` object from the end of an export without parsing the
+    rest of the file. Returns None if it cannot be located.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - tail_bytes))
+        tail = f.read()
+
+    key_pos = tail.rfind(b'"metadata"')
+    if key_pos < 0:
+        return None
+    colon = tail.find(b':', key_pos)
+    if colon < 0:
+        return None
+
+    try:
+        metadata, _ = json.JSONDecoder().raw_decode(tail[colon + 1:].decode('utf-8').lstrip())
+    except ValueError:
+        return None
+    return metadata if isinstance(metadata, dict) else None
+
+def _parse_scalars(body: bytes, dtype) -> np.ndarray:
+    """Parse the scalars in a slice of a (possibly nested) JSON array"""
+    text = body.translate(None, _ARRAY_NOISE).strip(b',')
+    if not text:
+        return np.empty(0, dtype=dtype)
+
+    expected = text.count(b',') + 1
+    if dtype == np.bool_:
+        text = text.replace(b'true', b'1').replace(b'false', b'0')
+        values = np.fromstring(text, dtype=np.int8, sep=',').astype(np.bool_)
+    else:
+        if b'null' in text:
+            text = text.replace(b'null', b'nan')
+        parse_dtype = dtype if np.issubdtype(dtype, np.integer) else np.float64
+        values = np.fromstring(text, dtype=parse_dtype, sep=',')
+        if len(values) != expected and parse_dtype != np.float64:
+            # Integer columns written with a fractional part or exponent
+            values = np.fromstring(text, dtype=np.float64, sep=',')
+        values = values.astype(dtype, copy=False)
+
+    if len(values) != expected:
+        raise ValueError(f"Could not parse numeric array near: {text[:80]!r}")
+    return values
+
+class _ArrayBuffer:
+    """Append-only NumPy buffer that grows geometrically past its size hint"""
+
+    def __init__(self, dtype, capacity: int):
+        self.array = np.empty(max(int(capacity), 1024), dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed > len(self.array):
+            grown = np.empty(max(needed, 2 * len(self.array)), dtype=self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+
+    def extend(self, values: np.ndarray):
+        self._reserve(len(values))
+        self.array[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def finish(self) -> np.ndarray:
+        if self.size == len(self.array):
+            return self.array
+        return self.array[:self.size].copy()
+
+class _EdgePairBuffer:
+    """Buffer that de-interleaves flattened [source, target] pairs into a [2, E] array"""
+
+    def __init__(self, capacity: int):
+        self.array = np.empty((2, max(int(capacity), 1024)), dtype=np.int64)
+        self.size = 0
+        self.pending: Optional[int] = None
+
+    def extend(self, values: np.ndarray):
+        if self.pending is not None and len(values):
+            values = np.concatenate([np.array([self.pending], dtype=np.int64), values])
+            self.pending = None
+        if len(values) % 2:
+            self.pending = int(values[-1])
+            values = values[:-1]
+
+        pairs = len(values) // 2
+        needed = self.size + pairs
+        if needed > self.array.shape[1]:
+            grown = np.empty((2, max(needed, 2 * self.array.shape[1])), dtype=np.int64)
+            grown[:, :self.size] = self.array[:, :self.size]
+            self.array = grown
+        self.array[0, self.size:needed] = values[0::2]
+        self.array[1, self.size:needed] = values[1::2]
+        self.size = needed
+
+    def finish(self) -> np.ndarray:
+        if self.pending is not None:
+            raise ValueError('edge_index has an odd number of entries')
+        if self.size == self.array.shape[1]:
+            return self.array
+        return self.array[:, :self.size].copy()
+
+class _ChunkedReader:
+    """Byte reader over a file that refills a sliding buffer on demand"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = b''
+        self.pos = 0
+
+    def fill(self) -> bool:
+        data = self.f.read(self.chunk_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def next_significant(self) -> bytes:
+        """Return the next non-whitespace byte without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    def expect(self, char: bytes):
+        if self.next_significant() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of current chunk")
+        self.pos += 1
+
+    def _refill_from(self, begin: int) -> int:
+        """Refill keeping everything from `begin` on; returns the rebased offset"""
+        self.pos = begin
+        if not self.fill():
+            raise ValueError('Unexpected end of JSON document')
+        return 0
+
+    def _skip_string(self, begin: int, i: int) -> Tuple[int, int]:
+        """Skip a string whose opening quote ends at `i`; returns (begin, end)"""
+        while True:
+            match = _STRING_END.search(self.buf, i)
+            if match is None:
+                i = len(self.buf) - begin
+                begin = self._refill_from(begin)
+                continue
+            if match.group() == b'\\':
+                if match.end() >= len(self.buf):
+                    # Escape sequence split across chunks
+                    i = match.start() - begin
+                    begin = self._refill_from(begin)
+                    continue
+                i = match.end() + 1
+                continue
+            return begin, match.end()
+
+    def read_string(self) -> str:
+        """Read a JSON string starting at the opening quote"""
+        if self.next_significant() != b'"':
+            raise ValueError('Expected a JSON string')
+        begin, end = self._skip_string(self.pos, self.pos + 1)
+        self.pos = end
+        return json.loads(self.buf[begin:end])
+
+    def read_value(self) -> Any:
+        """Read and decode a complete JSON value of any type"""
+        first = self.next_significant()
+        if first == b'"':
+            return self.read_string()
+
+        begin = self.pos
+        i = begin
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self.buf, i)
+            if match is None:
+                i = len(self.buf) - begin
+                begin = self._refill_from(begin)
+                continue
+
+            char = match.group()
+            if depth == 0 and first not in (b'[', b'{'):
+                # Scalar: runs until the next structural character
+                self.pos = match.start()
+                return json.loads(self.buf[begin:match.start()])
+
+            if char == b'"':
+                begin, i = self._skip_string(begin, match.end())
+                continue
+            if char in (b'[', b'{'):
+                depth += 1
+            elif char in (b']', b'}'):
+                depth -= 1
+            i = match.end()
+            if depth == 0:
+                self.pos = i
+                return json.loads(self.buf[begin:i])
+
+    def stream_array(self, sink) -> int:
+        """
+        Stream a (possibly nested) array of scalars into `sink` chunk by chunk.
+        Returns the number of inner arrays seen, i.e. rows of a 2D array.
+        """
+        self.expect(b'[')
+        depth = 1
+        inner_arrays = 0
+        while True:
+            chunk = self.buf[self.pos:]
+
+            # Numeric arrays contain no quotes or braces, so the first one marks
+            # the next key (or the end of the document) after this array closes
+            boundaries = [i for i in (chunk.find(b'"'), chunk.find(b'}')) if i >= 0]
+            if boundaries:
+                end = chunk.rfind(b']', 0, min(boundaries)) + 1
+                body = chunk[:end]
+                depth += body.count(b'[') - body.count(b']')
+                if end == 0 or depth != 0:
+                    raise ValueError('Malformed numeric array in JSON document')
+            else:
+                # The array may continue past this chunk; keep any partial token for later
+                end = max(chunk.rfind(b','), chunk.rfind(b'['), chunk.rfind(b']'),
+                          chunk.rfind(b'\n'), chunk.rfind(b' ')) + 1
+                body = chunk[:end]
+                depth += body.count(b'[') - body.count(b']')
+
+            inner_arrays += body.count(b'[')
+            sink(body)
+            self.pos += end
+
+            if depth == 0:
+                return inner_arrays
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON document inside array')
+
+def stream_graphsage_json(json_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Parse a GraphSAGE JSON export into aligned arrays without materializing
+    the document. Buffers are sized from the trailing metadata block and grow
+    if the hints turn out to be too small.
+    """
+    hints = read_trailing_metadata(json_path) or {}
+    num_nodes = int(hints.get('num_nodes') or 0)
+    num_edges = int(hints.get('num_edges') or 0)
+    num_features = int(hints.get('num_features') or 0)
+
+    arrays: Dict[str, np.ndarray] = {}
+    other: Dict[str, Any] = {}
+
+    with open(json_path, 'rb') as f:
+        reader = _ChunkedReader(f, chunk_size)
+        reader.expect(b'{')
+        while True:
+            char = reader.next_significant()
+            if char == b'}':
+                break
+            if char == b',':
+                reader.pos += 1
+                continue
+
+            key = reader.read_string()
+            reader.expect(b':')
+
+            if key in STREAMED_ARRAYS and reader.next_significant() == b'[':
+                dtype = STREAMED_ARRAYS[key]
+                if key == 'edge_index':
+                    buffer = _EdgePairBuffer(num_edges)
+                elif key == 'x':
+                    buffer = _ArrayBuffer(dtype, num_nodes * num_features)
+                elif key == 'edge_y':
+                    buffer = _ArrayBuffer(dtype, num_edges)
+                else:
+                    buffer = _ArrayBuffer(dtype, num_nodes)
+
+                rows = reader.stream_array(lambda body: buffer.extend(_parse_scalars(body, dtype)))
+                array = buffer.finish()
+                if key == 'x':
+                    array = array.reshape(rows, -1) if rows else array.reshape(0, num_features)
+                arrays[key] = array
+            else:
+                other[key] = reader.read_value()
+
+    metadata = other.get('metadata', {})
+    return arrays, metadata
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream-parse a GraphSAGE JSON export and report memory use')
+    parser.add_argument('json_path', help='Path to GraphSAGE JSON data file')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Read chunk size in bytes')
+
+    args = parser.parse_args()
+
+    start = time.time()
+    arrays, metadata = stream_graphsage_json(args.json_path, args.chunk_size)
+    elapsed = time.time() - start
+
+    array_bytes = sum(array.nbytes for array in arrays.values())
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"✅ Parsed {args.json_path} in {elapsed:.2f}s")
+    for name, array in arrays.items():
+        print(f"   • {name}: {array.dtype} {tuple(array.shape)}")
+    print(f"   • Array size: {array_bytes / 1e6:.1f} MB, peak RSS: {peak_rss_mb:.1f} MB")
+    print(f"   • metadata: {json.dumps(metadata)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Canonical Graph Preprocessing
+
+Turns an exported edge list into the canonical graph every trainer and
+inference path uses:
+- edges are read as row positions or as vertex ids, as the dataset's
+  metadata['edge_index'] says, and vertex ids are mapped to rows through
+  node_id. Older exports without the field are read as the exporter that
+  wrote them numbered their edges. Edges naming nodes the export does not
+  have are dropped.
+- self-loops and duplicate edges are removed
+- the graph is made symmetric, since trails are undirected
+- edges are sorted by target, then source
+
+The result is a [2, E] edge index together with the indptr of its
+incoming-edge CSR. The sources of the edges ending at node v are
+edge_index[0, indptr[v]:indptr[v + 1]], which is the layout
+minibatch.build_csr produces. For datasets, both arrays are cached in the
+binary dataset directory next to the other arrays.
+
+Depends on NumPy only, so graphsage_runtime.py can use it without
+torch-geometric.
+
+Usage:
+    python scripts/graphsage/graph_preprocess.py <export.json | dataset.graphsage> [--rebuild]
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from graph_dataset import load_graph_arrays, dataset_dir_for
+from node_features import remap_vertex_ids
+
+CANONICAL_VERSION = 3
+CANONICAL_EDGE_FILE = 'canonical-edge_index.npy'
+CANONICAL_INDPTR_FILE = 'canonical-indptr.npy'
+CANONICAL_REPORT_FILE = 'canonical.json'
+
+# What a dataset's edge_index holds, recorded in metadata['edge_index']
+EDGE_INDEX_ROWS = 'rows'
+EDGE_INDEX_VERTEX_IDS = 'vertex_ids'
+EDGE_INDEX_FORMATS = (EDGE_INDEX_ROWS, EDGE_INDEX_VERTEX_IDS)
+# pgRouting vertex ids 1..N in row order, from exports that predate node_id.
+# Only inferred for old exports, never written.
+EDGE_INDEX_ONE_BASED = 'one_based_ids'
+
+def edge_index_format(metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> str:
+    """
+    What a dataset's edge_index holds. exportToJSON writes vertex ids and the
+    NumPy builders and the coordinate-based exporter write row positions, and
+    all of them record it in metadata['edge_index']. Exports written before
+    the field existed are read by what their exporter wrote: rows for
+    coordinate-based exports, vertex ids for exportToJSON files with node_id,
+    and 1-based pgRouting ids for older exportToJSON files without it.
+    """
+    edge_format = metadata.get('edge_index')
+    if edge_format is None:
+        if metadata.get('coordinate_based'):
+            return EDGE_INDEX_ROWS
+        return EDGE_INDEX_VERTEX_IDS if 'node_id' in arrays else EDGE_INDEX_ONE_BASED
+    if edge_format not in EDGE_INDEX_FORMATS:
+        raise ValueError(f"unknown edge_index format {edge_format!r}, expected one of {', '.join(EDGE_INDEX_FORMATS)}")
+    return edge_format
+
+def edge_rows(edge_index: np.ndarray, edge_format: str = EDGE_INDEX_ROWS,
+              node_ids: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    An exported [2, E] edge index as row positions. Vertex ids are looked up
+    in node_id; ids the export has no row for become -1.
+    """
+    if edge_format == EDGE_INDEX_ROWS:
+        return edge_index
+    if edge_format == EDGE_INDEX_ONE_BASED:
+        return edge_index - 1
+    if edge_format != EDGE_INDEX_VERTEX_IDS:
+        raise ValueError(f"unknown edge_index format {edge_format!r}")
+    if node_ids is None:
+        raise ValueError('edge_index holds vertex ids but the dataset has no node_id to map them')
+
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    order = np.argsort(node_ids, kind='stable')
+    positions, found = remap_vertex_ids(node_ids[order], edge_index.ravel())
+    rows = np.where(found, order[np.minimum(positions, len(order) - 1)] if len(order) else -1, -1)
+    return rows.reshape(edge_index.shape)
+
+def canonical_edges(edge_index: np.ndarray, num_nodes: int, node_ids: Optional[np.ndarray] = None,
+                    edge_format: str = EDGE_INDEX_ROWS) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Canonical (edge_index, indptr, report) for an exported [2, E] edge list
+    holding `edge_format` (see edge_rows): invalid edges dropped, no self-loops
+    or duplicates, symmetric, sorted by (target, source).
+    """
+    edge_index = np.asarray(edge_index, dtype=np.int64).reshape(2, -1)
+    report: Dict[str, Any] = {'version': CANONICAL_VERSION, 'num_nodes': int(num_nodes),
+                              'input_edges': int(edge_index.shape[1]), 'edge_index': edge_format}
+
+    edge_index = edge_rows(edge_index, edge_format, node_ids)
+
+    src, dst = edge_index
+    valid = (src >= 0) & (src < num_nodes) & (dst >= 0) & (dst < num_nodes)
+    report['dropped_invalid'] = int(len(valid) - valid.sum())
+    loops = src == dst
+    report['self_loops'] = int((loops & valid).sum())
+    keep = valid & ~loops
+    src, dst = src[keep], dst[keep]
+
+    # Both directions of every edge, deduplicated and sorted by one int64 key
+    key = np.unique(np.concatenate([dst * num_nodes + src, src * num_nodes + dst]))
+    dst, src = np.divmod(key, num_nodes)
+    # Edges repeating an undirected edge already seen, in either direction
+    report['duplicates'] = int(keep.sum() - len(key) // 2)
+    report['edges'] = int(len(key))
+
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=num_nodes), out=indptr[1:])
+    return np.stack([src, dst]), indptr, report
+
+def canonical_edge_labels(edge_index: np.ndarray, edge_labels: np.ndarray, num_nodes: int,
+                          node_ids: Optional[np.ndarray] = None,
+                          edge_format: str = EDGE_INDEX_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The undirected edges of the canonical graph as a [2, E] array of (u, v)
+    pairs with u < v, sorted, and one label per pair from the exported
+    per-edge labels. An edge exported more than once keeps its highest
+    label, so a duplicate flagged for deletion stays flagged.
+    """
+    edge_index = np.asarray(edge_index, dtype=np.int64).reshape(2, -1)
+    edge_labels = np.asarray(edge_labels, dtype=np.int64)
+    if len(edge_labels) != edge_index.shape[1]:
+        raise ValueError(f"{len(edge_labels)} edge labels for {edge_index.shape[1]} edges")
+
+    edge_index = edge_rows(edge_index, edge_format, node_ids)
+    src, dst = edge_index
+    keep = (src >= 0) & (src < num_nodes) & (dst >= 0) & (dst < num_nodes) & (src != dst)
+    key = np.minimum(src, dst)[keep] * num_nodes + np.maximum(src, dst)[keep]
+    labels = edge_labels[keep]
+
+    # Sorted by key, then label: the last row of each key has its highest label
+    order = np.lexsort((labels, key))
+    key, labels = key[order], labels[order]
+    last = np.append(key[1:] != key[:-1], True) if len(key) else np.zeros(0, dtype=bool)
+    u, v = np.divmod(key[last], num_nodes)
+    return np.stack([u, v]), labels[last]
+
+def describe_report(report: Dict[str, Any]) -> str:
+    """One-line summary of what canonicalization changed"""
+    changes = []
+    if report['edge_index'] == EDGE_INDEX_VERTEX_IDS:
+        changes.append('mapped vertex ids to rows')
+    elif report['edge_index'] == EDGE_INDEX_ONE_BASED:
+        changes.append('shifted 1-based vertex ids of an export without node_id')
+    for key, label in (('dropped_invalid', 'invalid'), ('self_loops', 'self-loops'), ('duplicates', 'duplicates')):
+        if report[key]:
+            changes.append(f"dropped {report[key]} {label}")
+    return (f"{report['input_edges']} exported edges -> {report['edges']} symmetric edges"
+            + (f" ({', '.join(changes)})" if changes else ''))
+
+def _save_atomic(path: str, array: np.ndarray):
+    tmp_path = f"{path}.tmp-{os.getpid()}.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def load_canonical_arrays(path: str, rebuild: bool = False,
+                          verbose: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    load_graph_arrays() with arrays['edge_index'] replaced by the canonical
+    edge index and arrays['indptr'] added. Both are built once per dataset and
+    memory-mapped afterwards.
+    """
+    arrays, metadata = load_graph_arrays(path)
+    dataset_dir = dataset_dir_for(path)
+    edge_path = os.path.join(dataset_dir, CANONICAL_EDGE_FILE)
+    indptr_path = os.path.join(dataset_dir, CANONICAL_INDPTR_FILE)
+    report_path = os.path.join(dataset_dir, CANONICAL_REPORT_FILE)
+    num_nodes = len(arrays['x'])
+
+    report = None
+    if not rebuild and os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    if report is None or report.get('version') != CANONICAL_VERSION or report.get('num_nodes') != num_nodes:
+        start = time.time()
+        edge_index, indptr, report = canonical_edges(arrays['edge_index'], num_nodes, arrays.get('node_id'),
+                                                     edge_index_format(metadata, arrays))
+        _save_atomic(edge_path, edge_index)
+        _save_atomic(indptr_path, indptr)
+        with open(f"{report_path}.tmp-{os.getpid()}", 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(f"{report_path}.tmp-{os.getpid()}", report_path)
+        if verbose:
+            print(f"🔧 Canonical graph: {describe_report(report)} ({time.time() - start:.2f}s, cached)")
+
+    arrays = dict(arrays)
+    arrays['edge_index'] = np.load(edge_path, mmap_mode='r')
+    arrays['indptr'] = np.load(indptr_path, mmap_mode='r')
+    return arrays, {**metadata, 'canonical': report}
+
+def main():
+    parser = argparse.ArgumentParser(description='Build (or rebuild) the cached canonical graph of a dataset')
+    parser.add_argument('path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild even if a cached canonical graph exists')
+    args = parser.parse_args()
+
+    arrays, metadata = load_canonical_arrays(args.path, rebuild=args.rebuild, verbose=False)
+    report = metadata['canonical']
+    degree = np.diff(arrays['indptr'])
+    print(f"✅ {describe_report(report)}")
+    print(f"   • {report['num_nodes']} nodes, degree {degree.min()}-{degree.max()} "
+          f"(mean {degree.mean():.2f}), {int((degree == 0).sum())} isolated")
+    print(f"📁 Cached in: {dataset_dir_for(args.path)}")
+
+if __name__ == '__main__':
+    main()
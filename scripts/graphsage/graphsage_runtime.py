@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Minimal GraphSAGE Inference Runtime
+
+Loads a model exported by export_model.py (TorchScript plus its .json
+sidecar) and runs it with torch and NumPy only. torch-geometric, the
+trainer modules and the model class definitions are not imported, so
+start-up costs a torch import and a model load.
+
+Usage:
+    python scripts/graphsage/graphsage_runtime.py output/model.int8.pt <export.json | dataset.graphsage> --output predictions.gspred
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+import torch
+
+from graph_preprocess import canonical_edges, load_canonical_arrays
+from prediction_artifact import write_prediction_artifact
+
+class GraphSAGERuntime:
+    """An exported model and its metadata"""
+
+    def __init__(self, path: str, threads: Optional[int] = None):
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = torch.jit.load(path, map_location='cpu')
+        self.model.eval()
+        with open(f"{path}.json") as f:
+            self.metadata: Dict[str, Any] = json.load(f)
+
+    @torch.no_grad()
+    def predict_proba(self, x: np.ndarray, edge_index: np.ndarray, canonical: bool = False) -> np.ndarray:
+        """[N, C] class probabilities over the canonical graph (pass canonical=True if edge_index already is)"""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.metadata['num_features']:
+            raise ValueError(f"expected [N, {self.metadata['num_features']}] node features, got {list(x.shape)}")
+        if not canonical:
+            edge_index, _, _ = canonical_edges(edge_index, len(x))
+        edge_index = np.ascontiguousarray(edge_index, dtype=np.int64)
+        return self.model(torch.from_numpy(x), torch.from_numpy(edge_index)).numpy()
+
+    def predict(self, x: np.ndarray, edge_index: np.ndarray, canonical: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Predicted class and its probability per node"""
+        probabilities = self.predict_proba(x, edge_index, canonical)
+        return probabilities.argmax(axis=1), probabilities.max(axis=1)
+
+def main():
+    start = time.time()
+    parser = argparse.ArgumentParser(description='Run an exported GraphSAGE model without torch-geometric')
+    parser.add_argument('model', help='Exported TorchScript model (from export_model.py)')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--output', default=None, help='Write a prediction artifact (.gspred) here')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads (default: all cores)')
+    args = parser.parse_args()
+
+    runtime = GraphSAGERuntime(args.model, args.threads)
+    load_time = time.time() - start
+    print(f"✅ Loaded {runtime.metadata['model']} model "
+          f"({'int8' if runtime.metadata['quantized'] else 'float32'}) in {load_time:.2f}s")
+
+    arrays, _ = load_canonical_arrays(args.data_path)
+    start = time.time()
+    probabilities = runtime.predict_proba(arrays['x'], arrays['edge_index'], canonical=True)
+    predictions = probabilities.argmax(axis=1)
+    inference_time = time.time() - start
+    print(f"✅ Predicted {len(predictions)} nodes in {inference_time * 1000:.0f} ms "
+          f"({len(predictions) / max(inference_time, 1e-9):.0f} nodes/sec)")
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        class_mapping = runtime.metadata['class_mapping']
+        node_ids = arrays['node_id'] if 'node_id' in arrays else None
+        write_prediction_artifact(args.output, probabilities, node_ids, {
+            'model': runtime.metadata['model'],
+            'quantized': runtime.metadata['quantized'],
+            'source_path': os.path.abspath(args.data_path),
+            'num_nodes': int(len(predictions)),
+            'inference_time': inference_time
+        }, class_names=[class_mapping[str(i)] for i in range(len(class_mapping))])
+        print(f"💾 Predictions saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Incremental GraphSAGE Re-Inference After Network Edits
+
+Splitting a Y/T node or merging a degree-2 chain only changes predictions
+inside the model's receptive field around the edit. Given the changed vertex
+ids, this loads just the part of the staging schema needed to recompute
+those predictions and patches graphsage_predictions in place, instead of
+re-exporting and re-predicting the whole schema.
+
+For a model with k SAGEConv layers, every node within k hops of a changed
+vertex is re-predicted, which needs the graph within 2k hops (plus the
+incident edges of its outermost nodes for their degree features). Changed
+ids must include both endpoints of every added or removed edge; ids that no
+longer exist in ways_noded_vertices_pgr have their predictions deleted.
+
+Usage:
+    python scripts/graphsage/incremental_inference.py <schema> --model output/model.pth --changed 1201 1202 1377
+"""
+
+import argparse
+import time
+from typing import Dict, Any, Iterable, Optional
+
+import numpy as np
+import torch
+from torch_geometric.data import Data
+
+from graph_preprocess import canonical_edges
+from minibatch import model_depth
+from model_io import load_model, class_probabilities
+from node_features import remap_vertex_ids, incident_edge_stats
+from train_graphsage_direct import PostGISGraphLoader, predictions_table_ddl, predictions_copy_buffer
+
+def incident_edges(loader: PostGISGraphLoader, schema: str, vertex_ids: np.ndarray) -> np.ndarray:
+    """[E, 4] source, target, length_km, has-id rows of the edges touching `vertex_ids` (-1 / NaN for NULL)"""
+    cursor = loader.connection.cursor()
+    try:
+        cursor.execute(f"""
+        SELECT
+            COALESCE(source, -1),
+            COALESCE(target, -1),
+            COALESCE(length_km, 'NaN'),
+            (id IS NOT NULL)::int
+        FROM {schema}.ways_noded
+        WHERE source = ANY(%s) OR target = ANY(%s)
+        """, (vertex_ids.tolist(), vertex_ids.tolist()))
+        return np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+    finally:
+        cursor.close()
+
+def vertex_coordinates(loader: PostGISGraphLoader, schema: str, vertex_ids: np.ndarray) -> np.ndarray:
+    """[N, 4] id, x, y, z rows of the existing vertices among `vertex_ids`, ordered by id"""
+    cursor = loader.connection.cursor()
+    try:
+        cursor.execute(f"""
+        SELECT id, ST_X(the_geom), ST_Y(the_geom), COALESCE(ST_Z(the_geom), 'NaN')
+        FROM {schema}.ways_noded_vertices_pgr
+        WHERE id = ANY(%s)
+        ORDER BY id
+        """, (vertex_ids.tolist(),))
+        return np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+    finally:
+        cursor.close()
+
+def receptive_field(loader: PostGISGraphLoader, schema: str, changed_ids: Iterable[int], depth: int) -> Data:
+    """
+    Subgraph of the schema within 2 * depth hops of the changed vertices.
+    `distance` holds each node's hop distance to the nearest changed vertex
+    and `deleted_ids` the changed ids that no longer exist.
+    """
+    seeds = np.unique(np.asarray(list(changed_ids), dtype=np.int64))
+    visited = [seeds]
+    distances = [np.zeros(len(seeds), dtype=np.int64)]
+    seen = seeds
+    frontier = seeds
+    edge_chunks = []
+
+    for hop in range(2 * depth + 1):
+        if len(frontier) == 0:
+            break
+        edges = incident_edges(loader, schema, frontier)
+        endpoints = edges[:, :2].astype(np.int64)
+
+        # Edges touching earlier frontiers were fetched already
+        earlier = np.setdiff1d(seen, frontier, assume_unique=True)
+        edges = edges[~np.isin(endpoints, earlier).any(axis=1)]
+        edge_chunks.append(edges)
+        if hop == 2 * depth:
+            break
+
+        neighbors = np.unique(edges[:, :2].astype(np.int64))
+        frontier = np.setdiff1d(neighbors[neighbors >= 0], seen, assume_unique=True)
+        visited.append(frontier)
+        distances.append(np.full(len(frontier), hop + 1, dtype=np.int64))
+        seen = np.union1d(seen, frontier)
+
+    # Keep vertices that still exist, in id order
+    candidate_ids = np.concatenate(visited)
+    candidate_distance = np.concatenate(distances)
+    vertices = vertex_coordinates(loader, schema, candidate_ids)
+    node_ids = vertices[:, 0].astype(np.int64)
+    order = np.argsort(candidate_ids)
+    distance = candidate_distance[order][np.searchsorted(candidate_ids[order], node_ids)]
+
+    edges = np.concatenate(edge_chunks) if edge_chunks else np.empty((0, 4))
+    sources = edges[:, 0].astype(np.int64)
+    targets = edges[:, 1].astype(np.int64)
+    degree, avg_length = incident_edge_stats(node_ids, sources, targets, edges[:, 2], edges[:, 3])
+    x = np.column_stack([vertices[:, 1:], degree, avg_length]).astype(np.float32)
+
+    src_idx, src_found = remap_vertex_ids(node_ids, sources)
+    dst_idx, dst_found = remap_vertex_ids(node_ids, targets)
+    inside = src_found & dst_found
+    # Same canonical graph as a full load_topology() of the schema
+    edge_index, _, _ = canonical_edges(np.stack([src_idx[inside], dst_idx[inside]]), len(node_ids))
+    data = Data(
+        x=torch.from_numpy(x),
+        edge_index=torch.from_numpy(edge_index)
+    )
+    data.node_id = torch.from_numpy(node_ids)
+    data.distance = torch.from_numpy(distance)
+    data.deleted_ids = np.setdiff1d(seeds, node_ids)
+    return data
+
+def patch_predictions(loader: PostGISGraphLoader, schema: str, node_ids: np.ndarray, predictions: np.ndarray,
+                      confidences: np.ndarray, deleted_ids: Optional[np.ndarray] = None):
+    """Replace the predictions of `node_ids` and drop those of `deleted_ids` in one transaction"""
+    stale = np.concatenate([node_ids, deleted_ids if deleted_ids is not None else []]).astype(np.int64)
+    cursor = loader.connection.cursor()
+    try:
+        cursor.execute(predictions_table_ddl(schema, if_not_exists=True))
+        cursor.execute(f"DELETE FROM {schema}.graphsage_predictions WHERE node_id = ANY(%s)", (stale.tolist(),))
+        cursor.copy_expert(
+            f"COPY {schema}.graphsage_predictions (node_id, prediction, confidence) FROM STDIN WITH (NULL 'nan')",
+            predictions_copy_buffer(node_ids, predictions, confidences)
+        )
+        loader.connection.commit()
+    except Exception:
+        loader.connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+@torch.no_grad()
+def update_predictions(loader: PostGISGraphLoader, schema: str, model: torch.nn.Module, info: Dict[str, Any],
+                       changed_ids: Iterable[int], predict=None) -> Dict[str, Any]:
+    """
+    Re-predict the nodes whose receptive field contains a changed vertex and
+    patch graphsage_predictions. `predict(x, edge_index)` may replace the
+    direct forward pass (the inference server routes it through its batcher).
+    """
+    depth = model_depth(model)
+    start = time.time()
+    subgraph = receptive_field(loader, schema, changed_ids, depth)
+    load_time = time.time() - start
+
+    start = time.time()
+    if predict is None:
+        model.eval()
+        probabilities = class_probabilities(model(subgraph.x, subgraph.edge_index), info['model'])
+    else:
+        probabilities = predict(subgraph.x, subgraph.edge_index)
+    affected = subgraph.distance <= depth
+    confidences, predictions = probabilities[affected].max(dim=1)
+    inference_time = time.time() - start
+
+    start = time.time()
+    node_ids = subgraph.node_id[affected].numpy()
+    patch_predictions(loader, schema, node_ids, predictions.numpy(), confidences.numpy(), subgraph.deleted_ids)
+    write_time = time.time() - start
+
+    return {
+        'updated': int(len(node_ids)),
+        'deleted': int(len(subgraph.deleted_ids)),
+        'subgraph_nodes': int(subgraph.num_nodes),
+        'subgraph_edges': int(subgraph.num_edges),
+        'timing': {'load_ms': load_time * 1000, 'inference_ms': inference_time * 1000, 'write_ms': write_time * 1000}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-predict the neighborhood of edited vertices and patch graphsage_predictions')
+    parser.add_argument('schema', help='PostGIS schema name')
+    parser.add_argument('--model', required=True, help='Saved model (state dict .pth)')
+    parser.add_argument('--model-type', default=None, help='Trainer architecture (inferred for intersection models)')
+    parser.add_argument('--changed', type=int, nargs='*', default=[], help='Changed vertex ids')
+    parser.add_argument('--changed-file', default=None, help='File with one changed vertex id per line')
+    parser.add_argument('--host', default='localhost', help='Database host')
+    parser.add_argument('--port', default='5432', help='Database port')
+    parser.add_argument('--database', default='trail_master_db', help='Database name')
+    parser.add_argument('--user', default='postgres', help='Database user')
+    parser.add_argument('--password', default='', help='Database password')
+
+    args = parser.parse_args()
+
+    changed = list(args.changed)
+    if args.changed_file:
+        with open(args.changed_file) as f:
+            changed.extend(int(line) for line in f if line.strip())
+    if not changed:
+        parser.error('no changed vertex ids given (--changed or --changed-file)')
+
+    model, info = load_model(args.model, args.model_type)
+    db_config = {
+        'host': args.host,
+        'port': args.port,
+        'database': args.database,
+        'user': args.user,
+        'password': args.password
+    }
+
+    loader = PostGISGraphLoader(db_config)
+    try:
+        loader.connect()
+        result = update_predictions(loader, args.schema, model, info, changed)
+    finally:
+        loader.disconnect()
+
+    timing = result['timing']
+    print(f"✅ Re-predicted {result['updated']} nodes around {len(set(changed))} changed vertices "
+          f"({result['subgraph_nodes']}-node subgraph), removed {result['deleted']} deleted vertices")
+    print(f"⏱️  Load {timing['load_ms']:.0f} ms, inference {timing['inference_ms']:.0f} ms, write {timing['write_ms']:.0f} ms")
+
+if __name__ == '__main__':
+    main()
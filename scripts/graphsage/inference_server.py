@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+GraphSAGE Inference Server
+
+A long-lived local daemon for the TypeScript cleaning pipeline. Saved models
+(`model.pth` as train_intersection_graphsage.py writes it) are loaded once and
+kept warm, so a cleaning iteration pays for graph loading and a forward pass
+instead of a Python start, a torch import and a retrain.
+
+Requests arriving together are batched: graphs of the same model are packed
+into one disjoint graph and run in a single forward pass.
+
+Endpoints:
+    GET  /health    loaded models and server settings
+    POST /predict   JSON {"schema": ...} | {"dataset": path} | {"x": [[...]], "edge_index": [[...], [...]]}
+                    or an .npz body (application/octet-stream) with x, edge_index and optional node_id.
+                    Optional "model" (path), "model_type" and "probabilities" keys / query parameters.
+    POST /update    JSON {"schema": ..., "changed": [vertex ids]}: re-predict the receptive field
+                    of edited vertices and patch <schema>.graphsage_predictions in place.
+
+Usage:
+    python scripts/graphsage/inference_server.py --model output/model.pth --port 8765
+    python scripts/graphsage/inference_server.py --model output/model.pth --socket /tmp/graphsage.sock
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import torch
+
+from graph_preprocess import canonical_edges
+from incremental_inference import update_predictions
+from model_io import load_model, class_probabilities
+from train_distributed import MODEL_CHOICES, load_training_graph
+from train_graphsage_direct import PostGISGraphLoader, FEATURE_MODES
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_NODES = 1 << 20
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_CACHE_SIZE = 4
+
+class ModelCache:
+    """Loaded models by path, least recently used evicted first; a changed file is reloaded"""
+
+    def __init__(self, max_models: int = DEFAULT_CACHE_SIZE):
+        self.max_models = max_models
+        self.models: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, name: Optional[str] = None) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+        path = os.path.abspath(path)
+        key = (path, name)
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is not None and entry[1]['mtime'] == os.path.getmtime(path):
+                self.models.move_to_end(key)
+                return entry
+
+            entry = load_model(path, name)
+            warm_up(entry[0], entry[1]['num_features'])
+            print(f"🧠 Loaded {entry[1]['model']} model: {path}")
+            self.models[key] = entry
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+            return entry
+
+    def describe(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [info for _, info in self.models.values()]
+
+@torch.no_grad()
+def warm_up(model: torch.nn.Module, num_features: int):
+    """One tiny forward pass so the first request does not pay for lazy initialization"""
+    model(torch.zeros(2, num_features), torch.tensor([[0, 1], [1, 0]]))
+
+class InferenceJob:
+    """One request's graph, waiting for the batcher"""
+
+    def __init__(self, model_path: str, model_type: Optional[str], x: torch.Tensor, edge_index: torch.Tensor):
+        self.key = (os.path.abspath(model_path), model_type)
+        self.x = x
+        self.edge_index = edge_index
+        self.done = threading.Event()
+        self.result: Optional[torch.Tensor] = None
+        self.error: Optional[Exception] = None
+        self.batch_size = 1
+
+class InferenceBatcher(threading.Thread):
+    """
+    Single worker that drains queued jobs, waiting up to `max_wait` seconds
+    for more while the batch is below `max_batch_nodes`, and runs every group
+    of jobs sharing a model as one forward pass over their disjoint union.
+    """
+
+    def __init__(self, cache: ModelCache, max_batch_nodes: int = DEFAULT_MAX_BATCH_NODES,
+                 max_wait: float = DEFAULT_MAX_WAIT_MS / 1000):
+        super().__init__(daemon=True)
+        self.cache = cache
+        self.max_batch_nodes = max_batch_nodes
+        self.max_wait = max_wait
+        self.jobs: queue.Queue = queue.Queue()
+
+    def submit(self, job: InferenceJob) -> torch.Tensor:
+        """Queue a job and block until its class probabilities are ready"""
+        self.jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def run(self):
+        while True:
+            batch = [self.jobs.get()]
+            num_nodes = batch[0].x.size(0)
+            deadline = time.monotonic() + self.max_wait
+            while num_nodes < self.max_batch_nodes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.jobs.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(job)
+                num_nodes += job.x.size(0)
+
+            groups: Dict[Tuple[str, Optional[str]], List[InferenceJob]] = {}
+            for job in batch:
+                groups.setdefault(job.key, []).append(job)
+            for (path, name), jobs in groups.items():
+                try:
+                    model, info = self.cache.get(path, name)
+                    self.run_batch(model, info, jobs)
+                except Exception as e:
+                    for job in jobs:
+                        job.error = e
+                finally:
+                    for job in jobs:
+                        job.done.set()
+
+    @torch.no_grad()
+    def run_batch(self, model: torch.nn.Module, info: Dict[str, Any], jobs: List[InferenceJob]):
+        for job in jobs:
+            if job.x.dim() != 2 or job.x.size(1) != info['num_features']:
+                raise ValueError(f"expected [N, {info['num_features']}] node features, got {list(job.x.shape)}")
+
+        sizes = [job.x.size(0) for job in jobs]
+        offsets = np.cumsum([0] + sizes[:-1])
+        x = torch.cat([job.x for job in jobs])
+        edge_index = torch.cat([job.edge_index + int(offset) for job, offset in zip(jobs, offsets)], dim=1)
+
+        probabilities = class_probabilities(model(x, edge_index), info['model'])
+        for job, result in zip(jobs, probabilities.split(sizes)):
+            job.result = result
+            job.batch_size = len(jobs)
+
+def json_floats(values: torch.Tensor) -> list:
+    """Nested list of floats with NaN (e.g. from NULL elevations) as null, which JSON can carry"""
+    return np.where(torch.isfinite(values).numpy(), values.numpy(), None).tolist()
+
+def valid_edges(edge_index: np.ndarray, num_nodes: int) -> torch.Tensor:
+    """Canonical [2, E] int64 edge index (out-of-range edges dropped, symmetric, deduplicated)"""
+    edge_index, _, _ = canonical_edges(edge_index, num_nodes)
+    return torch.from_numpy(edge_index)
+
+class InferenceService:
+    """Turns request payloads into graphs and batched predictions"""
+
+    def __init__(self, default_model: str, default_type: Optional[str], batcher: InferenceBatcher,
+                 db_config: Dict[str, str], feature_mode: str = 'legacy'):
+        self.default_model = default_model
+        self.default_type = default_type
+        self.batcher = batcher
+        self.db_config = db_config
+        self.feature_mode = feature_mode
+        self.loader: Optional[PostGISGraphLoader] = None
+        self.db_lock = threading.Lock()
+
+    def connected_loader(self) -> PostGISGraphLoader:
+        """The shared database loader, reconnected if needed (call with db_lock held)"""
+        if self.loader is None or self.loader.connection is None or self.loader.connection.closed:
+            self.loader = PostGISGraphLoader(self.db_config)
+            self.loader.connect()
+        return self.loader
+
+    def schema_graph(self, schema: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(node_ids, x, edge_index) of a staging schema over one shared connection"""
+        with self.db_lock:
+            loader = self.connected_loader()
+            try:
+                return loader.load_topology(schema, self.feature_mode)
+            except Exception:
+                loader.connection.rollback()
+                raise
+
+    def graph_from_request(self, request: Dict[str, Any]) -> Tuple[Optional[np.ndarray], np.ndarray, np.ndarray]:
+        if 'schema' in request:
+            return self.schema_graph(request['schema'])
+        if 'dataset' in request:
+            data = load_training_graph(request['dataset'])
+            return None, data.x.numpy(), data.edge_index.numpy()
+        if 'x' in request and 'edge_index' in request:
+            node_ids = request.get('node_id', request.get('node_ids'))
+            return (np.asarray(node_ids, dtype=np.int64) if node_ids is not None else None,
+                    np.asarray(request['x'], dtype=np.float32),
+                    np.asarray(request['edge_index'], dtype=np.int64))
+        raise ValueError("request needs 'schema', 'dataset' or 'x' and 'edge_index'")
+
+    def predict(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.time()
+        node_ids, x, edge_index = self.graph_from_request(request)
+        x = torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+        load_ms = (time.time() - start) * 1000
+
+        start = time.time()
+        job = InferenceJob(request.get('model') or self.default_model,
+                           request.get('model_type') or self.default_type,
+                           x, valid_edges(edge_index, x.size(0)))
+        probabilities = self.batcher.submit(job)
+        confidences, predictions = probabilities.max(dim=1)
+        inference_ms = (time.time() - start) * 1000
+
+        response = {
+            'num_nodes': int(x.size(0)),
+            'node_ids': node_ids.tolist() if node_ids is not None else list(range(x.size(0))),
+            'predictions': predictions.tolist(),
+            'confidences': json_floats(confidences),
+            'timing': {'load_ms': load_ms, 'inference_ms': inference_ms, 'batched_requests': job.batch_size}
+        }
+        if request.get('probabilities'):
+            response['probabilities'] = json_floats(probabilities)
+        return response
+
+    def update(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Incremental re-inference around changed vertices, patched into graphsage_predictions"""
+        if 'schema' not in request or not request.get('changed'):
+            raise ValueError("update needs 'schema' and a non-empty 'changed' list")
+        model_path = request.get('model') or self.default_model
+        model_type = request.get('model_type') or self.default_type
+        model, info = self.batcher.cache.get(model_path, model_type)
+        predict = lambda x, edge_index: self.batcher.submit(InferenceJob(model_path, model_type, x, edge_index))
+
+        with self.db_lock:
+            loader = self.connected_loader()
+            try:
+                return update_predictions(loader, request['schema'], model, info, request['changed'], predict)
+            except Exception:
+                loader.connection.rollback()
+                raise
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; `self.server.service` is the shared InferenceService"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+            return
+        service = self.server.service
+        self.send_json(200, {
+            'status': 'ok',
+            'default_model': service.default_model,
+            'models': service.batcher.cache.describe(),
+            'max_batch_nodes': service.batcher.max_batch_nodes,
+            'max_wait_ms': service.batcher.max_wait * 1000,
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path not in ('/predict', '/update'):
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Type', '').startswith('application/octet-stream'):
+                arrays = np.load(io.BytesIO(body))
+                request = {key: arrays[key] for key in arrays.files}
+            else:
+                request = json.loads(body or b'{}')
+            request.update({key: values[-1] for key, values in parse_qs(url.query).items()})
+            if str(request.get('probabilities', '')).lower() in ('0', 'false'):
+                request['probabilities'] = False
+        except Exception as e:
+            self.send_json(400, {'error': f"invalid request: {e}"})
+            return
+
+        try:
+            service = self.server.service
+            self.send_json(200, service.predict(request) if url.path == '/predict' else service.update(request))
+        except (ValueError, KeyError, FileNotFoundError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service: InferenceService, host: str, port: int, socket_path: Optional[str] = None,
+                verbose: bool = False) -> socketserver.BaseServer:
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, InferenceRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve GraphSAGE predictions from warm models over HTTP')
+    parser.add_argument('--model', required=True, help='Default saved model (state dict .pth)')
+    parser.add_argument('--model-type', choices=MODEL_CHOICES, default=None, help='Trainer architecture (inferred for intersection models)')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP bind address')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='HTTP port')
+    parser.add_argument('--socket', default=None, help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--max-batch-nodes', type=int, default=DEFAULT_MAX_BATCH_NODES, help='Node budget of one batched forward pass')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS, help='How long a request waits for others to batch with')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='Models kept loaded')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads (default: all cores)')
+    parser.add_argument('--feature-mode', choices=FEATURE_MODES, default='bincount', help='Node feature extraction for schema requests')
+    parser.add_argument('--db-host', default='localhost', help='Database host')
+    parser.add_argument('--db-port', default='5432', help='Database port')
+    parser.add_argument('--database', default='trail_master_db', help='Database name')
+    parser.add_argument('--user', default='postgres', help='Database user')
+    parser.add_argument('--password', default='', help='Database password')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    cache = ModelCache(args.cache_size)
+    _, info = cache.get(args.model, args.model_type)
+    batcher = InferenceBatcher(cache, args.max_batch_nodes, args.max_wait_ms / 1000)
+    batcher.start()
+
+    db_config = {
+        'host': args.db_host,
+        'port': args.db_port,
+        'database': args.database,
+        'user': args.user,
+        'password': args.password
+    }
+    service = InferenceService(args.model, args.model_type, batcher, db_config, args.feature_mode)
+    server = make_server(service, args.host, args.port, args.socket, args.verbose)
+
+    address = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f"🚀 GraphSAGE inference server listening on {address}")
+    print(f"   • Model: {info['model']} ({info['num_features']} features, {info['num_classes']} classes)")
+    print(f"   • Batching: up to {args.max_batch_nodes} nodes, {args.max_wait_ms:g} ms wait")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        if service.loader is not None:
+            service.loader.disconnect()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Neighbor-Sampled Mini-Batch Training for GraphSAGE
+
+Runs the existing GraphSAGE models on sampled subgraphs instead of the whole
+graph, so memory per step is bounded by the batch size and per-layer fan-out
+rather than by region size. Sampling works on a NumPy CSR of incoming edges
+and needs no extra PyG extensions (pyg-lib / torch-sparse).
+
+Each batch is the k-hop neighborhood of `batch_size` seed nodes, where k is
+the number of SAGEConv layers in the model. Seeds come first in the subgraph,
+so `model(x[n_id], edge_index)[:batch_size]` are the seed outputs. Inference
+uses full neighborhoods and therefore matches a full-graph forward pass.
+"""
+
+from typing import List, Optional, Tuple, Callable
+
+import numpy as np
+import torch
+from torch_geometric.data import Data
+from torch_geometric.nn import SAGEConv
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_FANOUT = 10
+
+def model_depth(model: torch.nn.Module) -> int:
+    """Number of message passing hops, i.e. SAGEConv layers, in a model"""
+    return sum(isinstance(module, SAGEConv) for module in model.modules())
+
+def expand_fanouts(fanouts: Optional[List[int]], depth: int) -> List[int]:
+    """Per-hop fan-outs for `depth` hops, repeating the last given value (-1 = all neighbors)"""
+    fanouts = list(fanouts) if fanouts else [DEFAULT_FANOUT]
+    return (fanouts + [fanouts[-1]] * depth)[:depth]
+
+def build_csr(edge_index: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR of incoming edges: sources of the edges ending at node v are indices[indptr[v]:indptr[v + 1]]"""
+    sources = np.asarray(edge_index[0], dtype=np.int64)
+    targets = np.asarray(edge_index[1], dtype=np.int64)
+    order = np.argsort(targets, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=num_nodes), out=indptr[1:])
+    return indptr, sources[order]
+
+def graph_csr(data: Data) -> Tuple[np.ndarray, np.ndarray]:
+    """build_csr() of a graph, reusing the cached indptr of a canonical (target-sorted) edge index"""
+    if getattr(data, 'indptr', None) is not None:
+        return data.indptr.numpy(), data.edge_index[0].numpy()
+    return build_csr(data.edge_index.numpy(), data.num_nodes)
+
+class NeighborSampler:
+    """Samples k-hop subgraphs around seed nodes from a CSR adjacency"""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, fanouts: List[int], seed: Optional[int] = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.fanouts = fanouts
+        self.rng = np.random.default_rng(seed)
+        # Global -> local id map, reset after every sample so it is allocated only once
+        self._local = np.full(len(indptr) - 1, -1, dtype=np.int64)
+
+    def _sample_neighbors(self, nodes: np.ndarray, fanout: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (position of the target in `nodes`, sampled source node) per sampled edge"""
+        starts = self.indptr[nodes]
+        degrees = self.indptr[nodes + 1] - starts
+        owner = np.repeat(np.arange(len(nodes)), degrees)
+        rank = np.arange(len(owner)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        positions = starts[owner] + rank
+
+        if fanout >= 0 and np.any(degrees > fanout):
+            # Random order within each neighborhood, then keep the first `fanout`
+            order = np.lexsort((self.rng.random(len(owner)), owner))
+            keep = rank < fanout
+            owner = owner[order][keep]
+            positions = positions[order][keep]
+
+        return owner, self.indices[positions]
+
+    def sample(self, seeds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample the subgraph around `seeds`. Returns (n_id, edge_index) where
+        n_id[:len(seeds)] == seeds and edge_index uses local indices into n_id.
+        """
+        seeds = np.asarray(seeds, dtype=np.int64)
+        self._local[seeds] = np.arange(len(seeds))
+        node_chunks = [seeds]
+        edge_src, edge_dst = [], []
+        num_sampled = len(seeds)
+
+        frontier = seeds
+        for fanout in self.fanouts:
+            if len(frontier) == 0:
+                break
+            owner, neighbors = self._sample_neighbors(frontier, fanout)
+
+            # Assign local ids to first-seen neighbors in sampling order
+            unseen = neighbors[self._local[neighbors] < 0]
+            unique, first = np.unique(unseen, return_index=True)
+            new_nodes = unique[np.argsort(first)]
+            self._local[new_nodes] = np.arange(num_sampled, num_sampled + len(new_nodes))
+            num_sampled += len(new_nodes)
+            node_chunks.append(new_nodes)
+
+            edge_src.append(self._local[neighbors])
+            edge_dst.append(self._local[frontier[owner]])
+            frontier = new_nodes
+
+        n_id = np.concatenate(node_chunks)
+        self._local[n_id] = -1
+
+        if edge_src:
+            edge_index = np.stack([np.concatenate(edge_src), np.concatenate(edge_dst)])
+        else:
+            edge_index = np.empty((2, 0), dtype=np.int64)
+        return n_id, edge_index
+
+class MiniBatchRunner:
+    """Mini-batch training and inference of a GraphSAGE model over one graph"""
+
+    def __init__(self, model: torch.nn.Module, data: Data, batch_size: int = DEFAULT_BATCH_SIZE,
+                 fanouts: Optional[List[int]] = None, seed: Optional[int] = None, verbose: bool = True):
+        self.model = model
+        self.data = data
+        self.batch_size = batch_size
+
+        depth = model_depth(model)
+        indptr, indices = graph_csr(data)
+        self.train_sampler = NeighborSampler(indptr, indices, expand_fanouts(fanouts, depth), seed)
+        self.infer_sampler = NeighborSampler(indptr, indices, [-1] * depth)
+        self.rng = np.random.default_rng(seed)
+
+        if verbose:
+            print(f"🧩 Mini-batch mode: batch size {batch_size}, fan-out {self.train_sampler.fanouts} over {depth} hops")
+
+    def _subgraph(self, sampler: NeighborSampler, seeds: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        n_id, edge_index = sampler.sample(seeds)
+        n_id = torch.from_numpy(n_id)
+        return n_id, self.data.x[n_id], torch.from_numpy(edge_index)
+
+    def train_epoch(self, optimizer: torch.optim.Optimizer, criterion: Callable,
+                    clip_grad_norm: Optional[float] = None) -> torch.Tensor:
+        """One pass over the training nodes in shuffled batches; returns the mean loss"""
+        train_nodes = self.data.train_mask.nonzero().view(-1).numpy()
+        train_nodes = train_nodes[self.rng.permutation(len(train_nodes))]
+        batches = [train_nodes[start:start + self.batch_size] for start in range(0, len(train_nodes), self.batch_size)]
+        return self.train_batches(batches, optimizer, criterion, clip_grad_norm)
+
+    def train_batches(self, batches: List[np.ndarray], optimizer: torch.optim.Optimizer, criterion: Callable,
+                      clip_grad_norm: Optional[float] = None) -> torch.Tensor:
+        """One optimizer step per batch of seed nodes; returns the mean loss"""
+        self.model.train()
+        total_loss = 0.0
+        total_seeds = 0
+        for seeds in batches:
+            n_id, x, edge_index = self._subgraph(self.train_sampler, seeds)
+
+            optimizer.zero_grad()
+            out = self.model(x, edge_index)[:len(seeds)]
+            loss = criterion(out, self.data.y[n_id[:len(seeds)]])
+            loss.backward()
+            if clip_grad_norm is not None:
+                torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=clip_grad_norm)
+            optimizer.step()
+            total_loss += loss.item() * len(seeds)
+            total_seeds += len(seeds)
+
+        return torch.tensor(total_loss / max(total_seeds, 1))
+
+    @torch.no_grad()
+    def predict(self, mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Model outputs for the nodes selected by `mask` (all nodes by default), in node order"""
+        self.model.eval()
+        if mask is None:
+            nodes = np.arange(self.data.num_nodes)
+        else:
+            nodes = mask.nonzero().view(-1).numpy()
+
+        outputs = []
+        for start in range(0, len(nodes), self.batch_size):
+            seeds = nodes[start:start + self.batch_size]
+            _, x, edge_index = self._subgraph(self.infer_sampler, seeds)
+            outputs.append(self.model(x, edge_index)[:len(seeds)])
+
+        if not outputs:
+            return torch.empty(0)
+        return torch.cat(outputs)
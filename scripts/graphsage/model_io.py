@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Loading Saved GraphSAGE Models
+
+The trainers save bare `state_dict`s. The architecture is recovered from the
+parameter names and shapes: intersection models (train_intersection_graphsage.py,
+train_multi_region.py) are recognized by their `convs.<i>` SAGEConv stack;
+the other trainers share parameter names, so their model name must be given.
+Models saved before feature normalization was added load with an identity
+normalizer, i.e. they still see raw features.
+"""
+
+import os
+from typing import Dict, Any, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+
+from train_distributed import MODEL_CHOICES, build_model
+
+def model_name_for(state_dict: Dict[str, torch.Tensor]) -> Optional[str]:
+    """'intersection' for a `convs.<i>` state dict, None when the trainer cannot be told from the names"""
+    if any(key.startswith('convs.') for key in state_dict):
+        return 'intersection'
+    return None
+
+def architecture_of(state_dict: Dict[str, torch.Tensor]) -> Dict[str, int]:
+    """Input features, hidden size and classes from the first and last linear weights"""
+    weights = [key for key, value in state_dict.items() if key.endswith('weight') and value.dim() == 2]
+    if not weights:
+        raise ValueError('state dict has no linear layers')
+    first = state_dict[weights[0]]
+    last = state_dict[weights[-1]]
+    return {
+        'num_features': int(first.size(1)),
+        'hidden_dim': int(first.size(0)),
+        'num_classes': int(last.size(0)),
+        'num_layers': sum(key.startswith('convs.') and key.endswith('lin_l.weight') for key in state_dict),
+    }
+
+def load_model(path: str, name: Optional[str] = None) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+    """
+    Rebuild a trained model in eval mode from a saved state dict.
+    Returns (model, info) where info describes the architecture.
+    """
+    state_dict = torch.load(path, map_location='cpu', weights_only=True)
+    name = name or model_name_for(state_dict)
+    if name not in MODEL_CHOICES:
+        raise ValueError(f"cannot infer the model type of {path}; pass one of {MODEL_CHOICES}")
+
+    info = architecture_of(state_dict)
+    model, _ = build_model(name, info['num_features'], info['num_classes'], info['hidden_dim'])
+    if name == 'intersection' and info['num_layers'] != model.num_layers:
+        model = type(model)(info['num_features'], info['hidden_dim'], info['num_classes'], info['num_layers'])
+    normalized = any(key.startswith('normalizer.') for key in state_dict)
+    if not normalized:
+        state_dict = {**state_dict, **{key: value for key, value in model.state_dict().items()
+                                       if key.startswith('normalizer.')}}
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    info.update({'model': name, 'path': os.path.abspath(path), 'mtime': os.path.getmtime(path),
+                 'normalized': normalized})
+    return model, info
+
+def class_probabilities(out: torch.Tensor, name: str) -> torch.Tensor:
+    """Softmax probabilities from a model's output (the intersection model returns log-probabilities)"""
+    return out.exp() if name == 'intersection' else F.softmax(out, dim=1)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Trained-Model Registry
+
+Nightly rebuilds usually train on the same data with the same settings as
+the night before. The trainers register every model they train under a key
+made from the content hash of the dataset, the canonical graph version and
+the training config. On the next run with the same key they load the
+registered weights instead of training again.
+
+Each entry is a directory named by its key:
+    model.pth     state dict (includes the feature normalizer's mean / std)
+    entry.json    key, dataset digest, training config, metrics, normalization
+                  statistics and creation time
+
+The config is the trainer name plus its command-line arguments, leaving out
+the ones that only decide where results go or how a run is observed
+(output paths, profiling, database credentials). The registry lives under
+the dataset cache and can be moved with CARTHORSE_MODEL_REGISTRY.
+
+Usage:
+    python scripts/graphsage/model_registry.py list
+    python scripts/graphsage/model_registry.py show <key>
+    python scripts/graphsage/model_registry.py prune --keep 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+import torch
+
+from graph_dataset import cached_file_digest, default_cache_dir, is_binary_dataset, load_graph_arrays
+from graph_preprocess import CANONICAL_VERSION
+
+REGISTRY_VERSION = 1
+ENTRY_FILE = 'entry.json'
+WEIGHTS_FILE = 'model.pth'
+
+# Arguments that do not change the trained model (the dataset digest covers the features)
+NON_TRAINING_ARGS = {
+    'data_path', 'data', 'schema', 'output_dir', 'output', 'profile', 'profile_trace',
+    'registry', 'no_registry', 'retrain', 'confidence_threshold', 'swap_predictions',
+    'compare_feature_modes', 'bulk_load', 'feature_mode', 'host', 'port', 'database', 'user', 'password',
+}
+
+def default_registry_dir() -> str:
+    """Registry directory, overridable via CARTHORSE_MODEL_REGISTRY"""
+    return os.environ.get('CARTHORSE_MODEL_REGISTRY', os.path.join(default_cache_dir(), 'models'))
+
+def dataset_digest(path: str) -> str:
+    """
+    Content hash of a dataset: the file digest of a JSON export, or the
+    digests of a binary dataset's arrays. Both are memoized by size and mtime.
+    """
+    cache_dir = default_cache_dir()
+    if not is_binary_dataset(path):
+        return cached_file_digest(path, cache_dir)
+
+    arrays, _ = load_graph_arrays(path)
+    digest = hashlib.blake2b(digest_size=20)
+    for name in sorted(arrays):
+        digest.update(f"{name}:{cached_file_digest(os.path.join(path, f'{name}.npy'), cache_dir)};".encode())
+    return digest.hexdigest()
+
+def array_digest(arrays: Dict[str, np.ndarray]) -> str:
+    """Content hash of in-memory arrays (for graphs loaded straight from PostGIS)"""
+    digest = hashlib.blake2b(digest_size=20)
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode())
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+def training_config(args: argparse.Namespace, trainer: str) -> Dict[str, Any]:
+    """The arguments of a training run that determine the model"""
+    config = {key: value for key, value in vars(args).items() if key not in NON_TRAINING_ARGS}
+    return {'trainer': trainer, **config}
+
+def registry_key(digest: str, config: Dict[str, Any]) -> str:
+    """
+    Registry key of a dataset digest and training config. The canonical graph
+    version is part of the key, since the same export can canonicalize to a
+    different graph after graph_preprocess.py changes.
+    """
+    payload = json.dumps({'version': REGISTRY_VERSION, 'canonical': CANONICAL_VERSION, 'dataset': digest,
+                          'config': config}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+class ModelRegistry:
+    """Trained models stored by registry key"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_registry_dir()
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """The entry registered under a key, or None"""
+        path = os.path.join(self.entry_dir(key), ENTRY_FILE)
+        if not os.path.exists(os.path.join(self.entry_dir(key), WEIGHTS_FILE)):
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('version') == REGISTRY_VERSION else None
+
+    def restore(self, key: str, model: torch.nn.Module) -> Optional[Dict[str, Any]]:
+        """Load the registered weights into `model` and return the entry, or None if there is none"""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        state_dict = torch.load(os.path.join(self.entry_dir(key), WEIGHTS_FILE), map_location='cpu', weights_only=True)
+        try:
+            model.load_state_dict(state_dict)
+        except RuntimeError as e:
+            print(f"⚠️  Registered model {key} does not fit this model, retraining: {e}")
+            return None
+        print(f"♻️  Reusing registered model {key} (trained {entry['created_at']}), skipping training")
+        return entry
+
+    def store(self, key: str, model: torch.nn.Module, digest: str, config: Dict[str, Any],
+              metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Register a trained model under `key`, replacing any previous entry"""
+        normalizer = getattr(model, 'normalizer', None)
+        entry = {
+            'version': REGISTRY_VERSION,
+            'key': key,
+            'dataset_digest': digest,
+            'config': config,
+            'metrics': metrics,
+            'normalization': {'mean': normalizer.mean.tolist(), 'std': normalizer.std.tolist()}
+            if normalizer is not None else None,
+            'num_parameters': sum(p.numel() for p in model.parameters()),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+        entry_dir = self.entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        torch.save(model.state_dict(), os.path.join(tmp_dir, WEIGHTS_FILE))
+        with open(os.path.join(tmp_dir, ENTRY_FILE), 'w') as f:
+            # Metrics may hold NumPy or tensor scalars
+            json.dump(entry, f, indent=2, default=float)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(tmp_dir, entry_dir)
+        print(f"📦 Registered model {key} in {self.root}")
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """All entries, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        entries = [self.lookup(key) for key in os.listdir(self.root) if '.tmp-' not in key]
+        return sorted((entry for entry in entries if entry), key=lambda entry: entry['created_at'], reverse=True)
+
+    def remove(self, key: str):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def prune(self, keep: int) -> List[str]:
+        """Remove all but the `keep` newest entries; returns the removed keys"""
+        removed = [entry['key'] for entry in self.entries()[keep:]]
+        for key in removed:
+            self.remove(key)
+        return removed
+
+def add_registry_args(parser: argparse.ArgumentParser):
+    """The --registry / --no-registry / --retrain options shared by the trainers"""
+    parser.add_argument('--registry', default=None, help='Trained-model registry directory (default: CARTHORSE_MODEL_REGISTRY or the dataset cache)')
+    parser.add_argument('--no-registry', action='store_true', help='Neither reuse nor register a trained model')
+    parser.add_argument('--retrain', action='store_true', help='Train even when this dataset and config have a registered model')
+
+class RegistryRun:
+    """
+    Registry lookup and registration for one training run. Inert with
+    --no-registry; --retrain skips the lookup but still registers the result.
+    The dataset digest is only computed when the registry is used.
+    """
+
+    def __init__(self, args: argparse.Namespace, trainer: str, digest: Callable[[], str]):
+        self.registry = None if args.no_registry else ModelRegistry(args.registry)
+        self.retrain = args.retrain
+        self.config = training_config(args, trainer)
+        self.digest = digest() if self.registry else None
+        self.key = registry_key(self.digest, self.config) if self.registry else None
+        self.restored = None
+
+    def restore(self, model: torch.nn.Module) -> Optional[Dict[str, Any]]:
+        """The registered entry after loading its weights into `model`, or None to train"""
+        if self.registry is None or self.retrain:
+            return None
+        self.restored = self.registry.restore(self.key, model)
+        return self.restored
+
+    def train_or_restore(self, model: torch.nn.Module, train: Callable[[], Any]) -> Any:
+        """Training history of the registered model after loading its weights, or of a fresh `train()`"""
+        registered = self.restore(model)
+        return registered['metrics']['history'] if registered else train()
+
+    def store(self, model: torch.nn.Module, metrics: Dict[str, Any]):
+        """Register a freshly trained model; `metrics['history']` is what train_or_restore() returns"""
+        if self.registry is not None and self.restored is None:
+            self.registry.store(self.key, model, self.digest, self.config, metrics)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and prune the trained-model registry')
+    parser.add_argument('--registry', default=None, help='Registry directory (default: CARTHORSE_MODEL_REGISTRY or the dataset cache)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List registered models, newest first')
+    show = subparsers.add_parser('show', help='Print the entry of one model')
+    show.add_argument('key', help='Registry key')
+    remove = subparsers.add_parser('remove', help='Remove one model')
+    remove.add_argument('key', help='Registry key')
+    prune = subparsers.add_parser('prune', help='Keep only the newest models')
+    prune.add_argument('--keep', type=int, required=True, help='Number of models to keep')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'list':
+        entries = registry.entries()
+        print(f"📦 {len(entries)} registered models in {registry.root}")
+        for entry in entries:
+            accuracy = entry['metrics'].get('test_accuracy')
+            accuracy = f"{accuracy:.4f}" if accuracy is not None else '-'
+            print(f"   • {entry['key']}  {entry['created_at']}  {entry['config']['trainer']:<16} "
+                  f"test acc {accuracy}  dataset {entry['dataset_digest'][:12]}")
+    elif args.command == 'show':
+        entry = registry.lookup(args.key)
+        if entry is None:
+            print(f"❌ No registered model {args.key}")
+            return
+        print(json.dumps(entry, indent=2))
+    elif args.command == 'remove':
+        registry.remove(args.key)
+        print(f"🗑️  Removed {args.key}")
+    else:
+        removed = registry.prune(args.keep)
+        print(f"🗑️  Removed {len(removed)} models, kept the {args.keep} newest")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Vectorized Node Features for GraphSAGE
+
+NumPy versions of the per-vertex features and heuristic labels that
+GraphSAGEDataPreparationService builds in SQL. Features match the
+`LEFT JOIN ways_noded e ON (e.source = v.id OR e.target = v.id)` query:
+an edge counts once per endpoint vertex (once in total for a self-loop),
+missing lengths default to 0.1 km, and vertices without edges get degree 0
+and an average incident edge length of 0.1.
+"""
+
+from typing import Tuple, Optional
+
+import numpy as np
+
+DEFAULT_EDGE_LENGTH_KM = 0.1
+
+# Node label classes shared by all trainers
+LABEL_KEEP = 0
+LABEL_MERGE_DEGREE_2 = 1
+LABEL_SPLIT_Y_T = 2
+
+# Edge label classes (generateEdgeLabels in GraphSAGEDataPreparationService)
+EDGE_LABEL_VALID = 0
+EDGE_LABEL_MERGE = 1
+EDGE_LABEL_DELETE = 2
+SHORT_EDGE_KM = 0.01
+
+def remap_vertex_ids(node_ids: np.ndarray, vertex_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map vertex ids to positions in the sorted `node_ids` array.
+    Returns (positions, found) where `found` marks ids present in node_ids.
+    """
+    if len(node_ids) == 0:
+        return np.zeros(len(vertex_ids), dtype=np.int64), np.zeros(len(vertex_ids), dtype=bool)
+    if np.any(node_ids[1:] < node_ids[:-1]):
+        raise ValueError('node_ids must be sorted for searchsorted remapping')
+
+    positions = np.searchsorted(node_ids, vertex_ids)
+    clipped = np.minimum(positions, len(node_ids) - 1)
+    found = (positions < len(node_ids)) & (node_ids[clipped] == vertex_ids)
+    return positions, found
+
+def incident_edge_stats(node_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                        lengths: np.ndarray, counted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Degree and average incident edge length per node in one pass over the edges.
+
+    `sources`/`targets` are vertex ids (use any id absent from node_ids for
+    NULL endpoints), `lengths` are edge lengths in km with NaN for NULL, and
+    `counted` flags edges whose id is non-NULL (COUNT(e.id) semantics).
+    Returns float64 arrays aligned with the sorted `node_ids`.
+    """
+    num_nodes = len(node_ids)
+    lengths = np.where(np.isnan(lengths), DEFAULT_EDGE_LENGTH_KM, lengths).astype(np.float64)
+    counted = np.ones(len(sources), dtype=np.float64) if counted is None else counted.astype(np.float64)
+
+    src_idx, src_found = remap_vertex_ids(node_ids, sources)
+    dst_idx, dst_found = remap_vertex_ids(node_ids, targets)
+
+    # A self-loop satisfies the OR-join once, so only its source end counts
+    dst_found &= sources != targets
+
+    endpoints = np.concatenate([src_idx[src_found], dst_idx[dst_found]])
+    endpoint_lengths = np.concatenate([lengths[src_found], lengths[dst_found]])
+    endpoint_counted = np.concatenate([counted[src_found], counted[dst_found]])
+
+    rows = np.bincount(endpoints, minlength=num_nodes)
+    length_sum = np.bincount(endpoints, weights=endpoint_lengths, minlength=num_nodes)
+    degree = np.bincount(endpoints, weights=endpoint_counted, minlength=num_nodes)
+
+    avg_length = np.full(num_nodes, DEFAULT_EDGE_LENGTH_KM, dtype=np.float64)
+    has_edges = rows > 0
+    avg_length[has_edges] = length_sum[has_edges] / rows[has_edges]
+    return degree, avg_length
+
+def heuristic_node_labels(degree: np.ndarray) -> np.ndarray:
+    """Topology labels: degree-2 -> merge, degree >= 4 -> split Y/T, otherwise keep"""
+    return np.where(
+        degree == 2, LABEL_MERGE_DEGREE_2,
+        np.where(degree >= 4, LABEL_SPLIT_Y_T, LABEL_KEEP)
+    ).astype(np.int64)
+
+def heuristic_edge_labels(source_degree: np.ndarray, target_degree: np.ndarray, length_km: np.ndarray) -> np.ndarray:
+    """Topology labels: both endpoints degree-2 -> merge, shorter than 10 m -> delete, otherwise valid"""
+    return np.where(
+        (source_degree == 2) & (target_degree == 2), EDGE_LABEL_MERGE,
+        np.where(length_km < SHORT_EDGE_KM, EDGE_LABEL_DELETE, EDGE_LABEL_VALID)
+    ).astype(np.int64)
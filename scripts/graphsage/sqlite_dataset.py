@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+GraphSAGE Datasets from SQLite Exports
+
+Builds training datasets straight from the routing_nodes / routing_edges
+tables of a region's SQLite export, without PostGIS or the TypeScript
+preparation service. Both tables are bulk-read in a few queries (the edge
+geometry is never touched), the 5 node features and the heuristic node and
+edge labels are computed for all vertices at once with node_features.py,
+and the train/val/test split is stratified by label so every class keeps
+the same ratios. The result is written as a binary dataset that every
+trainer accepts, and optionally as a JSON export.
+
+Vertices keep their routing_nodes ids in `node_id`, and edge_index holds row
+positions. Edges with an endpoint missing from routing_nodes count towards
+the features of the endpoint that exists but are left out of edge_index.
+
+Usage:
+    python scripts/graphsage/sqlite_dataset.py test-output/boulder.db
+    python scripts/graphsage/sqlite_dataset.py exports/*.db --output-dir test-output/datasets --workers 8
+    python scripts/graphsage/sqlite_dataset.py test-output/boulder.db --output boulder.graphsage --json boulder.json
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from graph_dataset import DATASET_SUFFIX, write_binary_dataset
+from graph_preprocess import EDGE_INDEX_ROWS
+from node_features import (DEFAULT_EDGE_LENGTH_KM, remap_vertex_ids, incident_edge_stats,
+                           heuristic_node_labels, heuristic_edge_labels)
+from synthetic_trails import write_json_export
+
+def read_routing_graph(db_path: str) -> Dict[str, np.ndarray]:
+    """
+    Vertices and edges of a SQLite export: node_id [N] (sorted), node_xyz [N, 3],
+    source / target [E] (vertex ids, -1 for NULL) and length_km [E] (NaN for NULL).
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        nodes = np.array(conn.execute(
+            'SELECT id, lng, lat, COALESCE(elevation, 0) FROM routing_nodes ORDER BY id').fetchall(),
+            dtype=np.float64).reshape(-1, 4)
+        edges = np.array(conn.execute(
+            'SELECT IFNULL(source, -1), IFNULL(target, -1), length_km FROM routing_edges ORDER BY id').fetchall(),
+            dtype=np.float64).reshape(-1, 3)
+    finally:
+        conn.close()
+
+    # Vertex ids are read through float64 above; keep them exact
+    if len(nodes) and np.abs(nodes[:, 0]).max() >= 2 ** 53:
+        raise ValueError(f"{db_path} has vertex ids too large to read exactly")
+    return {
+        'node_id': nodes[:, 0].astype(np.int64),
+        'node_xyz': nodes[:, 1:],
+        'source': edges[:, 0].astype(np.int64),
+        'target': edges[:, 1].astype(np.int64),
+        'length_km': edges[:, 2],
+    }
+
+def stratified_masks(labels: np.ndarray, seed: int = 0, train_ratio: float = 0.7,
+                     val_ratio: float = 0.15) -> Dict[str, np.ndarray]:
+    """
+    Train/val/test masks that split every label class by the same ratios.
+    Nodes are shuffled, grouped by class with a stable sort, and each node's
+    rank within its class decides its split.
+    """
+    num_nodes = len(labels)
+    order = np.random.default_rng(seed).permutation(num_nodes)
+    order = order[np.argsort(labels[order], kind='stable')]
+    counts = np.bincount(labels, minlength=1)
+    class_start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    rank = np.empty(num_nodes, dtype=np.int64)
+    rank[order] = np.arange(num_nodes) - np.repeat(class_start, counts)
+    train_end = np.floor(counts * train_ratio).astype(np.int64)[labels]
+    val_end = train_end + np.floor(counts * val_ratio).astype(np.int64)[labels]
+    return {
+        'train_mask': rank < train_end,
+        'val_mask': (rank >= train_end) & (rank < val_end),
+        'test_mask': rank >= val_end,
+    }
+
+def training_arrays(graph: Dict[str, np.ndarray], seed: int = 0, train_ratio: float = 0.7,
+                    val_ratio: float = 0.15) -> Dict[str, np.ndarray]:
+    """Dataset arrays in the export layout: 5 node features, heuristic node and edge labels and stratified masks"""
+    node_ids = graph['node_id']
+    degree, avg_length = incident_edge_stats(node_ids, graph['source'], graph['target'], graph['length_km'])
+    labels = heuristic_node_labels(degree)
+
+    src_idx, src_found = remap_vertex_ids(node_ids, graph['source'])
+    dst_idx, dst_found = remap_vertex_ids(node_ids, graph['target'])
+    known = src_found & dst_found
+    src_idx, dst_idx = src_idx[known], dst_idx[known]
+    length_km = np.nan_to_num(graph['length_km'][known], nan=DEFAULT_EDGE_LENGTH_KM)
+
+    return {
+        'x': np.column_stack([graph['node_xyz'], degree, avg_length]).astype(np.float32),
+        'edge_index': np.stack([src_idx, dst_idx]).astype(np.int64),
+        'y': labels,
+        'edge_y': heuristic_edge_labels(degree[src_idx], degree[dst_idx], length_km),
+        'node_id': node_ids,
+        **stratified_masks(labels, seed, train_ratio, val_ratio)
+    }
+
+def dataset_metadata(arrays: Dict[str, np.ndarray], db_path: str, seed: int, train_ratio: float,
+                     val_ratio: float, dropped_edges: int) -> Dict[str, Any]:
+    return {
+        'num_nodes': int(len(arrays['y'])),
+        'num_edges': int(arrays['edge_index'].shape[1]),
+        'num_features': int(arrays['x'].shape[1]),
+        'schema': os.path.splitext(os.path.basename(db_path))[0],
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source_db': os.path.abspath(db_path),
+        'split': {'seed': seed, 'train_ratio': train_ratio, 'val_ratio': val_ratio, 'stratified': True},
+        'label_counts': np.bincount(arrays['y'], minlength=3).tolist(),
+        'dropped_edges': int(dropped_edges),
+        'edge_index': EDGE_INDEX_ROWS,
+    }
+
+def build_dataset(db_path: str, seed: int = 0, train_ratio: float = 0.7,
+                  val_ratio: float = 0.15) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Arrays and metadata of one region's training dataset"""
+    graph = read_routing_graph(db_path)
+    arrays = training_arrays(graph, seed, train_ratio, val_ratio)
+    dropped = len(graph['source']) - arrays['edge_index'].shape[1]
+    return arrays, dataset_metadata(arrays, db_path, seed, train_ratio, val_ratio, dropped)
+
+def output_path_for(db_path: str, output_dir: Optional[str] = None) -> str:
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(output_dir or os.path.dirname(db_path) or '.', stem + DATASET_SUFFIX)
+
+def build_region(db_path: str, output: str, seed: int, train_ratio: float, val_ratio: float,
+                 json_path: Optional[str] = None) -> Dict[str, Any]:
+    """Build and write one region; failures are returned rather than raised"""
+    start = time.time()
+    try:
+        arrays, metadata = build_dataset(db_path, seed, train_ratio, val_ratio)
+        write_binary_dataset(arrays, metadata, output)
+        if json_path:
+            write_json_export(arrays, metadata, json_path)
+    except Exception as e:
+        return {'db': db_path, 'ok': False, 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+    return {'db': db_path, 'ok': True, 'output': output, 'num_nodes': metadata['num_nodes'],
+            'num_edges': metadata['num_edges'], 'label_counts': metadata['label_counts'],
+            'dropped_edges': metadata['dropped_edges'], 'seconds': time.time() - start}
+
+def main():
+    parser = argparse.ArgumentParser(description='Build GraphSAGE datasets from SQLite exports without PostGIS')
+    parser.add_argument('db_paths', nargs='+', help='SQLite exports with routing_nodes / routing_edges')
+    parser.add_argument('--output', default=None, help='Binary dataset to write (single export only)')
+    parser.add_argument('--output-dir', default=None, help='Directory for <region>.graphsage (default: next to each export)')
+    parser.add_argument('--json', default=None, help='Also write a JSON export here (single export only)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the split')
+    parser.add_argument('--train-ratio', type=float, default=0.7, help='Share of each class used for training')
+    parser.add_argument('--val-ratio', type=float, default=0.15, help='Share of each class used for validation')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for many exports (default: one per core)')
+    args = parser.parse_args()
+
+    if (args.output or args.json) and len(args.db_paths) > 1:
+        parser.error('--output and --json take a single export, use --output-dir for many')
+    if args.train_ratio + args.val_ratio > 1:
+        parser.error('--train-ratio and --val-ratio add up to more than 1')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = [(db_path, args.output or output_path_for(db_path, args.output_dir), args.seed,
+             args.train_ratio, args.val_ratio, args.json) for db_path in args.db_paths]
+    workers = min(len(jobs), args.workers or os.cpu_count() or 1)
+
+    start = time.time()
+    results: List[Dict[str, Any]] = []
+    if workers == 1:
+        results = [build_region(*job) for job in jobs]
+    else:
+        print(f"🚀 Building {len(jobs)} datasets on {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_region, *job) for job in jobs]
+            results = [future.result() for future in as_completed(futures)]
+
+    for result in sorted(results, key=lambda r: r['db']):
+        if not result['ok']:
+            print(f"❌ {result['db']}: {result['error']}")
+            continue
+        print(f"✅ {result['db']}: {result['num_nodes']} nodes, {result['num_edges']} edges "
+              f"in {result['seconds']:.2f}s -> {result['output']}")
+        print(f"   • Labels (keep/merge/split): {result['label_counts']}")
+        if result['dropped_edges']:
+            print(f"   • {result['dropped_edges']} edges with an endpoint missing from routing_nodes left out")
+    if args.json and results[0]['ok']:
+        print(f"💾 JSON export saved to: {args.json}")
+
+    failed = sum(not result['ok'] for result in results)
+    print(f"🏁 {len(results) - failed}/{len(results)} datasets built in {time.time() - start:.2f}s")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
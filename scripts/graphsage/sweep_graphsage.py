@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+GraphSAGE Hyperparameter Sweep
+
+Compares model variants (the improved / balanced / high confidence
+architectures and friends) in one run instead of one script per variant.
+The dataset is converted to its binary form once and memory-mapped
+read-only by every worker of a process pool; each worker trains one
+configuration of the grid at a time. Confidence thresholds are applied to
+each trained model's softmax outputs, so they do not multiply training runs.
+
+Usage:
+    python scripts/graphsage/sweep_graphsage.py <export.json | dataset.graphsage> \\
+        --models graphsage balanced high_confidence --lrs 0.003 0.01 --split-weights 1.0 1.5 balanced
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List
+
+import torch
+import torch.nn.functional as F
+from sklearn.metrics import f1_score, precision_score, recall_score
+
+from graph_preprocess import load_canonical_arrays
+from feature_normalization import fit_normalizer, dataset_feature_stats
+from minibatch import MiniBatchRunner
+from node_features import LABEL_KEEP, LABEL_SPLIT_Y_T
+from train_distributed import MODEL_CHOICES, build_model, load_training_graph
+from train_graphsage_improved import compute_class_weights
+
+RANK_METRICS = ['macro_f1', 'test_accuracy', 'split_precision', 'split_recall', 'val_accuracy']
+
+# Graph and feature statistics loaded once per worker process by the pool initializer
+_graph = None
+_stats = None
+
+def _init_worker(data_path: str, threads: int):
+    global _graph, _stats
+    torch.set_num_threads(threads)
+    _graph = load_training_graph(data_path)
+    _stats = dataset_feature_stats(data_path, verbose=False)
+
+def class_weights_for(split_weight: str, y_train: torch.Tensor, num_classes: int) -> torch.Tensor:
+    """'balanced' for inverse-frequency weights, otherwise the weight of the Split Y/T class"""
+    if split_weight == 'balanced':
+        return compute_class_weights(y_train, num_classes)
+    weights = torch.ones(num_classes, dtype=torch.float)
+    if num_classes > LABEL_SPLIT_Y_T:
+        weights[LABEL_SPLIT_Y_T] = float(split_weight)
+    return weights
+
+def threshold_metrics(probabilities: torch.Tensor, y: torch.Tensor, mask: torch.Tensor, threshold: float) -> Dict[str, float]:
+    """Metrics on the masked nodes when predictions below `threshold` fall back to 'keep'"""
+    confidence, predictions = probabilities.max(dim=1)
+    predictions = torch.where(confidence >= threshold, predictions, torch.full_like(predictions, LABEL_KEEP))
+    y_true = y[mask].numpy()
+    y_pred = predictions[mask].numpy()
+    split_true = y_true == LABEL_SPLIT_Y_T
+    split_pred = y_pred == LABEL_SPLIT_Y_T
+    return {
+        'test_accuracy': float((y_true == y_pred).mean()) if len(y_true) else 0.0,
+        'macro_f1': float(f1_score(y_true, y_pred, average='macro', zero_division=0)),
+        'split_precision': float(precision_score(split_true, split_pred, zero_division=0)),
+        'split_recall': float(recall_score(split_true, split_pred, zero_division=0)),
+        'split_fraction': float((predictions == LABEL_SPLIT_Y_T).float().mean()),
+    }
+
+def run_config(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Train one configuration in this worker; returns a result row per confidence threshold"""
+    data = _graph
+    start = time.time()
+    torch.manual_seed(config['seed'])
+
+    num_classes = int(data.y.max()) + 1
+    model, criterion = build_model(config['model'], data.num_node_features, num_classes, config['hidden_dim'])
+    fit_normalizer(model, _stats, verbose=False)
+    weights = class_weights_for(config['split_weight'], data.y[data.train_mask], num_classes)
+    loss_fn = lambda out, target: criterion(out, target, weight=weights)
+    optimizer = torch.optim.Adam(model.parameters(), lr=config['lr'], weight_decay=config['weight_decay'])
+
+    runner = None
+    if config['batch_size']:
+        runner = MiniBatchRunner(model, data, config['batch_size'], config['fanout'], seed=config['seed'], verbose=False)
+
+    for _ in range(config['epochs']):
+        if runner is not None:
+            runner.train_epoch(optimizer, loss_fn, clip_grad_norm=1.0)
+        else:
+            model.train()
+            optimizer.zero_grad()
+            out = model(data.x, data.edge_index)
+            loss = loss_fn(out[data.train_mask], data.y[data.train_mask])
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+            optimizer.step()
+
+    model.eval()
+    with torch.no_grad():
+        out = runner.predict() if runner is not None else model(data.x, data.edge_index)
+        # The intersection model already returns log-probabilities
+        probabilities = out.exp() if config['model'] == 'intersection' else F.softmax(out, dim=1)
+    val_accuracy = float((probabilities[data.val_mask].argmax(dim=1) == data.y[data.val_mask]).float().mean())
+    train_time = time.time() - start
+
+    rows = []
+    for threshold in config['thresholds']:
+        row = {key: value for key, value in config.items() if key not in ('thresholds', 'seed', 'fanout')}
+        row.update({'confidence_threshold': threshold, 'val_accuracy': val_accuracy, 'train_time': train_time})
+        row.update(threshold_metrics(probabilities, data.y, data.test_mask, threshold))
+        rows.append(row)
+    return rows
+
+def build_grid(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Cartesian product of the swept options"""
+    grid = []
+    for model, hidden_dim, lr, split_weight in itertools.product(args.models, args.hidden_dims, args.lrs, args.split_weights):
+        grid.append({
+            'model': model,
+            'hidden_dim': hidden_dim,
+            'lr': lr,
+            'split_weight': split_weight,
+            'weight_decay': args.weight_decay,
+            'epochs': args.epochs,
+            'batch_size': args.batch_size,
+            'fanout': args.fanout,
+            'thresholds': args.thresholds,
+            'seed': args.seed,
+        })
+    return grid
+
+def print_ranked_table(rows: List[Dict[str, Any]], rank_by: str, top: int):
+    """Print the best result rows, best first"""
+    print(f"\n🏆 Sweep results ranked by {rank_by}:")
+    header = f"   {'#':>3}  {'model':<15} {'hidden':>6} {'lr':>7} {'split_w':>8} {'conf':>5}  " \
+             f"{'f1':>6} {'acc':>6} {'split_p':>7} {'split_r':>7} {'split%':>6} {'time':>7}"
+    print(header)
+    for i, row in enumerate(rows[:top], 1):
+        print(f"   {i:>3}  {row['model']:<15} {row['hidden_dim']:>6} {row['lr']:>7g} {row['split_weight']:>8} "
+              f"{row['confidence_threshold']:>5.2f}  {row['macro_f1']:>6.3f} {row['test_accuracy']:>6.3f} "
+              f"{row['split_precision']:>7.3f} {row['split_recall']:>7.3f} {row['split_fraction'] * 100:>5.1f}% "
+              f"{row['train_time']:>6.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep GraphSAGE variants in parallel over one shared dataset')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--models', nargs='+', choices=MODEL_CHOICES, default=['improved', 'balanced', 'high_confidence'], help='Architectures to sweep')
+    parser.add_argument('--hidden-dims', type=int, nargs='+', default=[64], help='Hidden dimension sizes')
+    parser.add_argument('--lrs', type=float, nargs='+', default=[0.003, 0.005, 0.01], help='Learning rates')
+    parser.add_argument('--split-weights', nargs='+', default=['1.0', '1.2', '1.5', 'balanced'], help="Split Y/T class weights, or 'balanced'")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.0, 0.8, 0.9], help='Confidence thresholds applied to each model')
+    parser.add_argument('--epochs', type=int, default=100, help='Training epochs per configuration')
+    parser.add_argument('--weight-decay', type=float, default=1e-4, help='Weight decay')
+    parser.add_argument('--batch-size', type=int, default=None, help='Neighbor-sampled mini-batch size (default: full graph)')
+    parser.add_argument('--fanout', type=int, nargs='+', default=None, help='Neighbors sampled per hop in mini-batch mode')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='Torch threads per worker process')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: cores / threads per worker)')
+    parser.add_argument('--rank-by', choices=RANK_METRICS, default='macro_f1', help='Metric used to rank results')
+    parser.add_argument('--top', type=int, default=20, help='Rows shown in the ranked table')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output-dir', default='test-output', help='Output directory for results')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"❌ Data file not found: {args.data_path}")
+        return
+
+    for split_weight in args.split_weights:
+        try:
+            if split_weight != 'balanced':
+                float(split_weight)
+        except ValueError:
+            parser.error(f"invalid split weight: {split_weight!r}")
+
+    # Convert, canonicalize and compute feature statistics once; workers memory-map the same binary dataset
+    arrays, _ = load_canonical_arrays(args.data_path)
+    dataset_feature_stats(args.data_path)
+    print(f"📁 Dataset: {len(arrays['y'])} nodes, {arrays['edge_index'].shape[1]} edges")
+
+    grid = build_grid(args)
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads_per_worker)
+    print(f"🚀 Sweeping {len(grid)} configurations x {len(args.thresholds)} thresholds on {workers} workers...")
+
+    start = time.time()
+    rows = []
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(args.data_path, args.threads_per_worker)) as pool:
+        futures = {pool.submit(run_config, config): config for config in grid}
+        for done, future in enumerate(as_completed(futures), 1):
+            config = futures[future]
+            label = f"{config['model']} hidden={config['hidden_dim']} lr={config['lr']:g} split_w={config['split_weight']}"
+            try:
+                config_rows = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"   ❌ [{done}/{len(grid)}] {label}: {e}")
+                continue
+            rows.extend(config_rows)
+            best = max(config_rows, key=lambda row: row[args.rank_by])
+            print(f"   ✅ [{done}/{len(grid)}] {label}: {args.rank_by}={best[args.rank_by]:.3f} ({best['train_time']:.1f}s)")
+    wall_time = time.time() - start
+
+    rows.sort(key=lambda row: row[args.rank_by], reverse=True)
+    print_ranked_table(rows, args.rank_by, args.top)
+
+    serial_time = sum(row['train_time'] for row in rows) / max(len(args.thresholds), 1)
+    print(f"\n⏱️  Wall-clock: {wall_time:.1f}s for {len(grid)} configurations "
+          f"(sum of training times {serial_time:.1f}s, {serial_time / max(wall_time, 1e-9):.1f}x parallel speedup)")
+    if failures:
+        print(f"⚠️  {failures} configurations failed")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, 'graphsage_sweep_results.json')
+    with open(output_path, 'w') as f:
+        json.dump({
+            'data_path': args.data_path,
+            'rank_by': args.rank_by,
+            'wall_time': wall_time,
+            'workers': workers,
+            'results': rows
+        }, f, indent=2)
+    print(f"💾 Sweep results saved to: {output_path}")
+
+if __name__ == '__main__':
+    main()
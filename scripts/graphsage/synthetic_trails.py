@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Synthetic Trail Network Generator
+
+Builds trail-like graphs of any size (1k to 10M+ vertices) for benchmarks
+and tests, without a database. The network is a jittered grid of junctions
+where each grid link is kept with some probability, so junctions have
+degree 1-4 (dead ends, Y/T junctions and crossings) and the graph stays
+close to planar. Every kept link becomes a trail: a chain of degree-2
+vertices that wiggles between its two junctions. Elevations come from a
+smooth random terrain field, and ids are 1-based like pgRouting vertex ids.
+
+Outputs the same artifacts the real pipeline produces: a binary dataset
+(graph_dataset.py), a JSON export in the GraphSAGEDataPreparationService
+layout, a SQLite database with route_recommendations for
+extract-routes.py, and the routing_nodes / routing_edges tables of the
+SQLite export for geometric_features.py.
+
+Usage:
+    python scripts/graphsage/synthetic_trails.py --nodes 1000000 --output test-output/synthetic-1m.graphsage
+    python scripts/graphsage/synthetic_trails.py --nodes 10000 --output synthetic.graphsage --json synthetic.json --routes-db routes.db
+    python scripts/graphsage/synthetic_trails.py --nodes 10000 --output synthetic.graphsage --routing-db synthetic.db
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import time
+from typing import Dict, Any
+
+import numpy as np
+
+from graph_dataset import write_binary_dataset
+from graph_preprocess import EDGE_INDEX_ROWS
+from node_features import incident_edge_stats, heuristic_node_labels, heuristic_edge_labels
+
+# Boulder, CO
+DEFAULT_ORIGIN = (-105.3, 40.0)
+KM_PER_DEGREE_LAT = 111.32
+
+def generate_trail_network(num_nodes: int, seed: int = 0, mean_chain: float = 6.0, keep_link: float = 0.75,
+                           cell_km: float = 0.4, origin=DEFAULT_ORIGIN) -> Dict[str, np.ndarray]:
+    """
+    Synthetic trail network with exactly `num_nodes` vertices.
+
+    Returns node_id [N], coords [N, 3] (lon, lat, elevation m), and per edge
+    source / target vertex ids and length_km. Vertices [0, num_junctions)
+    are the junctions; each trail's chain vertices are contiguous after them.
+    """
+    if num_nodes < 4:
+        raise ValueError('a synthetic trail network needs at least 4 vertices')
+    rng = np.random.default_rng(seed)
+
+    # Junction grid, sized so that junctions plus chains come to about num_nodes
+    links_per_junction = 2 * keep_link
+    num_junctions = max(4, min(num_nodes, int(num_nodes / (1 + links_per_junction * mean_chain))))
+    side = max(2, int(math.ceil(math.sqrt(num_junctions))))
+    num_junctions = min(side * side, num_nodes)
+    cell = np.arange(num_junctions)
+    row, col = cell // side, cell % side
+
+    # Keep right and up links at random, then attach isolated junctions to a neighbor
+    right = (col < side - 1) & (cell + 1 < num_junctions)
+    up = cell + side < num_junctions
+    keep_right = right & (rng.random(num_junctions) < keep_link)
+    keep_up = up & (rng.random(num_junctions) < keep_link)
+    degree = (keep_right.astype(np.int64) + keep_up
+              + np.bincount(cell[keep_right] + 1, minlength=num_junctions)
+              + np.bincount(cell[keep_up] + side, minlength=num_junctions))
+    isolated = degree == 0
+    keep_right |= isolated & right
+    keep_up |= isolated & ~right & up
+    keep_right[cell[isolated & ~right & ~up & (col > 0)] - 1] = True
+    link_a = np.concatenate([cell[keep_right], cell[keep_up]])
+    link_b = np.concatenate([cell[keep_right] + 1, cell[keep_up] + side])
+    num_links = len(link_a)
+
+    # Junctions in km, jittered off the grid so junction angles vary (Y vs T shapes)
+    junction_km = np.column_stack([col, row]).astype(np.float64) * cell_km
+    junction_km += rng.uniform(-0.3, 0.3, size=(num_junctions, 2)) * cell_km
+
+    # Spread the remaining vertices over the trails as degree-2 chains
+    chain_length = rng.multinomial(num_nodes - num_junctions, np.full(num_links, 1.0 / num_links)) \
+        if num_links else np.zeros(0, dtype=np.int64)
+    chain_start = num_junctions + np.concatenate([[0], np.cumsum(chain_length)[:-1]]).astype(np.int64)
+    owner = np.repeat(np.arange(num_links), chain_length)
+    rank = np.arange(len(owner)) - np.repeat(chain_start - num_junctions, chain_length)
+
+    # Chain vertices follow a sine wiggle around the straight line between the junctions
+    t = (rank + 1) / (chain_length[owner] + 1)
+    start, end = junction_km[link_a[owner]], junction_km[link_b[owner]]
+    direction = end - start
+    normal = np.column_stack([-direction[:, 1], direction[:, 0]])
+    amplitude = rng.uniform(-0.12, 0.12, size=num_links)[owner]
+    waves = rng.integers(1, 4, size=num_links)[owner]
+    chain_km = start + t[:, None] * direction + (amplitude * np.sin(np.pi * waves * t))[:, None] * normal
+    positions_km = np.concatenate([junction_km, chain_km])
+
+    # Segments: junction -> first chain vertex -> ... -> last chain vertex -> junction
+    chain_index = np.arange(num_junctions, num_nodes)
+    previous = np.where(rank == 0, link_a[owner], chain_index - 1)
+    last = np.where(chain_length > 0, chain_start + chain_length - 1, link_a)
+    sources = np.concatenate([previous, last])
+    targets = np.concatenate([chain_index, link_b])
+    length_km = np.hypot(*(positions_km[targets] - positions_km[sources]).T)
+
+    # Smooth terrain: a few random plane waves over a base elevation
+    terrain = np.full(num_nodes, 1800.0)
+    for amplitude_m, wavelength_km in [(250.0, 12.0), (80.0, 3.0), (15.0, 0.6)]:
+        angle, phase = rng.uniform(0, 2 * np.pi, size=2)
+        projected = positions_km @ np.array([np.cos(angle), np.sin(angle)])
+        terrain += amplitude_m * np.sin(2 * np.pi * projected / wavelength_km + phase)
+
+    lon0, lat0 = origin
+    coords = np.column_stack([
+        lon0 + positions_km[:, 0] / (KM_PER_DEGREE_LAT * np.cos(np.radians(lat0))),
+        lat0 + positions_km[:, 1] / KM_PER_DEGREE_LAT,
+        terrain
+    ])
+    return {
+        'node_id': np.arange(1, num_nodes + 1, dtype=np.int64),
+        'coords': coords,
+        'source': sources.astype(np.int64) + 1,
+        'target': targets.astype(np.int64) + 1,
+        'length_km': length_km,
+        'num_junctions': np.int64(num_junctions),
+        # Trails between junctions (0-based vertex indices)
+        'trail_a': link_a,
+        'trail_b': link_b,
+        'trail_start': chain_start,
+        'trail_length': chain_length,
+    }
+
+def training_arrays(graph: Dict[str, np.ndarray], seed: int = 0, train_ratio: float = 0.7,
+                    val_ratio: float = 0.15) -> Dict[str, np.ndarray]:
+    """Dataset arrays in the export layout: 5 node features, heuristic node and edge labels and random masks"""
+    node_ids = graph['node_id']
+    num_nodes = len(node_ids)
+    degree, avg_length = incident_edge_stats(node_ids, graph['source'], graph['target'], graph['length_km'])
+
+    order = np.random.default_rng(seed).permutation(num_nodes)
+    train_end = int(num_nodes * train_ratio)
+    val_end = train_end + int(num_nodes * val_ratio)
+    masks = {name: np.zeros(num_nodes, dtype=bool) for name in ('train_mask', 'val_mask', 'test_mask')}
+    masks['train_mask'][order[:train_end]] = True
+    masks['val_mask'][order[train_end:val_end]] = True
+    masks['test_mask'][order[val_end:]] = True
+
+    # Edges as tensor indices; node ids are 1-based and dense
+    return {
+        'x': np.column_stack([graph['coords'], degree, avg_length]).astype(np.float32),
+        'edge_index': np.stack([graph['source'] - 1, graph['target'] - 1]),
+        'y': heuristic_node_labels(degree),
+        'edge_y': heuristic_edge_labels(degree[graph['source'] - 1], degree[graph['target'] - 1], graph['length_km']),
+        'node_id': node_ids,
+        **masks
+    }
+
+def dataset_metadata(arrays: Dict[str, np.ndarray], seed: int) -> Dict[str, Any]:
+    return {
+        'num_nodes': int(len(arrays['y'])),
+        'num_edges': int(arrays['edge_index'].shape[1]),
+        'num_features': int(arrays['x'].shape[1]),
+        'schema': f"synthetic_{len(arrays['y'])}_{seed}",
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'edge_index': EDGE_INDEX_ROWS,
+        'synthetic': True
+    }
+
+def write_json_export(arrays: Dict[str, np.ndarray], metadata: Dict[str, Any], path: str, chunk_rows: int = 100000):
+    """Write arrays as a compact JSON export, chunk by chunk"""
+    def rows(values: np.ndarray, format_row) -> str:
+        return ','.join(format_row(value) for value in values)
+
+    with open(path, 'w') as f:
+        f.write('{"x":[')
+        x = arrays['x']
+        for start in range(0, len(x), chunk_rows):
+            if start:
+                f.write(',')
+            f.write(rows(x[start:start + chunk_rows].tolist(), lambda row: '[' + ','.join(map(repr, row)) + ']'))
+        f.write('],"edge_index":[')
+        pairs = arrays['edge_index'].T
+        for start in range(0, len(pairs), chunk_rows):
+            if start:
+                f.write(',')
+            f.write(','.join(map(str, pairs[start:start + chunk_rows].ravel().tolist())))
+        for name in ('y', 'edge_y', 'node_id', 'train_mask', 'val_mask', 'test_mask'):
+            f.write(f'],"{name}":[')
+            values = arrays[name]
+            for start in range(0, len(values), chunk_rows):
+                if start:
+                    f.write(',')
+                f.write(','.join(map(json.dumps, values[start:start + chunk_rows].tolist())))
+        f.write('],"metadata":' + json.dumps(metadata) + '}')
+
+def trail_coordinates(graph: Dict[str, np.ndarray], trail: int) -> list:
+    """[lon, lat, z] coordinates of one trail from junction to junction"""
+    start = graph['trail_start'][trail]
+    vertices = np.concatenate([
+        [graph['trail_a'][trail]],
+        np.arange(start, start + graph['trail_length'][trail]),
+        [graph['trail_b'][trail]]
+    ])
+    return graph['coords'][vertices].tolist()
+
+def multilinestring(graph: Dict[str, np.ndarray], num_trails: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """MultiLineString GeoJSON geometry made of `num_trails` random trails"""
+    trails = rng.integers(0, len(graph['trail_a']), size=num_trails)
+    return {
+        'type': 'MultiLineString',
+        'coordinates': [trail_coordinates(graph, int(trail)) for trail in trails]
+    }
+
+def write_routes_db(graph: Dict[str, np.ndarray], path: str, num_routes: int, seed: int = 0,
+                    trails_per_route: int = 8):
+    """SQLite database with a route_recommendations table as read by extract-routes.py"""
+    rng = np.random.default_rng(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("""
+            CREATE TABLE route_recommendations (
+                route_uuid TEXT PRIMARY KEY,
+                route_name TEXT,
+                route_path TEXT,
+                route_score REAL,
+                route_shape TEXT,
+                recommended_length_km REAL,
+                recommended_elevation_gain REAL,
+                trail_count INTEGER,
+                created_at TEXT
+            )
+        """)
+        shapes = ['loop', 'out-and-back', 'lollipop', 'point-to-point']
+        rows = []
+        for i in range(num_routes):
+            geometry = multilinestring(graph, trails_per_route, rng)
+            rows.append((
+                f"synthetic-{seed}-{i}",
+                f"Synthetic Route {i}",
+                json.dumps(geometry),
+                float(rng.random() * 100),
+                shapes[i % len(shapes)],
+                float(rng.uniform(2, 30)),
+                float(rng.uniform(50, 1500)),
+                int(rng.integers(1, 12)),
+                '2024-01-01T00:00:00'
+            ))
+        conn.executemany('INSERT INTO route_recommendations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+def write_routing_db(graph: Dict[str, np.ndarray], path: str):
+    """routing_nodes and routing_edges tables in the SQLite export layout (other tables are kept)"""
+    node_ids, coords = graph['node_id'], graph['coords']
+    degree = np.bincount(np.concatenate([graph['source'], graph['target']]) - 1, minlength=len(node_ids))
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('DROP TABLE IF EXISTS routing_nodes')
+        conn.execute('DROP TABLE IF EXISTS routing_edges')
+        conn.execute("""
+            CREATE TABLE routing_nodes (
+                id INTEGER PRIMARY KEY,
+                node_uuid TEXT UNIQUE,
+                lat REAL,
+                lng REAL,
+                elevation REAL,
+                node_type TEXT,
+                connected_trails TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE routing_edges (
+                id INTEGER PRIMARY KEY,
+                source INTEGER,
+                target INTEGER,
+                trail_id TEXT,
+                trail_name TEXT,
+                length_km REAL,
+                elevation_gain REAL,
+                elevation_loss REAL,
+                geojson TEXT
+            )
+        """)
+        conn.executemany('INSERT INTO routing_nodes VALUES (?, ?, ?, ?, ?, ?, ?)', (
+            (node_id, f"synthetic-node-{node_id}", lat, lng, elevation,
+             'endpoint' if d <= 1 else 'intersection', str(d))
+            for node_id, (lng, lat, elevation), d in zip(node_ids.tolist(), coords.tolist(), degree.tolist())
+        ))
+        # One straight segment per edge, as pgRouting leaves them after splitting at vertices
+        rise = coords[graph['target'] - 1, 2] - coords[graph['source'] - 1, 2]
+        conn.executemany('INSERT INTO routing_edges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            (i + 1, source, target, f"synthetic-trail-{i}", f"Synthetic Trail {i}", length_km,
+             max(gain, 0.0), max(-gain, 0.0),
+             json.dumps({'type': 'LineString', 'coordinates': [coords[source - 1].tolist(), coords[target - 1].tolist()]}))
+            for i, (source, target, length_km, gain) in enumerate(zip(
+                graph['source'].tolist(), graph['target'].tolist(), graph['length_km'].tolist(), rise.tolist()))
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+def describe(graph: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Vertex degree histogram and basic size stats"""
+    degree = np.bincount(np.concatenate([graph['source'], graph['target']]) - 1, minlength=len(graph['node_id']))
+    histogram = np.bincount(degree)
+    return {
+        'num_nodes': int(len(graph['node_id'])),
+        'num_edges': int(len(graph['source'])),
+        'degree_histogram': {int(d): int(count) for d, count in enumerate(histogram) if count},
+        'total_length_km': float(graph['length_km'].sum()),
+        'elevation_range_m': [float(graph['coords'][:, 2].min()), float(graph['coords'][:, 2].max())]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic trail network for benchmarks')
+    parser.add_argument('--nodes', type=int, default=10000, help='Number of vertices')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--mean-chain', type=float, default=6.0, help='Average degree-2 vertices per trail between junctions')
+    parser.add_argument('--output', required=True, help='Binary dataset directory to write (.graphsage)')
+    parser.add_argument('--json', default=None, help='Also write a JSON export here')
+    parser.add_argument('--routes-db', default=None, help='Also write a SQLite route_recommendations database here')
+    parser.add_argument('--routing-db', default=None, help='Also write routing_nodes / routing_edges tables to this SQLite database')
+    parser.add_argument('--routes', type=int, default=100, help='Number of routes in --routes-db')
+    args = parser.parse_args()
+
+    start = time.time()
+    graph = generate_trail_network(args.nodes, args.seed, args.mean_chain)
+    stats = describe(graph)
+    print(f"🗺️  Generated {stats['num_nodes']} vertices and {stats['num_edges']} edges in {time.time() - start:.2f}s")
+    print(f"   • Degree histogram: {stats['degree_histogram']}")
+    print(f"   • {stats['total_length_km']:.0f} km of trail, elevation "
+          f"{stats['elevation_range_m'][0]:.0f}-{stats['elevation_range_m'][1]:.0f} m")
+
+    arrays = training_arrays(graph, args.seed)
+    metadata = dataset_metadata(arrays, args.seed)
+    write_binary_dataset(arrays, metadata, args.output)
+    print(f"💾 Dataset saved to: {args.output}")
+
+    if args.json:
+        write_json_export(arrays, metadata, args.json)
+        print(f"💾 JSON export saved to: {args.json}")
+    if args.routes_db:
+        write_routes_db(graph, args.routes_db, args.routes, args.seed)
+        print(f"💾 Route database saved to: {args.routes_db}")
+    if args.routing_db:
+        write_routing_db(graph, args.routing_db)
+        print(f"💾 Routing tables saved to: {args.routing_db}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Distributed CPU Training for GraphSAGE
+
+Data-parallel training on CPU-only machines: one process per core group,
+each running neighbor-sampled mini-batches over its own shard of the
+training nodes, with gradients averaged over the gloo backend by
+DistributedDataParallel. Every worker memory-maps the same binary dataset,
+so the graph is held once in the page cache.
+
+Usage:
+    python scripts/graphsage/train_distributed.py <export.json | dataset.graphsage> --workers 8
+    python scripts/graphsage/train_distributed.py <export.json | dataset.graphsage> --benchmark 1 2 4 8
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import time
+from typing import Dict, Any, List, Tuple, Callable
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn.functional as F
+from torch.nn.parallel import DistributedDataParallel
+from torch_geometric.data import Data
+
+from graph_preprocess import load_canonical_arrays
+from feature_normalization import fit_normalizer, dataset_feature_stats
+from minibatch import MiniBatchRunner, DEFAULT_BATCH_SIZE
+from train_graphsage import GraphSAGEModel, save_predictions
+from train_graphsage_improved import ImprovedGraphSAGEModel
+from train_graphsage_balanced import BalancedGraphSAGEModel
+from train_graphsage_high_confidence import HighConfidenceGraphSAGEModel
+from train_intersection_graphsage import GraphSAGEModel as IntersectionGraphSAGEModel
+
+MODEL_CHOICES = ['graphsage', 'improved', 'balanced', 'high_confidence', 'intersection']
+
+# Cores per worker process when --workers is not given
+CORES_PER_WORKER = 4
+
+def build_model(name: str, num_features: int, num_classes: int, hidden_dim: int) -> Tuple[torch.nn.Module, Callable]:
+    """Instantiate one of the trainers' models together with its loss function"""
+    if name == 'intersection':
+        # Outputs log-probabilities
+        return IntersectionGraphSAGEModel(num_features, hidden_dim, num_classes), F.nll_loss
+
+    model_class = {
+        'graphsage': GraphSAGEModel,
+        'improved': ImprovedGraphSAGEModel,
+        'balanced': BalancedGraphSAGEModel,
+        'high_confidence': HighConfidenceGraphSAGEModel,
+    }[name]
+    return model_class(num_features, num_classes, hidden_dim), F.cross_entropy
+
+def load_training_graph(path: str) -> Data:
+    """Load a dataset as a Data object backed by memory-mapped arrays and its canonical edge list"""
+    arrays, _ = load_canonical_arrays(path)
+    data = Data(
+        x=torch.from_numpy(arrays['x']),
+        edge_index=torch.from_numpy(arrays['edge_index']),
+        y=torch.from_numpy(arrays['y'])
+    )
+    data.indptr = torch.from_numpy(arrays['indptr'])
+    data.train_mask = torch.from_numpy(arrays['train_mask'])
+    data.val_mask = torch.from_numpy(arrays['val_mask'])
+    data.test_mask = torch.from_numpy(arrays['test_mask'])
+    data.node_id = torch.from_numpy(arrays['node_id']) if 'node_id' in arrays else torch.arange(data.num_nodes)
+    return data
+
+def shard_batches(train_nodes: np.ndarray, rank: int, world_size: int, batch_size: int) -> List[np.ndarray]:
+    """
+    This worker's share of the (already shuffled) training nodes, split into
+    the same number of non-empty batches on every worker so the gradient
+    all-reduce calls line up.
+    """
+    shard = train_nodes[rank::world_size]
+    smallest_shard = len(train_nodes) // world_size
+    num_batches = max(1, math.ceil(smallest_shard / batch_size))
+    return np.array_split(shard, num_batches)
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def worker(rank: int, world_size: int, port: int, args: argparse.Namespace, results):
+    """Training loop of one data-parallel worker"""
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    torch.set_num_threads(args.threads_per_worker or max(1, (os.cpu_count() or 1) // world_size))
+
+    try:
+        data = load_training_graph(args.data_path)
+        num_classes = int(data.y.max()) + 1
+
+        # Same seed everywhere; DDP also broadcasts rank 0's weights on construction
+        torch.manual_seed(args.seed)
+        model, criterion = build_model(args.model, data.num_node_features, num_classes, args.hidden_dim)
+        fit_normalizer(model, dataset_feature_stats(args.data_path, verbose=False), verbose=rank == 0)
+        ddp_model = DistributedDataParallel(model)
+        optimizer = torch.optim.Adam(ddp_model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+
+        runner = MiniBatchRunner(ddp_model, data, args.batch_size, args.fanout,
+                                 seed=args.seed + rank, verbose=rank == 0)
+        eval_runner = MiniBatchRunner(model, data, args.batch_size, verbose=False) if rank == 0 else None
+
+        # Identical permutation on every worker, so the shards are disjoint
+        epoch_rng = np.random.default_rng(args.seed)
+        train_nodes = data.train_mask.nonzero().view(-1).numpy()
+        if len(train_nodes) < world_size:
+            raise ValueError(f"{len(train_nodes)} training nodes cannot be split across {world_size} workers")
+
+        epoch_times = []
+        for epoch in range(args.epochs):
+            start = time.time()
+            shuffled = train_nodes[epoch_rng.permutation(len(train_nodes))]
+            batches = shard_batches(shuffled, rank, world_size, args.batch_size)
+            loss = runner.train_batches(batches, optimizer, criterion)
+            dist.all_reduce(loss)
+            epoch_times.append(time.time() - start)
+
+            if rank == 0 and not args.benchmark and epoch % 10 == 0:
+                val_pred = eval_runner.predict(data.val_mask).argmax(dim=1)
+                val_acc = (val_pred == data.y[data.val_mask]).float().mean()
+                print(f"Epoch {epoch:3d}: Loss={loss.item() / world_size:.4f}, Val Acc={val_acc.item():.4f}, "
+                      f"{epoch_times[-1]:.2f}s")
+
+        if rank == 0:
+            result = {'workers': world_size, 'epoch_times': epoch_times}
+            if not args.benchmark:
+                result.update(finish_training(model, data, eval_runner, args))
+            results.put(result)
+        dist.barrier()
+    finally:
+        dist.destroy_process_group()
+
+def finish_training(model: torch.nn.Module, data: Data, runner: MiniBatchRunner,
+                    args: argparse.Namespace) -> Dict[str, Any]:
+    """Evaluate on the test nodes and save the model and predictions (rank 0 only)"""
+    probabilities = F.softmax(runner.predict(), dim=1)
+    predictions = probabilities.argmax(dim=1)
+    test_acc = (predictions[data.test_mask] == data.y[data.test_mask]).float().mean().item()
+    print(f"✅ Test Accuracy: {test_acc:.4f}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model_path = os.path.join(args.output_dir, f"distributed_{args.model}_model.pth")
+    torch.save(model.state_dict(), model_path)
+    save_predictions(
+        probabilities.numpy(),
+        os.path.join(args.output_dir, f"distributed_{args.model}_predictions.gspred"),
+        {
+            'test_accuracy': test_acc,
+            'source_path': os.path.abspath(args.data_path),
+            'num_nodes': int(data.num_nodes),
+            'num_edges': int(data.num_edges),
+            'num_features': int(data.num_node_features),
+            'num_classes': int(data.y.max().item() + 1),
+            'model': args.model,
+            'workers': args.workers
+        },
+        data.node_id.numpy()
+    )
+    return {'test_accuracy': test_acc, 'model_path': model_path}
+
+def run_workers(world_size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Spawn `world_size` workers and return rank 0's result"""
+    context = mp.get_context('spawn')
+    results = context.SimpleQueue()
+    workers = mp.spawn(worker, args=(world_size, find_free_port(), args, results), nprocs=world_size, join=False)
+
+    # Drain the queue while the workers run: rank 0's put() blocks once the
+    # result outgrows the pipe buffer, and the others wait for it at the barrier
+    result = None
+    while not workers.join(timeout=0.1):
+        if result is None and not results.empty():
+            result = results.get()
+    return result if result is not None else results.get()
+
+def mean_epoch_time(epoch_times: List[float]) -> float:
+    """Mean epoch time, skipping the first (warm-up) epoch when possible"""
+    timed = epoch_times[1:] if len(epoch_times) > 1 else epoch_times
+    return sum(timed) / len(timed)
+
+def benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Epoch time for each worker count in --benchmark"""
+    print(f"⏱️  Benchmarking {args.epochs} epochs with {args.benchmark} workers...")
+    rows = []
+    for world_size in args.benchmark:
+        result = run_workers(world_size, args)
+        rows.append({'workers': world_size, 'epoch_time': mean_epoch_time(result['epoch_times'])})
+        print(f"   • {world_size} workers: {rows[-1]['epoch_time']:.3f}s/epoch")
+
+    baseline = rows[0]['epoch_time'] * rows[0]['workers']
+    print("\n📊 Epoch time vs worker count:")
+    print(f"   {'workers':>7}  {'s/epoch':>8}  {'speedup':>7}  {'efficiency':>10}")
+    for row in rows:
+        row['speedup'] = baseline / row['epoch_time']
+        row['efficiency'] = row['speedup'] / row['workers']
+        print(f"   {row['workers']:>7}  {row['epoch_time']:>8.3f}  {row['speedup']:>6.2f}x  {row['efficiency']:>9.0%}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Data-parallel GraphSAGE training on CPU (gloo)')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--model', choices=MODEL_CHOICES, default='graphsage', help='Which trainer model to use')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // CORES_PER_WORKER), help='Worker processes')
+    parser.add_argument('--threads-per-worker', type=int, default=None, help='Torch threads per worker (default: cores / workers)')
+    parser.add_argument('--epochs', type=int, default=100, help='Number of training epochs')
+    parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
+    parser.add_argument('--lr', type=float, default=0.01, help='Learning rate')
+    parser.add_argument('--weight-decay', type=float, default=5e-4, help='Weight decay')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Seed nodes per mini-batch and worker')
+    parser.add_argument('--fanout', type=int, nargs='+', default=None, help='Neighbors sampled per hop, last value repeats (-1 = all)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--benchmark', type=int, nargs='+', default=None, help='Only time epochs for each of these worker counts')
+    parser.add_argument('--output-dir', default='test-output', help='Output directory for results')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"❌ Data file not found: {args.data_path}")
+        return
+
+    # Convert JSON exports, build the canonical graph and compute feature statistics once
+    # here rather than racing in every worker
+    load_canonical_arrays(args.data_path)
+    dataset_feature_stats(args.data_path)
+
+    if args.benchmark:
+        rows = benchmark(args)
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, 'distributed_benchmark.json')
+        with open(output_path, 'w') as f:
+            json.dump({'model': args.model, 'batch_size': args.batch_size, 'epochs': args.epochs, 'results': rows}, f, indent=2)
+        print(f"💾 Benchmark saved to: {output_path}")
+        return
+
+    print(f"🚀 Training {args.model} model for {args.epochs} epochs on {args.workers} workers...")
+    result = run_workers(args.workers, args)
+    print(f"\n🎉 Distributed GraphSAGE training complete!")
+    print(f"⏱️  Mean epoch time: {mean_epoch_time(result['epoch_times']):.3f}s")
+    print(f"💾 Model saved to: {result['model_path']}")
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,99 @@ import numpy as np
 import psycopg2
 from sklearn.metrics import accuracy_score, classification_report
 import argparse
+import io
 import os
-import random
+import time
 from typing import Dict, Any, Tuple, List
 import json
 
+from node_features import remap_vertex_ids, incident_edge_stats, heuristic_node_labels
+from graph_preprocess import canonical_edges, describe_report
+from feature_normalization import FeatureNormalizer, fit_normalizer, feature_statistics
+from minibatch import MiniBatchRunner
+from cluster_partition import ClusterBatchRunner, DEFAULT_CLUSTERS_PER_BATCH
+from model_registry import RegistryRun, add_registry_args, array_digest
+
+# Feature extraction strategies for node degree / average incident edge length
+FEATURE_MODES = ['legacy', 'union', 'bincount']
+
+# Accumulate this many bytes of COPY output before parsing a chunk
+COPY_CHUNK_BYTES = 8 << 20
+
+def graph_digest(node_features: np.ndarray, edge_index: np.ndarray, y: np.ndarray, node_ids: np.ndarray) -> str:
+    """Content hash of a graph loaded from PostGIS (it has no file to hash)"""
+    return array_digest({'x': np.asarray(node_features, dtype=np.float32), 'edge_index': edge_index,
+                         'y': y, 'node_id': node_ids})
+
+def split_masks(num_nodes: int, digest: str, train_ratio: float = 0.7,
+                val_ratio: float = 0.15) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Random train/val/test masks seeded from the graph digest. Every load of the
+    same graph holds out the same nodes, so a model reused from the registry is
+    still tested on nodes it was not trained on.
+    """
+    indices = torch.from_numpy(np.random.default_rng(int(digest[:16], 16)).permutation(num_nodes))
+    train_end = int(num_nodes * train_ratio)
+    val_end = train_end + int(num_nodes * val_ratio)
+    
+    train_mask = torch.zeros(num_nodes, dtype=torch.bool)
+    val_mask = torch.zeros(num_nodes, dtype=torch.bool)
+    test_mask = torch.zeros(num_nodes, dtype=torch.bool)
+    
+    train_mask[indices[:train_end]] = True
+    val_mask[indices[train_end:val_end]] = True
+    test_mask[indices[val_end:]] = True
+    return train_mask, val_mask, test_mask
+
+class CopyArrayWriter:
+    """
+    File-like sink for `COPY ... TO STDOUT` that parses the tab-separated text
+    stream into a float64 array chunk by chunk instead of building row tuples.
+    """
+    
+    _SEPARATORS = bytes.maketrans(b'\t\n', b',,')
+    
+    def __init__(self, num_columns: int, chunk_bytes: int = COPY_CHUNK_BYTES):
+        self.num_columns = num_columns
+        self.chunk_bytes = chunk_bytes
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        self.chunks: List[np.ndarray] = []
+    
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        if self.pending_bytes >= self.chunk_bytes:
+            self._parse_pending()
+    
+    def _parse_pending(self):
+        text = b''.join(self.pending)
+        self.pending = []
+        self.pending_bytes = 0
+        
+        # COPY delivers whole rows, but keep any partial trailing line just in case
+        cut = text.rfind(b'\n') + 1
+        if cut < len(text):
+            self.pending = [text[cut:]]
+            self.pending_bytes = len(text) - cut
+            text = text[:cut]
+        if not text:
+            return
+        
+        text = text.translate(self._SEPARATORS).rstrip(b',').replace(b'\\N', b'nan')
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+        if len(values) % self.num_columns:
+            raise ValueError(f"COPY output does not have {self.num_columns} columns per row")
+        self.chunks.append(values.reshape(-1, self.num_columns))
+    
+    def to_array(self) -> np.ndarray:
+        self._parse_pending()
+        if not self.chunks:
+            return np.empty((0, self.num_columns), dtype=np.float64)
+        return np.concatenate(self.chunks) if len(self.chunks) > 1 else self.chunks[0]
+
 class PostGISGraphLoader:
     """Load graph data directly from PostGIS database"""
     
@@ -41,15 +129,42 @@ class PostGISGraphLoader:
             self.connection.close()
             print("✅ Disconnected from database")
     
-    def load_graph_data(self, schema: str) -> Data:
-        """Load graph data directly from PostGIS"""
-        print(f"🔍 Loading graph data from schema: {schema}")
-        
-        cursor = self.connection.cursor()
+    def node_feature_query(self, schema: str, feature_mode: str = 'legacy') -> str:
+        """Query returning id, x, y, z, degree, avg_incident_edge_length per vertex"""
+        if feature_mode == 'union':
+            # One pass over the edges: each edge contributes a row per endpoint
+            # (once for self-loops), so the aggregate can use plain equality joins
+            return f"""
+        WITH incident AS (
+            SELECT source AS vertex_id, id, length_km
+            FROM {schema}.ways_noded
+            WHERE source IS NOT NULL
+            UNION ALL
+            SELECT target AS vertex_id, id, length_km
+            FROM {schema}.ways_noded
+            WHERE target IS NOT NULL AND target IS DISTINCT FROM source
+        ),
+        edge_stats AS (
+            SELECT 
+                vertex_id,
+                COUNT(id) as degree,
+                AVG(COALESCE(length_km, 0.1)) as avg_incident_edge_length
+            FROM incident
+            GROUP BY vertex_id
+        )
+        SELECT 
+            v.id,
+            ST_X(v.the_geom) as x,
+            ST_Y(v.the_geom) as y,
+            ST_Z(v.the_geom) as z,
+            COALESCE(s.degree, 0) as degree,
+            COALESCE(s.avg_incident_edge_length, 0.1) as avg_incident_edge_length
+        FROM {schema}.ways_noded_vertices_pgr v
+        LEFT JOIN edge_stats s ON s.vertex_id = v.id
+        ORDER BY v.id
+        """
         
-        # Load node features
-        print("   • Loading node features...")
-        node_query = f"""
+        return f"""
         WITH node_stats AS (
             SELECT 
                 v.id,
@@ -73,8 +188,54 @@ class PostGISGraphLoader:
         FROM node_stats
         ORDER BY id
         """
+    
+    def vertex_query(self, schema: str) -> str:
+        """Query returning id, x, y, z per vertex"""
+        return f"""
+        SELECT id, ST_X(the_geom), ST_Y(the_geom), ST_Z(the_geom)
+        FROM {schema}.ways_noded_vertices_pgr
+        ORDER BY id
+        """
+    
+    def edge_stats_query(self, schema: str) -> str:
+        """Query returning every edge's endpoints, length and whether its id is set"""
+        return f"""
+        SELECT 
+            COALESCE(source, -1),
+            COALESCE(target, -1),
+            length_km,
+            (id IS NOT NULL)::int
+        FROM {schema}.ways_noded
+        """
+    
+    def edge_query(self, schema: str) -> str:
+        """Query returning source, target vertex ids of routable edges"""
+        return f"""
+        SELECT source, target
+        FROM {schema}.ways_noded
+        WHERE source IS NOT NULL AND target IS NOT NULL
+        ORDER BY source, target
+        """
+    
+    def copy_query_to_array(self, query: str, num_columns: int) -> np.ndarray:
+        """Stream a query's rows with COPY into a float64 array"""
+        writer = CopyArrayWriter(num_columns)
+        cursor = self.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT", writer)
+        finally:
+            cursor.close()
+        return writer.to_array()
+    
+    def load_graph_data(self, schema: str, feature_mode: str = 'legacy') -> Data:
+        """Load graph data directly from PostGIS"""
+        print(f"🔍 Loading graph data from schema: {schema}")
         
-        cursor.execute(node_query)
+        cursor = self.connection.cursor()
+        
+        # Load node features
+        print("   • Loading node features...")
+        cursor.execute(self.node_feature_query(schema, feature_mode))
         node_rows = cursor.fetchall()
         
         # Convert to numpy arrays
@@ -88,14 +249,7 @@ class PostGISGraphLoader:
         
         # Load edge data
         print("   • Loading edge data...")
-        edge_query = f"""
-        SELECT source, target
-        FROM {schema}.ways_noded
-        WHERE source IS NOT NULL AND target IS NOT NULL
-        ORDER BY source, target
-        """
-        
-        cursor.execute(edge_query)
+        cursor.execute(self.edge_query(schema))
         edge_rows = cursor.fetchall()
         
         # Convert to edge index tensor format
@@ -104,9 +258,10 @@ class PostGISGraphLoader:
             if source in node_id_to_idx and target in node_id_to_idx:
                 edge_list.append([node_id_to_idx[source], node_id_to_idx[target]])
         
-        edge_index = torch.tensor(edge_list, dtype=torch.long).t().contiguous()
+        edge_index, _, report = canonical_edges(np.array(edge_list, dtype=np.int64).T, len(node_ids))
+        edge_index = torch.from_numpy(edge_index)
         
-        print(f"   • Loaded {len(edge_list)} edges")
+        print(f"   • Loaded {describe_report(report)}")
         
         # Generate node labels based on topology
         print("   • Generating node labels...")
@@ -125,20 +280,9 @@ class PostGISGraphLoader:
         
         # Generate train/val/test masks
         print("   • Generating train/val/test masks...")
-        num_nodes = len(node_ids)
-        indices = list(range(num_nodes))
-        random.shuffle(indices)
-        
-        train_end = int(num_nodes * 0.7)
-        val_end = train_end + int(num_nodes * 0.15)
-        
-        train_mask = torch.zeros(num_nodes, dtype=torch.bool)
-        val_mask = torch.zeros(num_nodes, dtype=torch.bool)
-        test_mask = torch.zeros(num_nodes, dtype=torch.bool)
-        
-        train_mask[indices[:train_end]] = True
-        val_mask[indices[train_end:val_end]] = True
-        test_mask[indices[val_end:]] = True
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        digest = graph_digest(node_features, edge_index.numpy(), y.numpy(), node_ids)
+        train_mask, val_mask, test_mask = split_masks(len(node_ids), digest)
         
         print(f"   • Training: {train_mask.sum().item()} nodes")
         print(f"   • Validation: {val_mask.sum().item()} nodes")
@@ -155,6 +299,112 @@ class PostGISGraphLoader:
             val_mask=val_mask,
             test_mask=test_mask
         )
+        data.node_id = torch.from_numpy(node_ids)
+        data.digest = digest
+        
+        print(f"✅ Graph loaded: {data.num_nodes} nodes, {data.num_edges} edges")
+        print(f"   • Features: {data.num_node_features}")
+        print(f"   • Classes: {data.y.max().item() + 1}")
+        
+        return data
+    
+    def load_node_features(self, schema: str, feature_mode: str = 'legacy') -> Tuple[np.ndarray, np.ndarray]:
+        """Stream node ids and the five node features with COPY"""
+        if feature_mode == 'bincount':
+            vertices = self.copy_query_to_array(self.vertex_query(schema), 4)
+            edges = self.copy_query_to_array(self.edge_stats_query(schema), 4)
+            node_ids = vertices[:, 0].astype(np.int64)
+            degree, avg_length = incident_edge_stats(
+                node_ids,
+                edges[:, 0].astype(np.int64),
+                edges[:, 1].astype(np.int64),
+                edges[:, 2],
+                edges[:, 3]
+            )
+            node_features = np.column_stack([vertices[:, 1:], degree, avg_length]).astype(np.float32)
+            return node_ids, node_features
+        
+        nodes = self.copy_query_to_array(self.node_feature_query(schema, feature_mode), 6)
+        return nodes[:, 0].astype(np.int64), np.ascontiguousarray(nodes[:, 1:], dtype=np.float32)
+    
+    def compare_feature_modes(self, schema: str) -> Dict[str, float]:
+        """Time every feature mode against the legacy OR-join and check the features match"""
+        print(f"⏱️  Comparing node feature modes on schema: {schema}")
+        
+        timings = {}
+        reference = None
+        for mode in FEATURE_MODES:
+            start = time.time()
+            node_ids, node_features = self.load_node_features(schema, mode)
+            timings[mode] = time.time() - start
+            
+            if reference is None:
+                reference = (node_ids, node_features)
+                print(f"   • {mode}: {timings[mode]:.2f}s")
+                continue
+            
+            identical = (
+                np.array_equal(reference[0], node_ids) and
+                reference[1].tobytes() == node_features.tobytes()
+            )
+            saved = timings['legacy'] - timings[mode]
+            print(f"   • {mode}: {timings[mode]:.2f}s (saved {saved:.2f}s, "
+                  f"{timings['legacy'] / max(timings[mode], 1e-9):.1f}x), "
+                  f"{'byte-identical' if identical else '⚠️  FEATURES DIFFER'}")
+        
+        return timings
+    
+    def load_topology(self, schema: str, feature_mode: str = 'legacy') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Stream node ids, node features and the remapped [2, E] edge index with COPY"""
+        # Stream node features
+        print(f"   • Streaming node features ({feature_mode} mode)...")
+        start = time.time()
+        node_ids, node_features = self.load_node_features(schema, feature_mode)
+        print(f"   • Loaded {len(node_ids)} nodes ({time.time() - start:.2f}s)")
+        
+        # Stream edges
+        print("   • Streaming edge data...")
+        start = time.time()
+        edges = self.copy_query_to_array(self.edge_query(schema), 2).astype(np.int64)
+        print(f"   • Streamed {len(edges)} edges ({time.time() - start:.2f}s)")
+        
+        # Remap vertex ids to tensor indices with a vectorized lookup
+        start = time.time()
+        src_idx, src_found = remap_vertex_ids(node_ids, edges[:, 0])
+        dst_idx, dst_found = remap_vertex_ids(node_ids, edges[:, 1])
+        valid = src_found & dst_found
+        edge_index, _, report = canonical_edges(np.stack([src_idx[valid], dst_idx[valid]]), len(node_ids))
+        print(f"   • Remapped {describe_report(report)} ({time.time() - start:.3f}s)")
+    
+        return node_ids, node_features, edge_index
+    
+    def load_graph_data_bulk(self, schema: str, feature_mode: str = 'legacy') -> Data:
+        """Load graph data with COPY streaming and vectorized NumPy post-processing"""
+        print(f"🔍 Bulk loading graph data from schema: {schema}")
+        node_ids, node_features, edge_index = self.load_topology(schema, feature_mode)
+        edge_index = torch.from_numpy(edge_index)
+    
+        # Generate node labels based on topology
+        y = torch.from_numpy(heuristic_node_labels(node_features[:, 3]))
+        
+        # Generate train/val/test masks
+        digest = graph_digest(node_features, edge_index.numpy(), y.numpy(), node_ids)
+        train_mask, val_mask, test_mask = split_masks(len(node_ids), digest)
+        
+        print(f"   • Training: {train_mask.sum().item()} nodes")
+        print(f"   • Validation: {val_mask.sum().item()} nodes")
+        print(f"   • Test: {test_mask.sum().item()} nodes")
+        
+        data = Data(
+            x=torch.from_numpy(node_features),
+            edge_index=edge_index,
+            y=y,
+            train_mask=train_mask,
+            val_mask=val_mask,
+            test_mask=test_mask
+        )
+        data.node_id = torch.from_numpy(node_ids)
+        data.digest = digest
         
         print(f"✅ Graph loaded: {data.num_nodes} nodes, {data.num_edges} edges")
         print(f"   • Features: {data.num_node_features}")
@@ -168,12 +418,16 @@ class GraphSAGEModel(torch.nn.Module):
     def __init__(self, num_features: int, num_classes: int, hidden_dim: int = 64):
         super(GraphSAGEModel, self).__init__()
         
+        # Standardizes the raw features; statistics are saved with the weights
+        self.normalizer = FeatureNormalizer(num_features)
         self.sage1 = GraphSAGE(num_features, hidden_dim, num_layers=2)
         self.sage2 = GraphSAGE(hidden_dim, hidden_dim, num_layers=2)
         self.classifier = torch.nn.Linear(hidden_dim, num_classes)
         self.dropout = torch.nn.Dropout(0.5)
         
     def forward(self, x, edge_index):
+        x = self.normalizer(x)
+        
         # GraphSAGE layers
         x = F.relu(self.sage1(x, edge_index))
         x = self.dropout(x)
@@ -184,7 +438,8 @@ class GraphSAGEModel(torch.nn.Module):
         x = self.classifier(x)
         return x
 
-def train_model(model: GraphSAGEModel, data: Data, epochs: int = 100) -> Dict[str, Any]:
+def train_model(model: GraphSAGEModel, data: Data, epochs: int = 100,
+                runner: MiniBatchRunner = None) -> Dict[str, Any]:
     """Train the GraphSAGE model"""
     print(f"🚀 Training GraphSAGE model for {epochs} epochs...")
     
@@ -196,22 +451,29 @@ def train_model(model: GraphSAGEModel, data: Data, epochs: int = 100) -> Dict[st
     
     model.train()
     for epoch in range(epochs):
-        optimizer.zero_grad()
-        
-        # Forward pass
-        out = model(data.x, data.edge_index)
-        loss = criterion(out[data.train_mask], data.y[data.train_mask])
-        
-        # Backward pass
-        loss.backward()
-        optimizer.step()
+        if runner is not None:
+            # Neighbor-sampled mini-batches over the training nodes
+            loss = runner.train_epoch(optimizer, criterion)
+        else:
+            optimizer.zero_grad()
+            
+            # Forward pass
+            out = model(data.x, data.edge_index)
+            loss = criterion(out[data.train_mask], data.y[data.train_mask])
+            
+            # Backward pass
+            loss.backward()
+            optimizer.step()
         
         # Validation
         if epoch % 10 == 0:
             model.eval()
             with torch.no_grad():
-                val_out = model(data.x, data.edge_index)
-                val_pred = val_out[data.val_mask].argmax(dim=1)
+                if runner is not None:
+                    val_pred = runner.predict(data.val_mask).argmax(dim=1)
+                else:
+                    val_out = model(data.x, data.edge_index)
+                    val_pred = val_out[data.val_mask].argmax(dim=1)
                 val_acc = (val_pred == data.y[data.val_mask]).float().mean()
                 
                 train_losses.append(loss.item())
@@ -226,21 +488,21 @@ def train_model(model: GraphSAGEModel, data: Data, epochs: int = 100) -> Dict[st
         'val_accuracies': val_accuracies
     }
 
-def evaluate_model(model: GraphSAGEModel, data: Data) -> Dict[str, Any]:
+def evaluate_model(model: GraphSAGEModel, data: Data, runner: MiniBatchRunner = None) -> Dict[str, Any]:
     """Evaluate the trained model"""
     print("📊 Evaluating model...")
     
     model.eval()
     with torch.no_grad():
-        out = model(data.x, data.edge_index)
+        out = runner.predict() if runner is not None else model(data.x, data.edge_index)
         
         # Test set evaluation
         test_pred = out[data.test_mask].argmax(dim=1)
         test_true = data.y[data.test_mask]
         test_acc = (test_pred == test_true).float().mean()
         
-        # Full dataset predictions
-        full_pred = out.argmax(dim=1)
+        # Full dataset predictions with softmax confidence of the predicted class
+        full_conf, full_pred = F.softmax(out, dim=1).max(dim=1)
         
         print(f"✅ Test Accuracy: {test_acc.item():.4f}")
         
@@ -255,60 +517,160 @@ def evaluate_model(model: GraphSAGEModel, data: Data) -> Dict[str, Any]:
         return {
             'test_accuracy': test_acc.item(),
             'predictions': full_pred.cpu().numpy(),
+            'confidences': full_conf.cpu().numpy(),
             'test_predictions': test_pred.cpu().numpy(),
             'test_true': test_true.cpu().numpy()
         }
 
-def save_predictions_to_db(predictions: np.ndarray, schema: str, db_config: Dict[str, str]):
-    """Save model predictions back to PostGIS database"""
+def predictions_table_ddl(schema: str, table: str = 'graphsage_predictions', if_not_exists: bool = False) -> str:
+    """CREATE TABLE statement for a predictions table"""
+    return f"""
+    CREATE TABLE {'IF NOT EXISTS ' if if_not_exists else ''}{schema}.{table} (
+        node_id INTEGER,
+        prediction INTEGER,
+        confidence REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+
+def predictions_copy_buffer(node_ids: np.ndarray, predictions: np.ndarray, confidences: np.ndarray) -> io.BytesIO:
+    """Encode predictions as tab-separated `COPY ... FROM STDIN` text"""
+    rows = zip(
+        np.asarray(node_ids, dtype=np.int64).tolist(),
+        np.asarray(predictions, dtype=np.int64).tolist(),
+        np.round(np.asarray(confidences, dtype=np.float64), 6).tolist()
+    )
+    return io.BytesIO(''.join(f"{node_id}\t{pred}\t{conf}\n" for node_id, pred, conf in rows).encode())
+
+def save_predictions_to_db(predictions: np.ndarray, schema: str, db_config: Dict[str, str],
+                           node_ids: np.ndarray = None, confidences: np.ndarray = None,
+                           atomic_swap: bool = False):
+    """
+    Save model predictions back to PostGIS with a single COPY.
+    
+    `node_ids` are the ways_noded_vertices_pgr ids aligned with the predictions
+    and `confidences` the softmax probability of each predicted class. With
+    `atomic_swap` the rows are loaded into a staging table that replaces
+    graphsage_predictions in the same transaction, so readers never see a
+    partially written table.
+    """
     print(f"💾 Saving predictions to PostGIS schema: {schema}")
     
+    if node_ids is None:
+        print("⚠️  No node ids supplied, falling back to tensor indices")
+        node_ids = np.arange(len(predictions))
+    if confidences is None:
+        print("⚠️  No confidences supplied, storing NULL confidence")
+        confidences = np.full(len(predictions), np.nan)
+    if not (len(node_ids) == len(predictions) == len(confidences)):
+        raise ValueError("node_ids, predictions and confidences must have the same length")
+    
+    start = time.time()
     connection = psycopg2.connect(**db_config)
-    cursor = connection.cursor()
     
     try:
-        # Create predictions table
-        create_table_query = f"""
-        CREATE TABLE IF NOT EXISTS {schema}.graphsage_predictions (
-            node_id INTEGER,
+        write_predictions(connection, schema, node_ids, predictions, confidences, atomic_swap)
+        print(f"✅ Saved {len(predictions)} predictions to {schema}.graphsage_predictions "
+              f"({time.time() - start:.2f}s{', atomic swap' if atomic_swap else ''})")
+        
+    except Exception as e:
+        print(f"❌ Error saving predictions: {e}")
+    finally:
+        connection.close()
+
+def write_edge_predictions(connection, schema: str, sources: np.ndarray, targets: np.ndarray,
+                           predictions: np.ndarray, confidences: np.ndarray):
+    """
+    Replace graphsage_edge_predictions over an open connection with a single COPY.
+    Does not commit, so the edges land in the same transaction as a following
+    write_predictions().
+    """
+    rows = zip(
+        np.asarray(sources, dtype=np.int64).tolist(),
+        np.asarray(targets, dtype=np.int64).tolist(),
+        np.asarray(predictions, dtype=np.int64).tolist(),
+        np.round(np.asarray(confidences, dtype=np.float64), 6).tolist()
+    )
+    buffer = io.BytesIO(''.join(f"{source}\t{target}\t{pred}\t{conf}\n" for source, target, pred, conf in rows).encode())
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.graphsage_edge_predictions (
+            source INTEGER,
+            target INTEGER,
             prediction INTEGER,
             confidence REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
-        """
-        cursor.execute(create_table_query)
+        """)
+        cursor.execute(f"DELETE FROM {schema}.graphsage_edge_predictions")
+        cursor.copy_expert(
+            f"COPY {schema}.graphsage_edge_predictions (source, target, prediction, confidence) FROM STDIN WITH (NULL 'nan')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def write_predictions(connection, schema: str, node_ids: np.ndarray, predictions: np.ndarray,
+                      confidences: np.ndarray, atomic_swap: bool = False):
+    """Replace graphsage_predictions over an open connection and commit; rolls back and raises on error"""
+    buffer = predictions_copy_buffer(node_ids, predictions, confidences)
+    table = 'graphsage_predictions_new' if atomic_swap else 'graphsage_predictions'
+    cursor = connection.cursor()
+    
+    try:
+        if atomic_swap:
+            cursor.execute(f"DROP TABLE IF EXISTS {schema}.{table}")
+            cursor.execute(predictions_table_ddl(schema, table))
+        else:
+            # Create predictions table
+            cursor.execute(predictions_table_ddl(schema, table, if_not_exists=True))
+            
+            # Clear existing predictions
+            cursor.execute(f"DELETE FROM {schema}.{table}")
         
-        # Clear existing predictions
-        cursor.execute(f"DELETE FROM {schema}.graphsage_predictions")
+        # Bulk load all predictions in one round trip ('nan' confidences become NULL)
+        cursor.copy_expert(
+            f"COPY {schema}.{table} (node_id, prediction, confidence) FROM STDIN WITH (NULL 'nan')",
+            buffer
+        )
         
-        # Insert new predictions
-        # Note: This is a simplified version - in practice you'd want to map back to actual node IDs
-        for idx, pred in enumerate(predictions):
-            cursor.execute(f"""
-                INSERT INTO {schema}.graphsage_predictions (node_id, prediction, confidence)
-                VALUES (%s, %s, %s)
-            """, (idx, int(pred), 0.8))  # Simplified confidence score
+        if atomic_swap:
+            # Index after loading, then swap the tables before committing
+            cursor.execute(f"ALTER TABLE {schema}.{table} ADD PRIMARY KEY (node_id)")
+            cursor.execute(f"DROP TABLE IF EXISTS {schema}.graphsage_predictions")
+            cursor.execute(f"ALTER TABLE {schema}.{table} RENAME TO graphsage_predictions")
+            cursor.execute(f"ALTER INDEX {schema}.{table}_pkey RENAME TO graphsage_predictions_pkey")
         
         connection.commit()
-        print(f"✅ Saved {len(predictions)} predictions to {schema}.graphsage_predictions")
         
-    except Exception as e:
-        print(f"❌ Error saving predictions: {e}")
+    except Exception:
         connection.rollback()
+        raise
     finally:
         cursor.close()
-        connection.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Train GraphSAGE model directly from PostGIS')
     parser.add_argument('schema', help='PostGIS schema name')
     parser.add_argument('--epochs', type=int, default=100, help='Number of training epochs')
     parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
+    parser.add_argument('--batch-size', type=int, default=None, help='Train on neighbor-sampled mini-batches of this many seed nodes (default: full graph)')
+    parser.add_argument('--fanout', type=int, nargs='+', default=None, help='Neighbors sampled per hop in mini-batch mode, last value repeats (-1 = all)')
+    parser.add_argument('--partitions', type=int, default=None, help='Train on groups of this many spatial clusters instead (partition cached per dataset)')
+    parser.add_argument('--clusters-per-batch', type=int, default=DEFAULT_CLUSTERS_PER_BATCH, help='Spatial clusters per step in partitioned mode')
+    parser.add_argument('--halo-hops', type=int, default=1, help='Hops of neighbors outside the clusters included as halo in partitioned mode')
     parser.add_argument('--host', default='localhost', help='Database host')
     parser.add_argument('--port', default='5432', help='Database port')
     parser.add_argument('--database', default='trail_master_db', help='Database name')
     parser.add_argument('--user', default='postgres', help='Database user')
     parser.add_argument('--password', default='', help='Database password')
+    parser.add_argument('--bulk-load', action='store_true', help='Stream nodes and edges with COPY into NumPy arrays (faster on large schemas)')
+    parser.add_argument('--feature-mode', choices=FEATURE_MODES, default='legacy',
+                        help='Node degree feature extraction: legacy OR-join, UNION ALL aggregate, or NumPy bincount (implies --bulk-load)')
+    parser.add_argument('--compare-feature-modes', action='store_true', help='Time all feature modes and verify they produce identical features')
+    add_registry_args(parser)
+    parser.add_argument('--swap-predictions', action='store_true', help='Load predictions into a new table and swap it in atomically')
     
     args = parser.parse_args()
     
@@ -325,7 +687,13 @@ def main():
     loader = PostGISGraphLoader(db_config)
     try:
         loader.connect()
-        data = loader.load_graph_data(args.schema)
+        if args.compare_feature_modes:
+            loader.compare_feature_modes(args.schema)
+        
+        if args.bulk_load or args.feature_mode == 'bincount':
+            data = loader.load_graph_data_bulk(args.schema, args.feature_mode)
+        else:
+            data = loader.load_graph_data(args.schema, args.feature_mode)
         
         # Create model
         model = GraphSAGEModel(
@@ -333,20 +701,34 @@ def main():
             num_classes=data.y.max().item() + 1,
             hidden_dim=args.hidden_dim
         )
+        fit_normalizer(model, feature_statistics(data.x.numpy()))
         
         print(f"🏗️  Model created with {sum(p.numel() for p in model.parameters())} parameters")
         
-        # Train model
-        training_history = train_model(model, data, args.epochs)
+        # Mini-batch and partitioned modes bound memory by batch size instead of graph size
+        runner = None
+        if args.partitions:
+            runner = ClusterBatchRunner(model, data, args.partitions, args.clusters_per_batch, args.halo_hops)
+        elif args.batch_size:
+            runner = MiniBatchRunner(model, data, args.batch_size, args.fanout)
+        
+        # Train model, unless this graph and config already have a registered one. The
+        # split is seeded from the graph digest, so the digest covers the masks too.
+        run = RegistryRun(args, 'direct', lambda: data.digest)
+        training_history = run.train_or_restore(model, lambda: train_model(model, data, args.epochs, runner))
         
         # Evaluate model
-        evaluation_results = evaluate_model(model, data)
+        evaluation_results = evaluate_model(model, data, runner)
+        run.store(model, {'test_accuracy': evaluation_results['test_accuracy'], 'history': training_history})
         
         # Save predictions back to database
         save_predictions_to_db(
             evaluation_results['predictions'],
             args.schema,
-            db_config
+            db_config,
+            node_ids=data.node_id.numpy(),
+            confidences=evaluation_results['confidences'],
+            atomic_swap=args.swap_predictions
         )
         
         print(f"\n🎉 GraphSAGE training complete!")
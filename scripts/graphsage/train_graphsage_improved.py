@@ -6,7 +6,6 @@ This script addresses the class imbalance issue and trains a more aggressive mod
 that can properly identify Y/T intersections and degree-2 nodes for splitting/merging.
 """
 
-import json
 import torch
 import torch.nn.functional as F
 from torch_geometric.nn import GraphSAGE
@@ -19,51 +18,43 @@ import argparse
 import os
 from typing import Dict, Any, Tuple
 
-def load_graphsage_data(json_path: str) -> Data:
-    """Load GraphSAGE data from JSON export"""
+from graph_preprocess import load_canonical_arrays
+from feature_normalization import FeatureNormalizer, fit_normalizer, dataset_feature_stats
+from minibatch import MiniBatchRunner
+from cluster_partition import ClusterBatchRunner, DEFAULT_CLUSTERS_PER_BATCH
+from training_profiler import TrainingProfiler, NULL_PROFILER, add_profile_args, profiler_from_args
+from model_registry import RegistryRun, add_registry_args, dataset_digest
+from prediction_artifact import write_prediction_artifact
+
+def load_graphsage_data(json_path: str, profiler: TrainingProfiler = NULL_PROFILER) -> Data:
+    """Load GraphSAGE data from a JSON export or binary dataset"""
     print(f"📁 Loading GraphSAGE data from: {json_path}")
     
-    with open(json_path, 'r') as f:
-        data_dict = json.load(f)
-    
-    # Convert to PyTorch tensors
-    x = torch.tensor(data_dict['x'], dtype=torch.float)
-    edge_index = torch.tensor(data_dict['edge_index'], dtype=torch.long).view(2, -1)
-    y = torch.tensor(data_dict['y'], dtype=torch.long)
-    train_mask = torch.tensor(data_dict['train_mask'], dtype=torch.bool)
-    val_mask = torch.tensor(data_dict['val_mask'], dtype=torch.bool)
-    test_mask = torch.tensor(data_dict['test_mask'], dtype=torch.bool)
-    
-    # Validate and filter edge indices
-    num_nodes = x.size(0)
-    print(f"🔍 Validating edge indices (max node index: {num_nodes - 1})...")
-    
-    # Check for invalid edge indices
-    max_edge_index = edge_index.max().item()
-    min_edge_index = edge_index.min().item()
-    
-    if max_edge_index >= num_nodes or min_edge_index < 0:
-        print(f"⚠️  Found invalid edge indices: min={min_edge_index}, max={max_edge_index}")
-        print(f"   Filtering out edges with invalid node indices...")
-        
-        # Filter out edges with invalid node indices
-        valid_edges = (edge_index[0] < num_nodes) & (edge_index[1] < num_nodes) & (edge_index[0] >= 0) & (edge_index[1] >= 0)
-        edge_index = edge_index[:, valid_edges]
+    # Memory-mapped arrays with the canonical edge list (both built once and cached)
+    with profiler.phase('load_dataset'):
+        arrays, _ = load_canonical_arrays(json_path)
+    
+    with profiler.phase('build_tensors'):
+        # Wrap as PyTorch tensors without copying
+        x = torch.from_numpy(arrays['x'])
+        edge_index = torch.from_numpy(arrays['edge_index'])
+        y = torch.from_numpy(arrays['y'])
+        train_mask = torch.from_numpy(arrays['train_mask'])
+        val_mask = torch.from_numpy(arrays['val_mask'])
+        test_mask = torch.from_numpy(arrays['test_mask'])
         
-        print(f"   ✅ Filtered to {edge_index.size(1)} valid edges (removed {valid_edges.sum().item() - edge_index.size(1)} invalid edges)")
-    
-    # Ensure edge indices are within valid range
-    edge_index = torch.clamp(edge_index, 0, num_nodes - 1)
-    
-    # Create PyTorch Geometric Data object
-    data = Data(
-        x=x,
-        edge_index=edge_index,
-        y=y,
-        train_mask=train_mask,
-        val_mask=val_mask,
-        test_mask=test_mask
-    )
+        # Create PyTorch Geometric Data object
+        data = Data(
+            x=x,
+            edge_index=edge_index,
+            y=y,
+            train_mask=train_mask,
+            val_mask=val_mask,
+            test_mask=test_mask
+        )
+        data.indptr = torch.from_numpy(arrays['indptr'])
+        # Vertex ids for the prediction artifact (row positions if the export has none)
+        data.node_id = torch.from_numpy(arrays['node_id']) if 'node_id' in arrays else torch.arange(data.num_nodes)
     
     print(f"✅ Loaded graph with {data.num_nodes} nodes and {data.num_edges} edges")
     print(f"   • Features: {data.num_node_features}")
@@ -80,6 +71,9 @@ class ImprovedGraphSAGEModel(torch.nn.Module):
     def __init__(self, num_features: int, num_classes: int, hidden_dim: int = 128):
         super(ImprovedGraphSAGEModel, self).__init__()
         
+        # Standardizes the raw features; statistics are saved with the weights
+        self.normalizer = FeatureNormalizer(num_features)
+        
         # Deeper network with more capacity
         self.sage1 = GraphSAGE(num_features, hidden_dim, num_layers=2)
         self.sage2 = GraphSAGE(hidden_dim, hidden_dim, num_layers=2)
@@ -94,6 +88,8 @@ class ImprovedGraphSAGEModel(torch.nn.Module):
         )
         
     def forward(self, x, edge_index):
+        x = self.normalizer(x)
+        
         # GraphSAGE layers with residual connections
         x1 = F.relu(self.sage1(x, edge_index))
         x2 = F.relu(self.sage2(x1, edge_index))
@@ -123,7 +119,8 @@ def compute_class_weights(y_train, num_classes):
     
     return full_weights
 
-def train_model_improved(model: ImprovedGraphSAGEModel, data: Data, epochs: int = 200) -> Dict[str, Any]:
+def train_model_improved(model: ImprovedGraphSAGEModel, data: Data, epochs: int = 200,
+                         runner: MiniBatchRunner = None, profiler: TrainingProfiler = NULL_PROFILER) -> Dict[str, Any]:
     """Train the improved GraphSAGE model with better handling of imbalanced data"""
     print(f"🚀 Training improved GraphSAGE model for {epochs} epochs...")
     
@@ -149,23 +146,37 @@ def train_model_improved(model: ImprovedGraphSAGEModel, data: Data, epochs: int
     
     model.train()
     for epoch in range(epochs):
-        optimizer.zero_grad()
-        
-        # Forward pass
-        out = model(data.x, data.edge_index)
-        loss = criterion(out[data.train_mask], data.y[data.train_mask])
-        
-        # Backward pass
-        loss.backward()
-        torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
-        optimizer.step()
+        profiler.start_epoch()
+        val_acc = None
+        early_stop = False
+        if runner is not None:
+            # Neighbor-sampled mini-batches over the training nodes
+            with profiler.phase('train_batches'):
+                loss = runner.train_epoch(optimizer, criterion, clip_grad_norm=1.0)
+        else:
+            optimizer.zero_grad()
+            
+            # Forward pass
+            with profiler.phase('forward'):
+                out = model(data.x, data.edge_index)
+                loss = criterion(out[data.train_mask], data.y[data.train_mask])
+            
+            # Backward pass
+            with profiler.phase('backward'):
+                loss.backward()
+            with profiler.phase('optimizer'):
+                torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+                optimizer.step()
         
         # Validation
         if epoch % 10 == 0:
             model.eval()
-            with torch.no_grad():
-                val_out = model(data.x, data.edge_index)
-                val_pred = val_out[data.val_mask].argmax(dim=1)
+            with torch.no_grad(), profiler.phase('validation'):
+                if runner is not None:
+                    val_pred = runner.predict(data.val_mask).argmax(dim=1)
+                else:
+                    val_out = model(data.x, data.edge_index)
+                    val_pred = val_out[data.val_mask].argmax(dim=1)
                 val_acc = (val_pred == data.y[data.val_mask]).float().mean()
                 
                 train_losses.append(loss.item())
@@ -183,11 +194,15 @@ def train_model_improved(model: ImprovedGraphSAGEModel, data: Data, epochs: int
                 else:
                     patience_counter += 1
                     
-                if patience_counter >= 50:  # Stop if no improvement for 50 epochs
-                    print(f"Early stopping at epoch {epoch}")
-                    break
+                # Stop if no improvement for 50 epochs
+                early_stop = patience_counter >= 50
             
             model.train()
+        
+        profiler.end_epoch(epoch, data.num_nodes, loss=loss.item(), val_acc=val_acc)
+        if early_stop:
+            print(f"Early stopping at epoch {epoch}")
+            break
     
     return {
         'train_losses': train_losses,
@@ -195,13 +210,14 @@ def train_model_improved(model: ImprovedGraphSAGEModel, data: Data, epochs: int
         'best_val_acc': best_val_acc
     }
 
-def evaluate_model_improved(model: ImprovedGraphSAGEModel, data: Data) -> Dict[str, Any]:
+def evaluate_model_improved(model: ImprovedGraphSAGEModel, data: Data,
+                            runner: MiniBatchRunner = None) -> Dict[str, Any]:
     """Evaluate the trained model with detailed analysis"""
     print("📊 Evaluating improved model...")
     
     model.eval()
     with torch.no_grad():
-        out = model(data.x, data.edge_index)
+        out = runner.predict() if runner is not None else model(data.x, data.edge_index)
         
         # Test set evaluation
         test_pred = out[data.test_mask].argmax(dim=1)
@@ -241,35 +257,37 @@ def evaluate_model_improved(model: ImprovedGraphSAGEModel, data: Data) -> Dict[s
         return {
             'test_accuracy': test_acc.item(),
             'predictions': full_pred.cpu().numpy(),
+            'probabilities': F.softmax(out, dim=1).cpu().numpy(),
             'test_predictions': test_pred.cpu().numpy(),
             'test_true': test_true.cpu().numpy()
         }
 
-def save_predictions(predictions: np.ndarray, output_path: str, metadata: Dict[str, Any]):
-    """Save model predictions back to JSON format for PostGIS import"""
+def save_predictions(probabilities: np.ndarray, output_path: str, metadata: Dict[str, Any],
+                     node_ids: np.ndarray = None, predictions: np.ndarray = None):
+    """Save class probabilities as a prediction artifact for PostGIS import"""
     print(f"💾 Saving predictions to: {output_path}")
     
-    # Create prediction data structure
-    prediction_data = {
-        'predictions': predictions.tolist(),
-        'metadata': {
-            **metadata,
-            'model_type': 'ImprovedGraphSAGE',
-            'prediction_timestamp': __import__('datetime').datetime.now().isoformat()
-        }
-    }
-    
-    with open(output_path, 'w') as f:
-        json.dump(prediction_data, f, indent=2)
+    write_prediction_artifact(output_path, probabilities, node_ids, {
+        **metadata,
+        'model_type': 'ImprovedGraphSAGE',
+        'prediction_timestamp': __import__('datetime').datetime.now().isoformat()
+    }, predictions=predictions)
     
     print("✅ Predictions saved!")
 
 def main():
     parser = argparse.ArgumentParser(description='Train improved GraphSAGE model for trail network analysis')
-    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
     parser.add_argument('--epochs', type=int, default=200, help='Number of training epochs')
     parser.add_argument('--hidden-dim', type=int, default=128, help='Hidden dimension size')
+    parser.add_argument('--batch-size', type=int, default=None, help='Train on neighbor-sampled mini-batches of this many seed nodes (default: full graph)')
+    parser.add_argument('--fanout', type=int, nargs='+', default=None, help='Neighbors sampled per hop in mini-batch mode, last value repeats (-1 = all)')
+    parser.add_argument('--partitions', type=int, default=None, help='Train on groups of this many spatial clusters instead (partition cached per dataset)')
+    parser.add_argument('--clusters-per-batch', type=int, default=DEFAULT_CLUSTERS_PER_BATCH, help='Spatial clusters per step in partitioned mode')
+    parser.add_argument('--halo-hops', type=int, default=1, help='Hops of neighbors outside the clusters included as halo in partitioned mode')
     parser.add_argument('--output-dir', default='test-output', help='Output directory for results')
+    add_registry_args(parser)
+    add_profile_args(parser)
     
     args = parser.parse_args()
     
@@ -278,8 +296,10 @@ def main():
         print(f"❌ Data file not found: {args.data_path}")
         return
     
+    profiler = profiler_from_args(args, args.output_dir)
+    
     # Load data
-    data = load_graphsage_data(args.data_path)
+    data = load_graphsage_data(args.data_path, profiler)
     
     # Create improved model
     model = ImprovedGraphSAGEModel(
@@ -287,31 +307,49 @@ def main():
         num_classes=data.y.max().item() + 1,
         hidden_dim=args.hidden_dim
     )
+    fit_normalizer(model, dataset_feature_stats(args.data_path))
     
     print(f"🏗️  Improved model created with {sum(p.numel() for p in model.parameters())} parameters")
     
-    # Train model
-    training_history = train_model_improved(model, data, args.epochs)
+    # Mini-batch and partitioned modes bound memory by batch size instead of graph size
+    runner = None
+    with profiler.phase('build_runner'):
+        if args.partitions:
+            runner = ClusterBatchRunner(model, data, args.partitions, args.clusters_per_batch,
+                                        args.halo_hops, dataset_path=args.data_path)
+        elif args.batch_size:
+            runner = MiniBatchRunner(model, data, args.batch_size, args.fanout)
+    
+    # Train model, unless this dataset and config already have a registered one
+    run = RegistryRun(args, 'improved', lambda: dataset_digest(args.data_path))
+    training_history = run.train_or_restore(model, lambda: train_model_improved(model, data, args.epochs, runner, profiler))
     
     # Evaluate model
-    evaluation_results = evaluate_model_improved(model, data)
+    with profiler.phase('evaluate'):
+        evaluation_results = evaluate_model_improved(model, data, runner)
+    run.store(model, {'test_accuracy': evaluation_results['test_accuracy'], 'history': training_history})
     
     # Save predictions
-    output_path = os.path.join(args.output_dir, 'improved_graphsage_predictions.json')
+    output_path = os.path.join(args.output_dir, 'improved_graphsage_predictions.gspred')
     os.makedirs(args.output_dir, exist_ok=True)
     
-    save_predictions(
-        evaluation_results['predictions'],
-        output_path,
-        {
-            'test_accuracy': float(evaluation_results['test_accuracy']),
-            'num_nodes': int(data.num_nodes),
-            'num_edges': int(data.num_edges),
-            'num_features': int(data.num_node_features),
-            'num_classes': int(data.y.max().item() + 1),
-            'best_val_acc': float(training_history['best_val_acc'])
-        }
-    )
+    with profiler.phase('save'):
+        save_predictions(
+            evaluation_results['probabilities'],
+            output_path,
+            {
+                'test_accuracy': float(evaluation_results['test_accuracy']),
+                'source_path': os.path.abspath(args.data_path),
+                'num_nodes': int(data.num_nodes),
+                'num_edges': int(data.num_edges),
+                'num_features': int(data.num_node_features),
+                'num_classes': int(data.y.max().item() + 1),
+                'best_val_acc': float(training_history['best_val_acc'])
+            },
+            data.node_id.numpy()
+        )
+    
+    profiler.close(test_accuracy=evaluation_results['test_accuracy'], num_nodes=data.num_nodes, num_edges=data.num_edges)
     
     print(f"\n🎉 Improved GraphSAGE training complete!")
     print(f"📁 Predictions saved to: {output_path}")
@@ -7,7 +7,6 @@ Trains a model to classify nodes as:
 - 2: split Y/T intersection (should be split)
 """
 
-import json
 import torch
 import torch.nn.functional as F
 from torch_geometric.nn import SAGEConv
@@ -24,12 +23,22 @@ import os
 # Add the project root to the path so we can import our modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
+from graph_preprocess import load_canonical_arrays
+from feature_normalization import FeatureNormalizer, fit_normalizer, dataset_feature_stats
+from minibatch import MiniBatchRunner
+from cluster_partition import ClusterBatchRunner, DEFAULT_CLUSTERS_PER_BATCH
+from training_profiler import NULL_PROFILER, add_profile_args, profiler_from_args
+from model_registry import RegistryRun, add_registry_args, dataset_digest
+from prediction_artifact import write_prediction_artifact
+
 class GraphSAGEModel(torch.nn.Module):
     """GraphSAGE model for node classification."""
     
     def __init__(self, num_features, hidden_dim=64, num_classes=3, num_layers=2):
         super(GraphSAGEModel, self).__init__()
         self.num_layers = num_layers
+        # Standardizes the raw features; statistics are saved with the weights
+        self.normalizer = FeatureNormalizer(num_features)
         self.convs = torch.nn.ModuleList()
         
         # First layer
@@ -45,6 +54,7 @@ class GraphSAGEModel(torch.nn.Module):
         self.dropout = torch.nn.Dropout(0.5)
         
     def forward(self, x, edge_index):
+        x = self.normalizer(x)
         for i, conv in enumerate(self.convs[:-1]):
             x = conv(x, edge_index)
             x = F.relu(x)
@@ -53,72 +63,88 @@ class GraphSAGEModel(torch.nn.Module):
         x = self.convs[-1](x, edge_index)
         return F.log_softmax(x, dim=1)
 
-def load_graphsage_data(json_path):
-    """Load GraphSAGE data from JSON file."""
+def load_graphsage_data(json_path, profiler=NULL_PROFILER):
+    """Load GraphSAGE data from a JSON export or binary dataset."""
     print(f"Loading GraphSAGE data from {json_path}")
     
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    
-    # Convert to PyTorch tensors
-    x = torch.tensor(data['x'], dtype=torch.float)
-    edge_index = torch.tensor(data['edge_index'], dtype=torch.long).view(2, -1)
-    y = torch.tensor(data['y'], dtype=torch.long)
-    
-    # Create masks
-    train_mask = torch.tensor(data['train_mask'], dtype=torch.bool)
-    val_mask = torch.tensor(data['val_mask'], dtype=torch.bool)
-    test_mask = torch.tensor(data['test_mask'], dtype=torch.bool)
+    # Memory-mapped arrays with the canonical edge list (both built once and cached)
+    with profiler.phase('load_dataset'):
+        arrays, metadata = load_canonical_arrays(json_path)
     
-    # Create PyTorch Geometric Data object
-    graph_data = Data(x=x, edge_index=edge_index, y=y)
-    graph_data.train_mask = train_mask
-    graph_data.val_mask = val_mask
-    graph_data.test_mask = test_mask
+    with profiler.phase('build_tensors'):
+        # Wrap as PyTorch tensors without copying
+        x = torch.from_numpy(arrays['x'])
+        edge_index = torch.from_numpy(arrays['edge_index'])
+        y = torch.from_numpy(arrays['y'])
+        
+        # Create masks
+        train_mask = torch.from_numpy(arrays['train_mask'])
+        val_mask = torch.from_numpy(arrays['val_mask'])
+        test_mask = torch.from_numpy(arrays['test_mask'])
+        
+        # Create PyTorch Geometric Data object
+        graph_data = Data(x=x, edge_index=edge_index, y=y)
+        graph_data.train_mask = train_mask
+        graph_data.val_mask = val_mask
+        graph_data.test_mask = test_mask
+        graph_data.indptr = torch.from_numpy(arrays['indptr'])
+        graph_data.node_id = torch.from_numpy(arrays['node_id']) if 'node_id' in arrays else torch.arange(len(y))
     
-    print(f"Loaded graph with {data['metadata']['num_nodes']} nodes and {data['metadata']['num_edges']} edges")
-    print(f"Features: {data['metadata']['num_features']}")
+    print(f"Loaded graph with {graph_data.num_nodes} nodes and {graph_data.num_edges} edges")
+    print(f"Features: {metadata['num_features']}")
     print(f"Training samples: {train_mask.sum().item()}")
     print(f"Validation samples: {val_mask.sum().item()}")
     print(f"Test samples: {test_mask.sum().item()}")
     
-    return graph_data, data['metadata']
+    return graph_data, metadata
 
-def train_model(model, data, optimizer, epochs=200):
-    """Train the GraphSAGE model."""
+def train_model(model, data, optimizer, epochs=200, runner=None, profiler=NULL_PROFILER):
+    """Train the GraphSAGE model (on neighbor-sampled mini-batches if a runner is given)."""
     model.train()
     
     train_losses = []
     val_accuracies = []
     
     for epoch in range(epochs):
-        optimizer.zero_grad()
-        out = model(data.x, data.edge_index)
-        loss = F.nll_loss(out[data.train_mask], data.y[data.train_mask])
-        loss.backward()
-        optimizer.step()
+        profiler.start_epoch()
+        if runner is not None:
+            with profiler.phase('train_batches'):
+                loss = runner.train_epoch(optimizer, F.nll_loss)
+        else:
+            optimizer.zero_grad()
+            with profiler.phase('forward'):
+                out = model(data.x, data.edge_index)
+                loss = F.nll_loss(out[data.train_mask], data.y[data.train_mask])
+            with profiler.phase('backward'):
+                loss.backward()
+            with profiler.phase('optimizer'):
+                optimizer.step()
         
         # Validation
         model.eval()
-        with torch.no_grad():
-            val_out = model(data.x, data.edge_index)
-            val_pred = val_out[data.val_mask].argmax(dim=1)
+        with torch.no_grad(), profiler.phase('validation'):
+            if runner is not None:
+                val_pred = runner.predict(data.val_mask).argmax(dim=1)
+            else:
+                val_out = model(data.x, data.edge_index)
+                val_pred = val_out[data.val_mask].argmax(dim=1)
             val_acc = (val_pred == data.y[data.val_mask]).float().mean()
             val_accuracies.append(val_acc.item())
         
         model.train()
         train_losses.append(loss.item())
+        profiler.end_epoch(epoch, data.num_nodes, loss=train_losses[-1], val_acc=val_accuracies[-1])
         
         if epoch % 20 == 0:
             print(f'Epoch {epoch:03d}, Loss: {loss:.4f}, Val Acc: {val_acc:.4f}')
     
     return train_losses, val_accuracies
 
-def evaluate_model(model, data):
+def evaluate_model(model, data, runner=None):
     """Evaluate the trained model."""
     model.eval()
     with torch.no_grad():
-        out = model(data.x, data.edge_index)
+        out = runner.predict() if runner is not None else model(data.x, data.edge_index)
         pred = out.argmax(dim=1)
         
         # Test set evaluation
@@ -138,7 +164,8 @@ def evaluate_model(model, data):
         print("\nConfusion Matrix:")
         print(cm)
         
-        return pred, test_acc
+        # The model outputs log-probabilities
+        return pred, test_acc, out.exp()
 
 def plot_training_history(train_losses, val_accuracies, output_dir):
     """Plot training history."""
@@ -177,45 +204,49 @@ def plot_confusion_matrix(y_true, y_pred, output_dir):
     plt.savefig(os.path.join(output_dir, 'confusion_matrix.png'), dpi=300, bbox_inches='tight')
     plt.close()
 
-def save_predictions(predictions, metadata, output_path):
-    """Save predictions to JSON file."""
-    pred_data = {
-        'predictions': predictions.tolist(),
-        'metadata': metadata,
-        'class_mapping': {
-            0: 'keep',
-            1: 'merge_degree_2', 
-            2: 'split_y_t_intersection'
-        }
-    }
-    
-    with open(output_path, 'w') as f:
-        json.dump(pred_data, f, indent=2)
+def save_predictions(probabilities, metadata, output_path, node_ids=None):
+    """Save class probabilities as a prediction artifact."""
+    write_prediction_artifact(
+        str(output_path),
+        np.asarray(probabilities),
+        None if node_ids is None else np.asarray(node_ids),
+        metadata,
+        class_names=['keep', 'merge_degree_2', 'split_y_t_intersection']
+    )
     
     print(f"Predictions saved to {output_path}")
 
 def main():
     parser = argparse.ArgumentParser(description='Train GraphSAGE model for intersection classification')
-    parser.add_argument('--data', required=True, help='Path to GraphSAGE JSON data file')
+    parser.add_argument('--data', required=True, help='Path to GraphSAGE JSON data file or binary dataset')
     parser.add_argument('--output', default='./output', help='Output directory for results')
     parser.add_argument('--epochs', type=int, default=200, help='Number of training epochs')
     parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
     parser.add_argument('--lr', type=float, default=0.01, help='Learning rate')
     parser.add_argument('--weight-decay', type=float, default=5e-4, help='Weight decay')
+    parser.add_argument('--batch-size', type=int, default=None, help='Train on neighbor-sampled mini-batches of this many seed nodes (default: full graph)')
+    parser.add_argument('--fanout', type=int, nargs='+', default=None, help='Neighbors sampled per hop in mini-batch mode, last value repeats (-1 = all)')
+    parser.add_argument('--partitions', type=int, default=None, help='Train on groups of this many spatial clusters instead (partition cached per dataset)')
+    parser.add_argument('--clusters-per-batch', type=int, default=DEFAULT_CLUSTERS_PER_BATCH, help='Spatial clusters per step in partitioned mode')
+    parser.add_argument('--halo-hops', type=int, default=1, help='Hops of neighbors outside the clusters included as halo in partitioned mode')
+    add_registry_args(parser)
+    add_profile_args(parser)
     
     args = parser.parse_args()
     
     # Create output directory
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
+    profiler = profiler_from_args(args, str(output_dir))
     
     # Load data
-    data, metadata = load_graphsage_data(args.data)
+    data, metadata = load_graphsage_data(args.data, profiler)
     
     # Create model
     num_features = data.x.size(1)
     num_classes = len(torch.unique(data.y))
     model = GraphSAGEModel(num_features, args.hidden_dim, num_classes)
+    fit_normalizer(model, dataset_feature_stats(args.data))
     
     print(f"Model created with {num_features} input features and {num_classes} classes")
     print(f"Model parameters: {sum(p.numel() for p in model.parameters())}")
@@ -223,26 +254,43 @@ def main():
     # Setup training
     optimizer = torch.optim.Adam(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
     
-    # Train model
-    print("Starting training...")
-    train_losses, val_accuracies = train_model(model, data, optimizer, args.epochs)
+    # Mini-batch and partitioned modes bound memory by batch size instead of graph size
+    runner = None
+    with profiler.phase('build_runner'):
+        if args.partitions:
+            runner = ClusterBatchRunner(model, data, args.partitions, args.clusters_per_batch,
+                                        args.halo_hops, dataset_path=args.data)
+        elif args.batch_size:
+            runner = MiniBatchRunner(model, data, args.batch_size, args.fanout)
+    
+    # Train model, unless this dataset and config already have a registered one
+    run = RegistryRun(args, 'intersection', lambda: dataset_digest(args.data))
+    train_losses, val_accuracies = run.train_or_restore(
+        model, lambda: train_model(model, data, optimizer, args.epochs, runner, profiler))
     
     # Evaluate model
     print("\nEvaluating model...")
-    predictions, test_acc = evaluate_model(model, data)
+    with profiler.phase('evaluate'):
+        predictions, test_acc, probabilities = evaluate_model(model, data, runner)
+    run.store(model, {'test_accuracy': float(test_acc), 'history': [train_losses, val_accuracies]})
     
     # Save results
     print(f"\nSaving results to {output_dir}")
     
-    # Save model
-    torch.save(model.state_dict(), output_dir / 'model.pth')
-    
-    # Save predictions
-    save_predictions(predictions, metadata, output_dir / 'predictions.json')
+    with profiler.phase('save'):
+        # Save model
+        torch.save(model.state_dict(), output_dir / 'model.pth')
+        
+        # Save predictions
+        save_predictions(probabilities, {**metadata, 'source_path': os.path.abspath(args.data)},
+                         output_dir / 'predictions.gspred', data.node_id)
     
     # Plot results
-    plot_training_history(train_losses, val_accuracies, output_dir)
-    plot_confusion_matrix(data.y[data.test_mask], predictions[data.test_mask], output_dir)
+    with profiler.phase('plots'):
+        plot_training_history(train_losses, val_accuracies, output_dir)
+        plot_confusion_matrix(data.y[data.test_mask], predictions[data.test_mask], output_dir)
+    
+    profiler.close(test_accuracy=float(test_acc), num_nodes=data.num_nodes, num_edges=data.num_edges)
     
     print(f"\nTraining completed!")
     print(f"Final test accuracy: {test_acc:.4f}")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Multi-Region GraphSAGE Training
+
+Trains one shared intersection model on many GraphSAGE exports (one per
+region or bbox subdivision) in a single run. Regions are read from their
+memory-mapped binary datasets by DataLoader workers and packed as disjoint
+graphs into mini-batches, with each region's edge indices offset by the
+number of nodes packed before it.
+
+Usage:
+    python scripts/graphsage/train_multi_region.py <export.json | dataset.graphsage>... [--regions-per-batch 8]
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch_geometric.data import Data
+from torch_geometric.loader import DataLoader
+from sklearn.metrics import classification_report
+
+from graph_dataset import dataset_dir_for
+from graph_preprocess import load_canonical_arrays
+from feature_normalization import RunningStats, fit_normalizer, dataset_feature_stats
+from train_intersection_graphsage import GraphSAGEModel, save_predictions
+
+class RegionDataset(torch.utils.data.Dataset):
+    """One graph per export, loaded from its binary dataset on access"""
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths)
+        self.dataset_paths = []
+        self.metadata = []
+        self.num_nodes = []
+        self.feature_stats = []
+        self.num_classes = 0
+
+        # Convert JSON exports and build canonical graphs up front so workers only ever memory-map
+        for path in self.paths:
+            arrays, metadata = load_canonical_arrays(path)
+            self.dataset_paths.append(dataset_dir_for(path))
+            self.metadata.append(metadata)
+            self.feature_stats.append(dataset_feature_stats(path, verbose=False))
+            self.num_nodes.append(len(arrays['y']))
+            if len(arrays['y']):
+                self.num_classes = max(self.num_classes, int(arrays['y'].max()) + 1)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, idx: int) -> Data:
+        # The canonical graph has no edges pointing outside the region, which
+        # after packing would silently connect to nodes of a different region
+        arrays, _ = load_canonical_arrays(self.dataset_paths[idx], verbose=False)
+
+        data = Data(
+            x=torch.from_numpy(np.array(arrays['x'])),
+            edge_index=torch.from_numpy(np.array(arrays['edge_index'])),
+            y=torch.from_numpy(np.array(arrays['y']))
+        )
+        data.train_mask = torch.from_numpy(np.array(arrays['train_mask']))
+        data.val_mask = torch.from_numpy(np.array(arrays['val_mask']))
+        data.test_mask = torch.from_numpy(np.array(arrays['test_mask']))
+        data.node_id = torch.from_numpy(np.array(arrays['node_id'])) if 'node_id' in arrays else torch.arange(data.num_nodes)
+        data.region = torch.tensor([idx])
+        return data
+
+def region_loader(dataset: torch.utils.data.Dataset, regions_per_batch: int, shuffle: bool,
+                  num_workers: int) -> DataLoader:
+    """Pack regions into disjoint-graph batches (edge indices offset per region)"""
+    return DataLoader(
+        dataset,
+        batch_size=regions_per_batch,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0
+    )
+
+def train_epoch(model, loader: DataLoader, optimizer) -> float:
+    """One pass over all packed batches; returns the mean loss per training node"""
+    model.train()
+    total_loss = 0.0
+    total_nodes = 0
+    for batch in loader:
+        num_train = int(batch.train_mask.sum())
+        if num_train == 0:
+            continue
+        optimizer.zero_grad()
+        out = model(batch.x, batch.edge_index)
+        loss = F.nll_loss(out[batch.train_mask], batch.y[batch.train_mask])
+        loss.backward()
+        optimizer.step()
+        total_loss += loss.item() * num_train
+        total_nodes += num_train
+    return total_loss / max(total_nodes, 1)
+
+def predict_regions(model, loader: DataLoader) -> Dict[int, Data]:
+    """Predictions for every region, split back out of the packed batches"""
+    model.eval()
+    results = {}
+    with torch.no_grad():
+        for batch in loader:
+            # The model outputs log-probabilities
+            probabilities = model(batch.x, batch.edge_index).exp()
+            pred = probabilities.argmax(dim=1)
+            for i in range(batch.num_graphs):
+                nodes = batch.batch == i
+                results[int(batch.region[i])] = Data(
+                    pred=pred[nodes],
+                    probabilities=probabilities[nodes],
+                    node_id=batch.node_id[nodes],
+                    y=batch.y[nodes],
+                    val_mask=batch.val_mask[nodes],
+                    test_mask=batch.test_mask[nodes]
+                )
+    return results
+
+def masked_accuracy(results: Dict[int, Data], mask_name: str) -> float:
+    """Accuracy over the masked nodes of all regions"""
+    correct = 0
+    total = 0
+    for result in results.values():
+        mask = result[mask_name] if mask_name else torch.ones_like(result.y, dtype=torch.bool)
+        correct += int((result.pred[mask] == result.y[mask]).sum())
+        total += int(mask.sum())
+    return correct / max(total, 1)
+
+def split_regions(num_regions: int, holdout: int) -> Tuple[List[int], List[int]]:
+    """Training regions and the trailing `holdout` regions kept unseen"""
+    if holdout >= num_regions:
+        raise ValueError(f"--holdout {holdout} leaves no regions to train on")
+    return list(range(num_regions - holdout)), list(range(num_regions - holdout, num_regions))
+
+def main():
+    parser = argparse.ArgumentParser(description='Train one GraphSAGE model on many regions at once')
+    parser.add_argument('data_paths', nargs='+', help='GraphSAGE JSON exports or binary datasets, one per region')
+    parser.add_argument('--output', default='./output', help='Output directory for results')
+    parser.add_argument('--epochs', type=int, default=200, help='Number of training epochs')
+    parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
+    parser.add_argument('--lr', type=float, default=0.01, help='Learning rate')
+    parser.add_argument('--weight-decay', type=float, default=5e-4, help='Weight decay')
+    parser.add_argument('--regions-per-batch', type=int, default=8, help='Regions packed into each mini-batch')
+    parser.add_argument('--num-workers', type=int, default=min(4, os.cpu_count() or 1), help='DataLoader worker processes reading regions')
+    parser.add_argument('--holdout', type=int, default=0, help='Keep the last N regions out of training and report them separately')
+
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Load regions
+    print(f"📁 Preparing {len(args.data_paths)} regions...")
+    dataset = RegionDataset(args.data_paths)
+    print(f"✅ {len(dataset)} regions, {sum(dataset.num_nodes)} nodes in total")
+
+    train_regions, holdout_regions = split_regions(len(dataset), args.holdout)
+    train_set = torch.utils.data.Subset(dataset, train_regions)
+    train_loader = region_loader(train_set, args.regions_per_batch, True, args.num_workers)
+    eval_loader = region_loader(dataset, args.regions_per_batch, False, args.num_workers)
+
+    # Create model
+    sample = dataset[0]
+    num_features = sample.x.size(1)
+    model = GraphSAGEModel(num_features, args.hidden_dim, dataset.num_classes)
+    # Statistics of the training regions only, so held-out regions test transfer honestly
+    stats = RunningStats(num_features)
+    for region in train_regions:
+        stats.merge(dataset.feature_stats[region])
+    fit_normalizer(model, stats)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+
+    print(f"🏗️  Model created with {sum(p.numel() for p in model.parameters())} parameters")
+    print(f"🚀 Training on {len(train_regions)} regions, {args.regions_per_batch} per batch, "
+          f"{args.num_workers} loader workers...")
+
+    start = time.time()
+    for epoch in range(args.epochs):
+        loss = train_epoch(model, train_loader, optimizer)
+        if epoch % 20 == 0 or epoch == args.epochs - 1:
+            results = predict_regions(model, eval_loader)
+            train_results = {i: results[i] for i in train_regions}
+            print(f"Epoch {epoch:03d}, Loss: {loss:.4f}, Val Acc: {masked_accuracy(train_results, 'val_mask'):.4f}")
+    print(f"✅ Trained in {time.time() - start:.1f}s")
+
+    # Evaluate model
+    results = predict_regions(model, eval_loader)
+    train_results = {i: results[i] for i in train_regions}
+    test_acc = masked_accuracy(train_results, 'test_mask')
+    print(f"\n📊 Test Accuracy (training regions): {test_acc:.4f}")
+    if holdout_regions:
+        holdout_results = {i: results[i] for i in holdout_regions}
+        print(f"📊 Accuracy on {len(holdout_regions)} unseen regions: {masked_accuracy(holdout_results, None):.4f}")
+
+    test_true = torch.cat([r.y[r.test_mask] for r in train_results.values()])
+    test_pred = torch.cat([r.pred[r.test_mask] for r in train_results.values()])
+    print("\n📋 Classification Report:")
+    print(classification_report(test_true, test_pred, zero_division=0))
+
+    # Save model and per-region predictions
+    torch.save(model.state_dict(), output_dir / 'model.pth')
+    predictions_dir = output_dir / 'predictions'
+    predictions_dir.mkdir(exist_ok=True)
+    for idx, path in enumerate(dataset.paths):
+        name = Path(path.rstrip(os.sep)).stem
+        region_metadata = {
+            **dataset.metadata[idx],
+            'source_path': path,
+            'holdout': idx in holdout_regions
+        }
+        save_predictions(results[idx].probabilities, region_metadata, predictions_dir / f"{idx:03d}-{name}.gspred",
+                         results[idx].node_id)
+
+    print(f"\n🎉 Multi-region training complete!")
+    print(f"💾 Model saved to: {output_dir / 'model.pth'}")
+    print(f"📁 Predictions saved to: {predictions_dir}")
+
+if __name__ == '__main__':
+    main()
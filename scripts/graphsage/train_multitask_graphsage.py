@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Multi-Task GraphSAGE: Node and Edge Labels in One Pass
+
+GraphSAGEDataPreparationService labels both nodes (keep / merge degree-2 /
+split Y/T) and edges (valid / should merge / should delete). This trainer
+fits one model with a shared GraphSAGE encoder and two heads: a node
+classifier, and an edge classifier over the embeddings of each edge's two
+endpoints. One forward pass produces both prediction sets. The node
+predictions are written as a prediction artifact (prediction_artifact.py) and
+the edge predictions, keyed by their endpoint node ids, as a matching .npz
+next to it. With --schema both are also written back to PostGIS in one
+transaction: graphsage_predictions and graphsage_edge_predictions.
+
+The edge head scores every undirected edge of the canonical graph once,
+from (h_u + h_v, |h_u - h_v|), so its output does not depend on the edge's
+direction. Edge labels come from the export's `edge_y` array. Edges are
+split into train / validation / test sets at random, using the node
+split's ratios.
+
+Usage:
+    python scripts/graphsage/train_multitask_graphsage.py <export.json | dataset.graphsage>
+    python scripts/graphsage/train_multitask_graphsage.py <export.json> --schema carthorse_staging --user carthorse
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, Any, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from sklearn.metrics import classification_report
+from torch_geometric.data import Data
+from torch_geometric.nn import GraphSAGE
+
+from graph_dataset import load_graph_arrays
+from graph_preprocess import load_canonical_arrays, canonical_edge_labels, edge_index_format
+from feature_normalization import FeatureNormalizer, fit_normalizer, dataset_feature_stats
+from model_registry import RegistryRun, add_registry_args, dataset_digest
+from prediction_artifact import write_prediction_artifact
+from train_graphsage_direct import psycopg2, write_edge_predictions, write_predictions
+
+NODE_CLASS_NAMES = ['Keep as-is', 'Merge degree-2', 'Split Y/T']
+EDGE_CLASS_NAMES = ['Valid', 'Should merge', 'Should delete']
+
+def split_masks(count: int, train_ratio: float, val_ratio: float, seed: int) -> Tuple[torch.Tensor, ...]:
+    """Random train / validation / test masks over `count` items"""
+    order = np.random.default_rng(seed).permutation(count)
+    train_end = int(round(count * train_ratio))
+    val_end = train_end + int(round(count * val_ratio))
+    masks = []
+    for part in (order[:train_end], order[train_end:val_end], order[val_end:]):
+        mask = torch.zeros(count, dtype=torch.bool)
+        mask[torch.from_numpy(part)] = True
+        masks.append(mask)
+    return tuple(masks)
+
+def load_multitask_data(path: str, seed: int = 0) -> Data:
+    """Load a dataset with its canonical graph and one labeled row per undirected edge"""
+    print(f"📁 Loading GraphSAGE data from: {path}")
+    arrays, _ = load_canonical_arrays(path)
+    exported, metadata = load_graph_arrays(path)
+    if 'edge_y' not in exported:
+        raise ValueError(f"{path} has no edge labels (edge_y); re-export it with exportToJSON")
+
+    num_nodes = len(arrays['x'])
+    edge_pairs, edge_y = canonical_edge_labels(exported['edge_index'], exported['edge_y'], num_nodes,
+                                               exported.get('node_id'), edge_index_format(metadata, exported))
+    data = Data(
+        x=torch.from_numpy(arrays['x']),
+        edge_index=torch.from_numpy(arrays['edge_index']),
+        y=torch.from_numpy(arrays['y']),
+        train_mask=torch.from_numpy(arrays['train_mask']),
+        val_mask=torch.from_numpy(arrays['val_mask']),
+        test_mask=torch.from_numpy(arrays['test_mask'])
+    )
+    # Without node_id the predictions can only be keyed by row
+    data.has_node_ids = 'node_id' in arrays
+    data.node_id = torch.from_numpy(np.asarray(arrays['node_id'])) if data.has_node_ids else torch.arange(num_nodes)
+    data.edge_pairs = torch.from_numpy(edge_pairs)
+    data.edge_y = torch.from_numpy(edge_y)
+
+    # Edge split with the same ratios as the exported node split
+    train_ratio = float(data.train_mask.float().mean())
+    val_ratio = float(data.val_mask.float().mean())
+    data.edge_train_mask, data.edge_val_mask, data.edge_test_mask = split_masks(len(edge_y), train_ratio, val_ratio, seed)
+
+    print(f"✅ Loaded graph with {data.num_nodes} nodes and {len(edge_y)} undirected edges")
+    print(f"   • Features: {data.num_node_features}")
+    print(f"   • Node classes: {data.y.max().item() + 1}, edge classes: {int(edge_y.max()) + 1 if len(edge_y) else 0}")
+    print(f"   • Edge labels: {np.bincount(edge_y, minlength=len(EDGE_CLASS_NAMES)).tolist()}")
+    return data
+
+class MultiTaskGraphSAGEModel(torch.nn.Module):
+    """Shared GraphSAGE encoder with a node classification head and an edge classification head"""
+
+    def __init__(self, num_features: int, num_classes: int, num_edge_classes: int, hidden_dim: int = 64):
+        super(MultiTaskGraphSAGEModel, self).__init__()
+
+        # Standardizes the raw features; statistics are saved with the weights
+        self.normalizer = FeatureNormalizer(num_features)
+        self.encoder = GraphSAGE(num_features, hidden_dim, num_layers=2)
+        self.node_head = torch.nn.Linear(hidden_dim, num_classes)
+        self.edge_head = torch.nn.Sequential(
+            torch.nn.Linear(2 * hidden_dim, hidden_dim),
+            torch.nn.ReLU(),
+            torch.nn.Linear(hidden_dim, num_edge_classes)
+        )
+        self.dropout = torch.nn.Dropout(0.5)
+
+    def forward(self, x, edge_index, edge_pairs):
+        x = self.normalizer(x)
+        h = self.dropout(F.relu(self.encoder(x, edge_index)))
+
+        # Symmetric in the two endpoints
+        u, v = h[edge_pairs[0]], h[edge_pairs[1]]
+        edge_features = torch.cat([u + v, (u - v).abs()], dim=1)
+        return self.node_head(h), self.edge_head(edge_features)
+
+def train_model(model: MultiTaskGraphSAGEModel, data: Data, epochs: int = 100, lr: float = 0.01,
+                weight_decay: float = 5e-4, edge_weight: float = 1.0) -> Dict[str, Any]:
+    """Train both heads on the sum of the node loss and the weighted edge loss"""
+    print(f"🚀 Training multi-task GraphSAGE model for {epochs} epochs...")
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+    train_losses, val_accuracies, edge_val_accuracies = [], [], []
+
+    model.train()
+    for epoch in range(epochs):
+        optimizer.zero_grad()
+        node_out, edge_out = model(data.x, data.edge_index, data.edge_pairs)
+        loss = F.cross_entropy(node_out[data.train_mask], data.y[data.train_mask])
+        if data.edge_train_mask.any():
+            loss = loss + edge_weight * F.cross_entropy(edge_out[data.edge_train_mask], data.edge_y[data.edge_train_mask])
+        loss.backward()
+        optimizer.step()
+
+        if epoch % 10 == 0:
+            model.eval()
+            with torch.no_grad():
+                node_out, edge_out = model(data.x, data.edge_index, data.edge_pairs)
+                val_acc = (node_out[data.val_mask].argmax(dim=1) == data.y[data.val_mask]).float().mean()
+                edge_val_acc = (edge_out[data.edge_val_mask].argmax(dim=1) == data.edge_y[data.edge_val_mask]).float().mean()
+
+            train_losses.append(loss.item())
+            val_accuracies.append(val_acc.item())
+            edge_val_accuracies.append(edge_val_acc.item())
+            print(f"Epoch {epoch:3d}: Loss={loss.item():.4f}, Node Val Acc={val_acc.item():.4f}, "
+                  f"Edge Val Acc={edge_val_acc.item():.4f}")
+            model.train()
+
+    return {
+        'train_losses': train_losses,
+        'val_accuracies': val_accuracies,
+        'edge_val_accuracies': edge_val_accuracies
+    }
+
+def report(true: torch.Tensor, pred: torch.Tensor, names) -> str:
+    labels = sorted(set(true.tolist()) | set(pred.tolist()))
+    return classification_report(true.numpy(), pred.numpy(), labels=labels, zero_division=0,
+                                 target_names=[names[i] if i < len(names) else f"Class {i}" for i in labels])
+
+def evaluate_model(model: MultiTaskGraphSAGEModel, data: Data) -> Dict[str, Any]:
+    """Node and edge predictions with confidences from a single forward pass"""
+    print("📊 Evaluating model...")
+
+    model.eval()
+    with torch.no_grad():
+        node_out, edge_out = model(data.x, data.edge_index, data.edge_pairs)
+        node_prob, edge_prob = F.softmax(node_out, dim=1), F.softmax(edge_out, dim=1)
+        node_conf, node_pred = node_prob.max(dim=1)
+        edge_conf, edge_pred = edge_prob.max(dim=1)
+
+    test_acc = (node_pred[data.test_mask] == data.y[data.test_mask]).float().mean().item()
+    edge_test_acc = (edge_pred[data.edge_test_mask] == data.edge_y[data.edge_test_mask]).float().mean().item()
+    print(f"✅ Node Test Accuracy: {test_acc:.4f}")
+    print(f"✅ Edge Test Accuracy: {edge_test_acc:.4f}")
+
+    print("\n📋 Node Classification Report:")
+    print(report(data.y[data.test_mask], node_pred[data.test_mask], NODE_CLASS_NAMES))
+    print("📋 Edge Classification Report:")
+    print(report(data.edge_y[data.edge_test_mask], edge_pred[data.edge_test_mask], EDGE_CLASS_NAMES))
+
+    return {
+        'test_accuracy': test_acc,
+        'edge_test_accuracy': edge_test_acc,
+        'probabilities': node_prob.numpy(),
+        'predictions': node_pred.numpy(),
+        'confidences': node_conf.numpy(),
+        'edge_probabilities': edge_prob.numpy(),
+        'edge_predictions': edge_pred.numpy(),
+        'edge_confidences': edge_conf.numpy()
+    }
+
+def save_predictions(results: Dict[str, Any], data: Data, output_path: str, edge_output_path: str,
+                     metadata: Dict[str, Any]):
+    """Write node predictions as a prediction artifact and edge predictions, keyed by endpoint node ids, as .npz"""
+    print(f"💾 Saving predictions to: {output_path}")
+
+    node_ids = data.node_id.numpy()
+    metadata = {
+        **metadata,
+        'model_type': 'MultiTaskGraphSAGE',
+        'edge_predictions': os.path.basename(edge_output_path),
+        'prediction_timestamp': __import__('datetime').datetime.now().isoformat()
+    }
+    write_prediction_artifact(output_path, results['probabilities'], node_ids, metadata,
+                              predictions=results['predictions'])
+    np.savez(edge_output_path,
+             source=node_ids[data.edge_pairs[0].numpy()],
+             target=node_ids[data.edge_pairs[1].numpy()],
+             prediction=results['edge_predictions'].astype(np.uint8),
+             probabilities=results['edge_probabilities'].astype(np.float16))
+
+    print("✅ Predictions saved!")
+
+def save_predictions_to_db(results: Dict[str, Any], data: Data, schema: str, db_config: Dict[str, Any],
+                           atomic_swap: bool = False):
+    """Write node and edge predictions to PostGIS in one transaction"""
+    print(f"💾 Saving node and edge predictions to PostGIS schema: {schema}")
+
+    node_ids = data.node_id.numpy()
+    start = time.time()
+    connection = psycopg2.connect(**db_config)
+    try:
+        write_edge_predictions(connection, schema, node_ids[data.edge_pairs[0].numpy()],
+                               node_ids[data.edge_pairs[1].numpy()], results['edge_predictions'],
+                               results['edge_confidences'])
+        # Commits the edge predictions along with the node predictions
+        write_predictions(connection, schema, node_ids, results['predictions'], results['confidences'], atomic_swap)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    print(f"✅ Saved {len(node_ids)} node and {len(results['edge_predictions'])} edge predictions "
+          f"to {schema} ({time.time() - start:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Train one GraphSAGE model for node and edge labels')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset (with edge_y)')
+    parser.add_argument('--epochs', type=int, default=100, help='Number of training epochs')
+    parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
+    parser.add_argument('--lr', type=float, default=0.01, help='Learning rate')
+    parser.add_argument('--weight-decay', type=float, default=5e-4, help='Weight decay')
+    parser.add_argument('--edge-weight', type=float, default=1.0, help='Weight of the edge loss relative to the node loss')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the edge train/validation/test split')
+    parser.add_argument('--output-dir', default='test-output', help='Output directory for results')
+    parser.add_argument('--schema', default=None, help='Also write node and edge predictions to this PostGIS schema')
+    parser.add_argument('--swap-predictions', action='store_true', help='Load node predictions into a new table and swap it in atomically')
+    parser.add_argument('--host', default='localhost', help='Database host')
+    parser.add_argument('--port', default='5432', help='Database port')
+    parser.add_argument('--database', default='trail_master_db', help='Database name')
+    parser.add_argument('--user', default='postgres', help='Database user')
+    parser.add_argument('--password', default=None, help='Database password (default: PGPASSWORD)')
+    add_registry_args(parser)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"❌ Data file not found: {args.data_path}")
+        return
+
+    try:
+        data = load_multitask_data(args.data_path, args.seed)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if args.schema and not data.has_node_ids:
+        print(f"❌ {args.data_path} has no node_id, so its predictions cannot be written to {args.schema}")
+        return
+
+    num_classes = int(data.y.max()) + 1
+    num_edge_classes = max(int(data.edge_y.max()) + 1 if len(data.edge_y) else 0, len(EDGE_CLASS_NAMES))
+    model = MultiTaskGraphSAGEModel(data.num_node_features, num_classes, num_edge_classes, args.hidden_dim)
+    fit_normalizer(model, dataset_feature_stats(args.data_path))
+    print(f"🏗️  Multi-task model created with {sum(p.numel() for p in model.parameters())} parameters")
+
+    # Train model, unless this dataset and config already have a registered one
+    run = RegistryRun(args, 'multitask', lambda: dataset_digest(args.data_path))
+    training_history = run.train_or_restore(model, lambda: train_model(model, data, args.epochs, args.lr, args.weight_decay, args.edge_weight))
+
+    results = evaluate_model(model, data)
+    run.store(model, {'test_accuracy': results['test_accuracy'], 'edge_test_accuracy': results['edge_test_accuracy'],
+                      'history': training_history})
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model_path = os.path.join(args.output_dir, 'multitask_graphsage_model.pth')
+    torch.save(model.state_dict(), model_path)
+    output_path = os.path.join(args.output_dir, 'multitask_graphsage_predictions.gspred')
+    edge_output_path = os.path.join(args.output_dir, 'multitask_graphsage_edge_predictions.npz')
+    save_predictions(results, data, output_path, edge_output_path, {
+        'source_path': os.path.abspath(args.data_path),
+        'test_accuracy': results['test_accuracy'],
+        'edge_test_accuracy': results['edge_test_accuracy'],
+        'num_nodes': int(data.num_nodes),
+        'num_edges': int(len(data.edge_y)),
+        'num_features': int(data.num_node_features),
+        'num_classes': num_classes,
+        'num_edge_classes': num_edge_classes
+    })
+    if args.schema:
+        save_predictions_to_db(results, data, args.schema, {
+            'host': args.host,
+            'port': args.port,
+            'database': args.database,
+            'user': args.user,
+            'password': args.password
+        }, args.swap_predictions)
+
+    print(f"\n🎉 Multi-task GraphSAGE training complete!")
+    print(f"💾 Model saved to: {model_path}")
+    print(f"📁 Node predictions saved to: {output_path}")
+    print(f"📁 Edge predictions saved to: {edge_output_path}")
+
+if __name__ == '__main__':
+    main()
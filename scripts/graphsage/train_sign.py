@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+SIGN-Style GraphSAGE Training with Precomputed Aggregations
+
+Trail networks are sparse and low-degree, so most of the time in the
+message-passing models goes into repeating the same neighbor aggregation
+every epoch. This engine computes the mean-aggregated features of 1..k hop
+neighborhoods once, as sparse matrix products [X, AX, A^2X, ...], caches
+them inside the binary dataset directory, and trains an MLP on them. An
+epoch is then a dense forward pass over the training nodes only.
+
+Usage:
+    python scripts/graphsage/train_sign.py <export.json | dataset.graphsage> [--hops 3] [--compare]
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+import torch
+import torch.nn.functional as F
+from sklearn.metrics import classification_report
+
+from graph_dataset import dataset_dir_for
+from graph_preprocess import CANONICAL_VERSION, load_canonical_arrays
+from feature_normalization import RunningStats, fit_normalizer, dataset_feature_stats
+from train_distributed import MODEL_CHOICES, build_model, load_training_graph
+from train_graphsage import save_predictions
+
+# Aggregates over the canonical graph, by canonical version and hops
+SIGN_FILE = 'sign-canonical-v{}-{}.npy'
+
+def mean_aggregation_matrix(edge_index: np.ndarray, num_nodes: int) -> sp.csr_matrix:
+    """Sparse operator averaging each node's in-neighbors (SAGEConv mean aggregation)"""
+    sources = np.asarray(edge_index[0], dtype=np.int64)
+    targets = np.asarray(edge_index[1], dtype=np.int64)
+    in_degree = np.bincount(targets, minlength=num_nodes).astype(np.float64)
+    weights = 1.0 / in_degree[targets]
+    return sp.csr_matrix((weights, (targets, sources)), shape=(num_nodes, num_nodes))
+
+def sign_features(x: np.ndarray, edge_index: np.ndarray, hops: int) -> np.ndarray:
+    """[X, AX, A^2 X, ..., A^hops X] as one float32 matrix of num_features * (hops + 1) columns"""
+    adjacency = mean_aggregation_matrix(edge_index, len(x))
+    # Missing values (e.g. NULL elevation) would spread NaN through every product
+    current = np.nan_to_num(np.asarray(x, dtype=np.float64))
+    blocks = [current]
+    for _ in range(hops):
+        current = adjacency @ current
+        blocks.append(current)
+    return np.hstack(blocks).astype(np.float32)
+
+def load_sign_features(data_path: str, hops: int) -> np.ndarray:
+    """Precomputed aggregates for a dataset, cached in its binary dataset directory"""
+    cache_path = os.path.join(dataset_dir_for(data_path), SIGN_FILE.format(CANONICAL_VERSION, hops))
+    if os.path.exists(cache_path):
+        print(f"⚡ Using cached {hops}-hop aggregates: {cache_path}")
+        return np.load(cache_path, mmap_mode='r')
+
+    arrays, _ = load_canonical_arrays(data_path)
+    num_nodes = len(arrays['y'])
+
+    start = time.time()
+    features = sign_features(arrays['x'], arrays['edge_index'], hops)
+    print(f"🧮 Precomputed {hops}-hop aggregates for {num_nodes} nodes ({time.time() - start:.2f}s)")
+
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}.npy"
+    try:
+        np.save(tmp_path, features)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️  Could not cache aggregates: {e}")
+    return features
+
+class SIGNModel(torch.nn.Module):
+    """MLP over precomputed hop aggregates: one projection per hop, concatenated, then classified"""
+
+    def __init__(self, num_features: int, hops: int, num_classes: int, hidden_dim: int = 64):
+        super(SIGNModel, self).__init__()
+        self.num_features = num_features
+        self.hop_layers = torch.nn.ModuleList([torch.nn.Linear(num_features, hidden_dim) for _ in range(hops + 1)])
+        self.classifier = torch.nn.Linear(hidden_dim * (hops + 1), num_classes)
+        self.dropout = torch.nn.Dropout(0.5)
+        # Standardization fitted on the training nodes, saved with the weights
+        self.register_buffer('mean', torch.zeros(num_features * (hops + 1)))
+        self.register_buffer('std', torch.ones(num_features * (hops + 1)))
+
+    def fit_normalization(self, features: torch.Tensor):
+        self.mean.copy_(features.mean(dim=0))
+        self.std.copy_(features.std(dim=0).clamp_min(1e-6))
+
+    def forward(self, features):
+        features = (features - self.mean) / self.std
+        hops = features.split(self.num_features, dim=1)
+        x = torch.cat([F.relu(layer(h)) for layer, h in zip(self.hop_layers, hops)], dim=1)
+        x = self.dropout(x)
+        return self.classifier(x)
+
+def train_sign(model: SIGNModel, features: torch.Tensor, data, epochs: int, lr: float,
+               weight_decay: float) -> Dict[str, Any]:
+    """Full-batch training on the training rows of the precomputed features"""
+    print(f"🚀 Training SIGN model for {epochs} epochs...")
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+    train_x = features[data.train_mask]
+    train_y = data.y[data.train_mask]
+    val_x = features[data.val_mask]
+    val_y = data.y[data.val_mask]
+
+    start = time.time()
+    for epoch in range(epochs):
+        model.train()
+        optimizer.zero_grad()
+        loss = F.cross_entropy(model(train_x), train_y)
+        loss.backward()
+        optimizer.step()
+
+        if epoch % 20 == 0:
+            model.eval()
+            with torch.no_grad():
+                val_acc = (model(val_x).argmax(dim=1) == val_y).float().mean()
+            print(f"Epoch {epoch:3d}: Loss={loss.item():.4f}, Val Acc={val_acc.item():.4f}")
+
+    train_time = time.time() - start
+    return {'train_time': train_time, 'epoch_time': train_time / max(epochs, 1)}
+
+def train_message_passing(name: str, data, epochs: int, hidden_dim: int, lr: float,
+                          weight_decay: float, stats: Optional[RunningStats] = None) -> Tuple[torch.Tensor, float]:
+    """Baseline: one of the message-passing trainers' models, trained full-batch"""
+    print(f"🚀 Training message-passing '{name}' model for {epochs} epochs...")
+    num_classes = int(data.y.max()) + 1
+    model, criterion = build_model(name, data.num_node_features, num_classes, hidden_dim)
+    fit_normalizer(model, stats, verbose=False)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+
+    start = time.time()
+    for _ in range(epochs):
+        model.train()
+        optimizer.zero_grad()
+        out = model(data.x, data.edge_index)
+        loss = criterion(out[data.train_mask], data.y[data.train_mask])
+        loss.backward()
+        optimizer.step()
+    epoch_time = (time.time() - start) / max(epochs, 1)
+
+    model.eval()
+    with torch.no_grad():
+        predictions = model(data.x, data.edge_index).argmax(dim=1)
+    return predictions, epoch_time
+
+def test_accuracy(predictions: torch.Tensor, data) -> float:
+    return (predictions[data.test_mask] == data.y[data.test_mask]).float().mean().item()
+
+def main():
+    parser = argparse.ArgumentParser(description='Train an MLP on precomputed multi-hop aggregates (SIGN)')
+    parser.add_argument('data_path', help='Path to GraphSAGE JSON data file or binary dataset')
+    parser.add_argument('--hops', type=int, default=3, help='Number of aggregation hops to precompute')
+    parser.add_argument('--epochs', type=int, default=200, help='Number of training epochs')
+    parser.add_argument('--hidden-dim', type=int, default=64, help='Hidden dimension size')
+    parser.add_argument('--lr', type=float, default=0.01, help='Learning rate')
+    parser.add_argument('--weight-decay', type=float, default=5e-4, help='Weight decay')
+    parser.add_argument('--compare', nargs='*', choices=MODEL_CHOICES, default=None,
+                        help='Also train these message-passing models and compare (default: graphsage)')
+    parser.add_argument('--output-dir', default='test-output', help='Output directory for results')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"❌ Data file not found: {args.data_path}")
+        return
+
+    # Load data and precomputed aggregates
+    data = load_training_graph(args.data_path)
+    features = torch.from_numpy(np.ascontiguousarray(load_sign_features(args.data_path, args.hops)))
+    num_classes = int(data.y.max()) + 1
+    print(f"✅ {data.num_nodes} nodes, {features.size(1)} aggregate features ({args.hops} hops)")
+
+    # Create and train model
+    model = SIGNModel(data.num_node_features, args.hops, num_classes, args.hidden_dim)
+    model.fit_normalization(features[data.train_mask])
+    print(f"🏗️  SIGN model created with {sum(p.numel() for p in model.parameters())} parameters")
+    timing = train_sign(model, features, data, args.epochs, args.lr, args.weight_decay)
+
+    # Evaluate model
+    model.eval()
+    with torch.no_grad():
+        probabilities = F.softmax(model(features), dim=1)
+        predictions = probabilities.argmax(dim=1)
+    sign_acc = test_accuracy(predictions, data)
+    print(f"✅ Test Accuracy: {sign_acc:.4f}")
+    print("\n📋 Classification Report:")
+    print(classification_report(data.y[data.test_mask].numpy(), predictions[data.test_mask].numpy(), zero_division=0))
+
+    # Compare with message-passing models
+    comparison = [('sign', sign_acc, timing['epoch_time'])]
+    if args.compare is not None:
+        for name in args.compare or ['graphsage']:
+            mp_predictions, epoch_time = train_message_passing(name, data, args.epochs, args.hidden_dim,
+                                                               args.lr, args.weight_decay,
+                                                               dataset_feature_stats(args.data_path))
+            comparison.append((name, test_accuracy(mp_predictions, data), epoch_time))
+
+        print("\n📊 Test accuracy vs message passing:")
+        print(f"   {'model':<16} {'test acc':>8} {'ms/epoch':>9} {'speedup':>8}")
+        for name, accuracy, epoch_time in comparison:
+            speedup = epoch_time / timing['epoch_time'] if timing['epoch_time'] > 0 else float('inf')
+            print(f"   {name:<16} {accuracy:>8.4f} {epoch_time * 1000:>9.2f} {speedup:>7.1f}x")
+
+    # Save model and predictions
+    os.makedirs(args.output_dir, exist_ok=True)
+    torch.save(model.state_dict(), os.path.join(args.output_dir, 'sign_model.pth'))
+    output_path = os.path.join(args.output_dir, 'sign_graphsage_predictions.gspred')
+    save_predictions(
+        probabilities.numpy(),
+        output_path,
+        {
+            'test_accuracy': sign_acc,
+            'source_path': os.path.abspath(args.data_path),
+            'num_nodes': int(data.num_nodes),
+            'num_edges': int(data.num_edges),
+            'num_features': int(data.num_node_features),
+            'num_classes': num_classes,
+            'hops': args.hops,
+            'engine': 'sign',
+            'comparison': {name: {'test_accuracy': acc, 'epoch_time': t} for name, acc, t in comparison}
+        },
+        data.node_id.numpy()
+    )
+
+    print(f"\n🎉 SIGN training complete!")
+    print(f"⏱️  {timing['epoch_time'] * 1000:.2f} ms/epoch")
+    print(f"📁 Predictions saved to: {output_path}")
+
+if __name__ == '__main__':
+    main()
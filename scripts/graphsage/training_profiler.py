@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Training Profiler for the GraphSAGE Scripts
+
+Times the phases of a training run (dataset load, tensor building, forward,
+backward, optimizer step, validation, evaluation, saving), tracks peak RSS
+and per-epoch throughput, and appends everything as JSON lines to
+training_profile.jsonl next to the predictions. Each run gets a run_id so
+successive runs in the same output directory can be compared. Optionally a
+few epochs are captured with torch.profiler as Chrome traces.
+
+A disabled profiler (the default when --profile is not given) makes every
+call a no-op, so the trainers can keep their instrumentation in place.
+
+Usage:
+    python scripts/graphsage/train_intersection_graphsage.py --data data.json --output output --profile
+    python scripts/graphsage/training_profiler.py output/training_profile.jsonl --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import torch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_FILENAME = 'training_profile.jsonl'
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _synchronize():
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        torch.cuda.synchronize()
+
+class TrainingProfiler:
+    """Phase timers, peak RSS and nodes/sec for one training run"""
+
+    def __init__(self, output_dir: Optional[str], enabled: bool = True, run_info: Optional[Dict[str, Any]] = None,
+                 trace_epochs: int = 0):
+        self.enabled = enabled and output_dir is not None
+        self.path = os.path.join(output_dir, PROFILE_FILENAME) if output_dir else None
+        self.output_dir = output_dir
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.epochs: List[Dict[str, Any]] = []
+        self._epoch_phases: Optional[Dict[str, float]] = None
+        self._epoch_start = 0.0
+        self._torch_profiler = None
+
+        if not self.enabled:
+            return
+        os.makedirs(output_dir, exist_ok=True)
+        self._write({
+            'type': 'run',
+            'script': os.path.basename(sys.argv[0]),
+            'started': datetime.now().isoformat(),
+            'torch_version': torch.__version__,
+            'threads': torch.get_num_threads(),
+            **(run_info or {})
+        })
+
+        if trace_epochs > 0:
+            # Skip one epoch, warm up on the next, then record `trace_epochs` epochs
+            self._torch_profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU],
+                schedule=torch.profiler.schedule(wait=1, warmup=1, active=trace_epochs, repeat=1),
+                on_trace_ready=self._save_trace,
+                record_shapes=True
+            )
+            self._torch_profiler.start()
+
+    def _write(self, record: Dict[str, Any]):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'run_id': self.run_id, **record}) + '\n')
+
+    def _save_trace(self, prof):
+        trace_path = os.path.join(self.output_dir, f"torch_trace_{self.run_id}.json")
+        prof.export_chrome_trace(trace_path)
+        ops = sorted(prof.key_averages(), key=lambda op: op.self_cpu_time_total, reverse=True)[:15]
+        self._write({
+            'type': 'torch_ops',
+            'trace': trace_path,
+            'ops': [{'name': op.key, 'calls': op.count, 'self_cpu_ms': op.self_cpu_time_total / 1000,
+                     'cpu_ms': op.cpu_time_total / 1000} for op in ops]
+        })
+        print(f"🔍 torch.profiler trace saved to: {trace_path}")
+
+    @contextmanager
+    def _timed(self, name: str):
+        label = torch.profiler.record_function(name) if self._torch_profiler is not None else nullcontext()
+        start = time.perf_counter()
+        with label:
+            yield
+        _synchronize()
+        elapsed = time.perf_counter() - start
+        self.totals[name] += elapsed
+        self.calls[name] += 1
+        if self._epoch_phases is not None:
+            self._epoch_phases[name] += elapsed
+
+    def phase(self, name: str):
+        """Context manager timing one phase; phases inside an epoch are also reported per epoch"""
+        return self._timed(name) if self.enabled else nullcontext()
+
+    def start_epoch(self):
+        if self.enabled:
+            self._epoch_phases = defaultdict(float)
+            self._epoch_start = time.perf_counter()
+
+    def end_epoch(self, epoch: int, num_nodes: int, **metrics):
+        """Record one epoch; nodes/sec counts graph nodes per second of epoch wall time"""
+        if not self.enabled:
+            return
+        _synchronize()
+        seconds = time.perf_counter() - self._epoch_start
+        record = {
+            'type': 'epoch',
+            'epoch': epoch,
+            'seconds': seconds,
+            'phases': dict(self._epoch_phases),
+            'nodes_per_sec': num_nodes / max(seconds, 1e-9),
+            'peak_rss_mb': peak_rss_mb(),
+            **{key: float(value) for key, value in metrics.items() if value is not None}
+        }
+        self._epoch_phases = None
+        self.epochs.append(record)
+        self._write(record)
+        if self._torch_profiler is not None:
+            self._torch_profiler.step()
+
+    def close(self, **results) -> Optional[Dict[str, Any]]:
+        """Write the run summary and print a phase breakdown"""
+        if not self.enabled:
+            return None
+        if self._torch_profiler is not None:
+            self._torch_profiler.stop()
+            self._torch_profiler = None
+
+        total = time.perf_counter() - self.started
+        throughput = [epoch['nodes_per_sec'] for epoch in self.epochs]
+        summary = {
+            'type': 'summary',
+            'total_seconds': total,
+            'phases': {name: {'seconds': self.totals[name], 'calls': self.calls[name]} for name in self.totals},
+            'epochs': len(self.epochs),
+            'mean_epoch_seconds': sum(epoch['seconds'] for epoch in self.epochs) / max(len(self.epochs), 1),
+            'mean_nodes_per_sec': sum(throughput) / max(len(throughput), 1),
+            'peak_rss_mb': peak_rss_mb(),
+            **results
+        }
+        self._write(summary)
+
+        print(f"\n⏱️  Profile ({total:.2f}s total, peak RSS {summary['peak_rss_mb'] or 0:.0f} MB):")
+        for name, seconds in sorted(self.totals.items(), key=lambda item: item[1], reverse=True):
+            print(f"   • {name:<16} {seconds:>8.3f}s {100 * seconds / max(total, 1e-9):>5.1f}%  ({self.calls[name]} calls)")
+        if throughput:
+            print(f"   • {summary['mean_nodes_per_sec']:.0f} nodes/sec per epoch on average")
+        print(f"💾 Profile appended to: {self.path}")
+        return summary
+
+def add_profile_args(parser: argparse.ArgumentParser):
+    """The --profile / --profile-trace options shared by the trainers"""
+    parser.add_argument('--profile', action='store_true', help='Record phase timings, peak RSS and nodes/sec to training_profile.jsonl in the output directory')
+    parser.add_argument('--profile-trace', type=int, default=0, metavar='EPOCHS', help='With --profile, also capture this many epochs with torch.profiler')
+
+def profiler_from_args(args: argparse.Namespace, output_dir: str) -> TrainingProfiler:
+    """Profiler for a trainer run, enabled by --profile"""
+    return TrainingProfiler(output_dir, enabled=args.profile, run_info={'args': vars(args)},
+                            trace_epochs=args.profile_trace)
+
+# Default for functions whose profiler argument is optional
+NULL_PROFILER = TrainingProfiler(None, enabled=False)
+
+def load_runs(path: str) -> List[Dict[str, Any]]:
+    """Summaries of the runs in a profile file, oldest first, with their run record merged in"""
+    runs: Dict[str, Dict[str, Any]] = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record['type'] in ('run', 'summary'):
+                runs.setdefault(record['run_id'], {}).update(record)
+    return [run for run in runs.values() if 'total_seconds' in run]
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+                 min_seconds: float = 0.0) -> List[str]:
+    """Phases (and the total) that got more than `threshold` and `min_seconds` slower, as printable lines"""
+    regressions = []
+    pairs = [('total', baseline['total_seconds'], current['total_seconds'])]
+    pairs += [(name, baseline['phases'][name]['seconds'], stats['seconds'])
+              for name, stats in current['phases'].items() if name in baseline['phases']]
+    for name, before, after in pairs:
+        if before > 0 and (after - before) / before > threshold and after - before > min_seconds:
+            regressions.append(f"{name}: {before:.3f}s -> {after:.3f}s (+{100 * (after - before) / before:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize training profiles and flag regressions between runs')
+    parser.add_argument('profile', help='training_profile.jsonl written by a trainer run with --profile')
+    parser.add_argument('--runs', type=int, default=5, help='Number of most recent runs to show')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown vs the previous run of the same script that counts as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='Ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    runs = load_runs(args.profile)
+    if not runs:
+        print(f"❌ No completed runs in {args.profile}")
+        sys.exit(1)
+
+    print(f"📊 {len(runs)} runs in {args.profile}:")
+    print(f"   {'run':<12} {'script':<34} {'total':>8} {'epoch':>8} {'nodes/sec':>10} {'RSS MB':>8}")
+    for run in runs[-args.runs:]:
+        print(f"   {run['run_id']:<12} {run.get('script', '?'):<34} {run['total_seconds']:>7.2f}s "
+              f"{run['mean_epoch_seconds']:>7.3f}s {run['mean_nodes_per_sec']:>10.0f} {run['peak_rss_mb'] or 0:>8.0f}")
+
+    latest = runs[-1]
+    previous = [run for run in runs[:-1] if run.get('script') == latest.get('script')]
+    if not previous:
+        return
+    regressions = compare_runs(previous[-1], latest, args.threshold, args.min_seconds)
+    if regressions:
+        print(f"\n⚠️  Run {latest['run_id']} is slower than {previous[-1]['run_id']}:")
+        for line in regressions:
+            print(f"   • {line}")
+        sys.exit(1)
+    print(f"\n✅ No phase of run {latest['run_id']} more than {args.threshold:.0%} slower than {previous[-1]['run_id']}")
+
+if __name__ == '__main__':
+    main()
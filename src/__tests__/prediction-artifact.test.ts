@@ -0,0 +1,54 @@
+import * as fs from 'fs';
+import * as os from 'os';
+import * as path from 'path';
+import { isPredictionArtifact, readPredictionArtifact } from '../services/graphsage/PredictionArtifact';
+
+// predictions.gspred was written by scripts/graphsage/prediction_artifact.py:
+//   write_prediction_artifact(path, probabilities, node_ids=[7, 42, 2**53 - 1, -3, 1024],
+//                             metadata={'model': 'fixture', 'num_nodes': 5})
+// with probabilities that float16 stores exactly
+const FIXTURE = path.join(__dirname, 'fixtures', 'graphsage', 'predictions.gspred');
+
+describe('PredictionArtifact', () => {
+  test('should read the columns written by prediction_artifact.py', () => {
+    const artifact = readPredictionArtifact(FIXTURE);
+
+    expect(artifact.numNodes).toBe(5);
+    expect(artifact.numClasses).toBe(3);
+    expect(artifact.nodeIds).toEqual([7, 42, Number.MAX_SAFE_INTEGER, -3, 1024]);
+    expect(Array.from(artifact.predictions)).toEqual([0, 1, 2, 0, 2]);
+    expect(artifact.probabilities.map(column => Array.from(column))).toEqual([
+      [0.75, 0.25, 0, 0.5, 0.125],
+      [0.125, 0.5, 0.0625, 0.25, 0.125],
+      [0.125, 0.25, 0.9375, 0.25, 0.75]
+    ]);
+    expect(Array.from(artifact.confidences)).toEqual([0.75, 0.5, 0.9375, 0.5, 0.75]);
+  });
+
+  test('should read class names and metadata from the sidecar', () => {
+    const artifact = readPredictionArtifact(FIXTURE);
+
+    expect(artifact.classNames).toEqual(['keep', 'merge_degree_2', 'split_y_t_intersection']);
+    expect(artifact.metadata).toEqual({ model: 'fixture', num_nodes: 5 });
+  });
+
+  test('should recognise artifacts by their suffix', () => {
+    expect(isPredictionArtifact(FIXTURE)).toBe(true);
+    expect(isPredictionArtifact('graphsage_predictions.json')).toBe(false);
+  });
+
+  test('should reject files that are not artifacts or are truncated', () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'gspred-'));
+    try {
+      const notArtifact = path.join(dir, 'predictions.gspred');
+      fs.writeFileSync(notArtifact, JSON.stringify({ predictions: [0, 1, 2] }));
+      expect(() => readPredictionArtifact(notArtifact)).toThrow('Not a GraphSAGE prediction artifact');
+
+      const truncated = path.join(dir, 'truncated.gspred');
+      fs.writeFileSync(truncated, fs.readFileSync(FIXTURE).subarray(0, 90));
+      expect(() => readPredictionArtifact(truncated)).toThrow('Truncated prediction artifact');
+    } finally {
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+});
@@ -13,13 +13,20 @@ async function main() {
 
   // Parse command line arguments
   const args = process.argv.slice(2);
-  const predictionsPath = args[0] || 'test-output/high_confidence_graphsage_predictions.json';
-  const confidenceThreshold = parseFloat(args[1]) || 0.98;
+  const serverIndex = args.indexOf('--server');
+  const serverUrl = serverIndex >= 0 ? args[serverIndex + 1] : undefined;
+  const positional = args.filter((arg, i) => !arg.startsWith('--') && (serverIndex < 0 || i !== serverIndex + 1));
+  const fromDatabase = args.includes('--from-db') || serverUrl !== undefined;
+  const predictionsPath = fromDatabase
+    ? undefined
+    : positional[0] || 'test-output/high_confidence_graphsage_predictions.gspred';
+  const positionalOffset = fromDatabase ? 0 : 1;
+  const confidenceThreshold = parseFloat(positional[positionalOffset]) || 0.98;
   const dryRun = args.includes('--dry-run');
-  const snapTolerance = parseFloat(args[2]) || 10.0;
-  const minSplitDistance = parseFloat(args[3]) || 1.0;
+  const snapTolerance = parseFloat(positional[positionalOffset + 1]) || 10.0;
+  const minSplitDistance = parseFloat(positional[positionalOffset + 2]) || 1.0;
 
-  console.log(`📁 Predictions file: ${predictionsPath}`);
+  console.log(`📁 Predictions: ${predictionsPath || serverUrl || 'carthorse_staging.graphsage_predictions'}`);
   console.log(`🎯 Confidence threshold: ${confidenceThreshold}`);
   console.log(`🔧 Snap tolerance: ${snapTolerance}m`);
   console.log(`📏 Min split distance: ${minSplitDistance}m`);
@@ -50,7 +57,8 @@ async function main() {
       confidence_threshold: confidenceThreshold,
       dry_run: dryRun,
       snapToleranceMeters: snapTolerance,
-      minSplitDistanceMeters: minSplitDistance
+      minSplitDistanceMeters: minSplitDistance,
+      inferenceServerUrl: serverUrl
     };
 
     // Create and run the cleaning service
@@ -321,6 +321,7 @@ export class CoordinateBasedGraphSAGEDataPreparationService {
         num_features: 5, // x, y, z, degree, avg_incident_edge_length
         schema: this.config.stagingSchema,
         coordinate_based: true,
+        edge_index: 'rows', // edge_index holds row positions
         generated_at: new Date().toISOString()
       }
     };
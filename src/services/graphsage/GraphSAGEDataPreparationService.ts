@@ -309,6 +309,12 @@ export class GraphSAGEDataPreparationService {
       // Node labels
       y: data.node_labels.map(label => Number(label.label)),
       
+      // Vertex ids, so predictions can be mapped back to routing nodes
+      node_id: data.nodes.map(node => Number(node.id)),
+      
+      // Edge labels, aligned with edge_index (generateEdgeLabels walks the edges in order)
+      edge_y: data.edge_labels.map(label => Number(label.label)),
+      
       // Masks
       train_mask: data.train_mask,
       val_mask: data.val_mask,
@@ -319,6 +325,7 @@ export class GraphSAGEDataPreparationService {
         num_nodes: data.nodes.length,
         num_edges: data.edges.length,
         num_features: 5, // x, y, z, degree, avg_incident_edge_length
+        edge_index: 'vertex_ids', // edge_index holds node_id values, not row positions
         schema: this.config.stagingSchema,
         generated_at: new Date().toISOString()
       }
@@ -1,6 +1,7 @@
 import { Pool } from 'pg';
 import { YIntersectionSplittingService } from '../layer1/YIntersectionSplittingService';
 import { PointSnapAndSplitService } from '../layer1/PointSnapAndSplitService';
+import { PREDICTION_ARTIFACT_SUFFIX, isPredictionArtifact, readPredictionArtifact } from './PredictionArtifact';
 
 export interface GraphSAGEDrivenCleaningConfig {
   stagingSchema: string;
@@ -8,6 +9,7 @@ export interface GraphSAGEDrivenCleaningConfig {
   dry_run: boolean;
   snapToleranceMeters?: number;
   minSplitDistanceMeters?: number;
+  inferenceServerUrl?: string; // e.g. http://127.0.0.1:8765 or unix:/tmp/graphsage.sock
 }
 
 export interface GraphSAGEDrivenCleaningResult {
@@ -43,28 +45,239 @@ export class GraphSAGEDrivenNetworkCleaningService {
   }
 
   /**
-   * Load GraphSAGE predictions from JSON file
+   * Load GraphSAGE predictions from a prediction artifact (.gspred) or a legacy JSON file
    */
   async loadPredictionsFromFile(predictionsPath: string): Promise<any[]> {
     console.log('🔍 Loading GraphSAGE predictions from file...');
     
+    if (isPredictionArtifact(predictionsPath)) {
+      // Artifacts name nodes by the vertex ids of the export they were made on.
+      // apply_predictions.py checks those ids and coordinates against the schema,
+      // remaps re-noded vertices by position and loads the result into graphsage_predictions.
+      if (!this.config.dry_run) {
+        this.applyPredictionArtifact(predictionsPath, ['--swap-predictions']);
+        return this.loadPredictionsFromDatabase();
+      }
+      
+      // A dry run leaves graphsage_predictions alone and reads the mapping from a temporary artifact
+      const fs = require('fs');
+      const os = require('os');
+      const path = require('path');
+      const tmpDir = fs.mkdtempSync(path.join(os.tmpdir(), 'graphsage-'));
+      try {
+        const mappedPath = path.join(tmpDir, `mapped${PREDICTION_ARTIFACT_SUFFIX}`);
+        this.applyPredictionArtifact(predictionsPath, ['--dry-run', '--output', mappedPath]);
+        return this.loadSplitsFromArtifact(mappedPath);
+      } finally {
+        fs.rmSync(tmpDir, { recursive: true, force: true });
+      }
+    }
+    
     const fs = require('fs');
     const predictions = JSON.parse(fs.readFileSync(predictionsPath, 'utf8'));
     
+    // Files from prediction_artifact.py to-json carry vertex ids and confidences; older
+    // files only have predictions in row order
+    const nodeIds: number[] | undefined = predictions.node_ids;
+    const confidences: Array<number | null> | undefined = predictions.confidences;
+    if (!nodeIds) {
+      console.warn('⚠️  Predictions file has no node_ids, using row positions as vertex ids');
+    }
+    await this.checkPredictionVertices(nodeIds || predictions.predictions.map((_: number, i: number) => i));
+    
     // Filter by confidence threshold
     const filteredPredictions = predictions.predictions
-      .map((prediction: number, nodeId: number) => ({
-        node_id: nodeId,
+      .map((prediction: number, i: number) => ({
+        node_id: nodeIds ? nodeIds[i] : i,
         prediction: prediction,
-        confidence: 1.0 // We don't have confidence scores in the current predictions
+        confidence: confidences ? (confidences[i] ?? 0) : 1.0
       }))
-      .filter((p: any) => p.prediction === 2 && p.confidence >= this.config.confidence_threshold);
+      .filter((p: any) => p.prediction === 2 && p.confidence >= this.config.confidence_threshold)
+      .sort((a: any, b: any) => b.confidence - a.confidence || a.node_id - b.node_id);
     
     console.log(`✅ Loaded ${filteredPredictions.length} split predictions (confidence >= ${this.config.confidence_threshold})`);
     
     return filteredPredictions;
   }
 
+  /**
+   * Split predictions above the confidence threshold from an artifact keyed by the schema's vertex ids
+   */
+  private loadSplitsFromArtifact(artifactPath: string): any[] {
+    const artifact = readPredictionArtifact(artifactPath);
+    const filteredPredictions = [];
+    for (let i = 0; i < artifact.numNodes; i++) {
+      if (artifact.predictions[i] === 2 && artifact.confidences[i] >= this.config.confidence_threshold) {
+        filteredPredictions.push({
+          node_id: artifact.nodeIds[i],
+          prediction: 2,
+          confidence: artifact.confidences[i]
+        });
+      }
+    }
+    filteredPredictions.sort((a, b) => b.confidence - a.confidence || a.node_id - b.node_id);
+    
+    console.log(`✅ Loaded ${filteredPredictions.length} of ${artifact.numNodes} predictions as splits (confidence >= ${this.config.confidence_threshold})`);
+    
+    return filteredPredictions;
+  }
+
+  /**
+   * Map a prediction artifact onto the staging schema with apply_predictions.py.
+   * The password goes through PGPASSWORD rather than the command line, where ps would show it.
+   */
+  private applyPredictionArtifact(artifactPath: string, extraArgs: string[]): void {
+    const { spawnSync } = require('child_process');
+    const path = require('path');
+    const options = (this.pgClient as any).options || {};
+    const script = path.resolve(__dirname, '../../../scripts/graphsage/apply_predictions.py');
+    
+    console.log(`🔀 Applying ${artifactPath} to ${this.config.stagingSchema} with apply_predictions.py...`);
+    const result = spawnSync(process.env.PYTHON || 'python3', [
+      script, artifactPath, this.config.stagingSchema, ...extraArgs,
+      '--host', options.host || process.env.PGHOST || 'localhost',
+      '--port', String(options.port || process.env.PGPORT || '5432'),
+      '--database', options.database || process.env.PGDATABASE || 'trail_master_db',
+      '--user', options.user || process.env.PGUSER || 'postgres'
+    ], {
+      stdio: 'inherit',
+      env: { ...process.env, PGPASSWORD: options.password || process.env.PGPASSWORD || '' }
+    });
+    
+    if (result.error) {
+      throw result.error;
+    }
+    if (result.status !== 0) {
+      throw new Error(`apply_predictions.py could not apply ${artifactPath} to ${this.config.stagingSchema} (exit code ${result.status})`);
+    }
+  }
+
+  /**
+   * Refuse predictions that do not name exactly the vertices of the staging schema.
+   * JSON files carry no coordinates, so a schema that was re-noded onto the same
+   * ids cannot be detected here; use a .gspred artifact for that.
+   */
+  private async checkPredictionVertices(nodeIds: number[]): Promise<void> {
+    const result = await this.pgClient.query(`
+      SELECT
+        COUNT(*) as vertices,
+        COUNT(*) FILTER (WHERE id = ANY($1::bigint[])) as matched
+      FROM ${this.config.stagingSchema}.ways_noded_vertices_pgr
+    `, [nodeIds]);
+    
+    const vertices = parseInt(result.rows[0].vertices);
+    const matched = parseInt(result.rows[0].matched);
+    if (matched !== nodeIds.length || vertices !== nodeIds.length) {
+      throw new Error(
+        `Predictions do not match ${this.config.stagingSchema}: ${matched} of ${nodeIds.length} predicted vertices ` +
+        `found among ${vertices} vertices. Re-run inference on this schema, or apply a .gspred artifact, ` +
+        `which is remapped by position`
+      );
+    }
+  }
+
+  /**
+   * Load split predictions written by train_graphsage_direct.py from the database.
+   * Rows carry real vertex ids and softmax confidences, so the threshold is applied in SQL.
+   */
+  async loadPredictionsFromDatabase(): Promise<any[]> {
+    console.log('🔍 Loading GraphSAGE predictions from database...');
+    
+    const result = await this.pgClient.query(`
+      SELECT node_id, prediction, confidence
+      FROM ${this.config.stagingSchema}.graphsage_predictions
+      WHERE prediction = 2 AND confidence >= $1
+      ORDER BY confidence DESC, node_id
+    `, [this.config.confidence_threshold]);
+    
+    console.log(`✅ Loaded ${result.rows.length} split predictions (confidence >= ${this.config.confidence_threshold})`);
+    
+    return result.rows;
+  }
+
+  /**
+   * Request fresh predictions for the staging schema from a running inference_server.py.
+   * The server keeps the model loaded, so this costs a graph load and one forward pass.
+   */
+  async loadPredictionsFromServer(serverUrl: string): Promise<any[]> {
+    console.log(`🔍 Requesting GraphSAGE predictions from ${serverUrl}...`);
+    
+    const response = await this.postToInferenceServer(serverUrl, '/predict', { schema: this.config.stagingSchema });
+    
+    const filteredPredictions = response.predictions
+      .map((prediction: number, i: number) => ({
+        node_id: response.node_ids[i],
+        prediction: prediction,
+        confidence: response.confidences[i]
+      }))
+      .filter((p: any) => p.prediction === 2 && p.confidence >= this.config.confidence_threshold)
+      .sort((a: any, b: any) => b.confidence - a.confidence || a.node_id - b.node_id);
+    
+    console.log(`✅ Received ${response.num_nodes} predictions in ${Math.round(response.timing.load_ms + response.timing.inference_ms)}ms`);
+    console.log(`✅ Loaded ${filteredPredictions.length} split predictions (confidence >= ${this.config.confidence_threshold})`);
+    
+    return filteredPredictions;
+  }
+
+  /**
+   * Re-predict only the neighborhood of edited vertices after a split or merge.
+   * The server patches graphsage_predictions in place. changedVertexIds must include
+   * both endpoints of every added or removed edge, plus any deleted vertices.
+   */
+  async updatePredictionsIncrementally(changedVertexIds: number[], serverUrl = this.config.inferenceServerUrl): Promise<any> {
+    if (!serverUrl) {
+      throw new Error('No inference server configured (inferenceServerUrl)');
+    }
+    
+    const result = await this.postToInferenceServer(serverUrl, '/update', {
+      schema: this.config.stagingSchema,
+      changed: changedVertexIds
+    });
+    
+    console.log(`✅ Re-predicted ${result.updated} nodes around ${changedVertexIds.length} changed vertices (${Math.round(result.timing.load_ms + result.timing.inference_ms + result.timing.write_ms)}ms)`);
+    
+    return result;
+  }
+
+  /**
+   * POST a JSON payload to inference_server.py over HTTP or a unix: socket path
+   */
+  private async postToInferenceServer(serverUrl: string, path: string, payload: any): Promise<any> {
+    const http = require('http');
+    const body = JSON.stringify(payload);
+    const target = serverUrl.startsWith('unix:')
+      ? { socketPath: serverUrl.slice('unix:'.length), path }
+      : (() => {
+          const url = new URL(path, serverUrl);
+          return { hostname: url.hostname, port: url.port, path: url.pathname };
+        })();
+    
+    return new Promise((resolve, reject) => {
+      const request = http.request({
+        ...target,
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) }
+      }, (res: any) => {
+        const chunks: Buffer[] = [];
+        res.on('data', (chunk: Buffer) => chunks.push(chunk));
+        res.on('end', () => {
+          try {
+            const response = JSON.parse(Buffer.concat(chunks).toString('utf8'));
+            if (res.statusCode !== 200) {
+              reject(new Error(`Inference server error ${res.statusCode}: ${response.error}`));
+            } else {
+              resolve(response);
+            }
+          } catch (error) {
+            reject(error);
+          }
+        });
+      });
+      request.on('error', reject);
+      request.end(body);
+    });
+  }
+
   /**
    * Get node coordinates and connected trails for a specific node
    */
@@ -191,9 +404,11 @@ export class GraphSAGEDrivenNetworkCleaningService {
   }
 
   /**
-   * Apply GraphSAGE-driven network cleaning
+   * Apply GraphSAGE-driven network cleaning.
+   * Without a predictions file, predictions come from the inference server when
+   * inferenceServerUrl is set, and are read from graphsage_predictions otherwise.
    */
-  async applyGraphSAGEDrivenCleaning(predictionsPath: string): Promise<GraphSAGEDrivenCleaningResult> {
+  async applyGraphSAGEDrivenCleaning(predictionsPath?: string): Promise<GraphSAGEDrivenCleaningResult> {
     console.log('🚀 Starting GraphSAGE-driven network cleaning...');
     console.log(`   Schema: ${this.config.stagingSchema}`);
     console.log(`   Confidence threshold: ${this.config.confidence_threshold}`);
@@ -201,7 +416,11 @@ export class GraphSAGEDrivenNetworkCleaningService {
     console.log(`   Snap tolerance: ${this.config.snapToleranceMeters || 10}m`);
     console.log(`   Min split distance: ${this.config.minSplitDistanceMeters || 1.0}m`);
     
-    const predictions = await this.loadPredictionsFromFile(predictionsPath);
+    const predictions = predictionsPath
+      ? await this.loadPredictionsFromFile(predictionsPath)
+      : this.config.inferenceServerUrl
+        ? await this.loadPredictionsFromServer(this.config.inferenceServerUrl)
+        : await this.loadPredictionsFromDatabase();
     
     const result: GraphSAGEDrivenCleaningResult = {
       nodes_processed: 0,
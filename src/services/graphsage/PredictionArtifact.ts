@@ -0,0 +1,118 @@
+import * as fs from 'fs';
+
+/**
+ * Reader for the columnar prediction artifacts (`.gspred`) written by the GraphSAGE
+ * trainers (scripts/graphsage/prediction_artifact.py). Layout, little-endian:
+ *   header       32 bytes: magic 'GSPRED\0\0', uint32 version, uint32 num_classes,
+ *                uint64 num_nodes, uint64 reserved
+ *   node_id      int64   [num_nodes]
+ *   prediction   uint8   [num_nodes]   (padded to a multiple of 8 bytes)
+ *   probability  float16 [num_classes, num_nodes]
+ * Metadata and class names live in the `<path>.json` sidecar.
+ */
+
+export const PREDICTION_ARTIFACT_SUFFIX = '.gspred';
+
+const MAGIC = 'GSPRED\0\0';
+const ARTIFACT_VERSION = 1;
+const HEADER_SIZE = 32;
+
+export interface PredictionArtifact {
+  numNodes: number;
+  numClasses: number;
+  nodeIds: number[];
+  predictions: Uint8Array;
+  /** Probability of class c for row i at probabilities[c][i] */
+  probabilities: Float32Array[];
+  /** Probability of each row's predicted class */
+  confidences: Float32Array;
+  classNames: string[];
+  metadata: Record<string, any>;
+}
+
+let float16Table: Float32Array | undefined;
+
+/** Float32 value of every float16 bit pattern */
+function float16Values(): Float32Array {
+  if (!float16Table) {
+    float16Table = new Float32Array(65536);
+    for (let bits = 0; bits < 65536; bits++) {
+      const sign = bits & 0x8000 ? -1 : 1;
+      const exponent = (bits >> 10) & 0x1f;
+      const fraction = bits & 0x3ff;
+      if (exponent === 0) {
+        float16Table[bits] = sign * fraction * Math.pow(2, -24);
+      } else if (exponent === 0x1f) {
+        float16Table[bits] = fraction ? NaN : sign * Infinity;
+      } else {
+        float16Table[bits] = sign * (1 + fraction / 1024) * Math.pow(2, exponent - 15);
+      }
+    }
+  }
+  return float16Table;
+}
+
+export function isPredictionArtifact(path: string): boolean {
+  return path.endsWith(PREDICTION_ARTIFACT_SUFFIX);
+}
+
+export function readPredictionArtifact(path: string): PredictionArtifact {
+  const buffer = fs.readFileSync(path);
+  const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+
+  if (buffer.byteLength < HEADER_SIZE || buffer.toString('latin1', 0, 8) !== MAGIC) {
+    throw new Error(`Not a GraphSAGE prediction artifact: ${path}`);
+  }
+  const version = view.getUint32(8, true);
+  if (version !== ARTIFACT_VERSION) {
+    throw new Error(`Unsupported prediction artifact version ${version} in ${path}`);
+  }
+  const numClasses = view.getUint32(12, true);
+  const numNodes = Number(view.getBigUint64(16, true));
+
+  const nodeIdOffset = HEADER_SIZE;
+  const predictionOffset = nodeIdOffset + 8 * numNodes;
+  const probabilityOffset = (predictionOffset + numNodes + 7) & ~7;
+  if (buffer.byteLength < probabilityOffset + 2 * numClasses * numNodes) {
+    throw new Error(`Truncated prediction artifact: ${path}`);
+  }
+
+  const nodeIds = new Array<number>(numNodes);
+  for (let i = 0; i < numNodes; i++) {
+    nodeIds[i] = Number(view.getBigInt64(nodeIdOffset + 8 * i, true));
+  }
+  const predictions = new Uint8Array(buffer.buffer, buffer.byteOffset + predictionOffset, numNodes);
+
+  const table = float16Values();
+  const probabilities: Float32Array[] = [];
+  for (let c = 0; c < numClasses; c++) {
+    const column = new Float32Array(numNodes);
+    const start = probabilityOffset + 2 * c * numNodes;
+    for (let i = 0; i < numNodes; i++) {
+      column[i] = table[view.getUint16(start + 2 * i, true)];
+    }
+    probabilities.push(column);
+  }
+  const confidences = new Float32Array(numNodes);
+  if (numClasses > 0) {
+    for (let i = 0; i < numNodes; i++) {
+      confidences[i] = probabilities[predictions[i]][i];
+    }
+  }
+
+  let sidecar: Record<string, any> = {};
+  if (fs.existsSync(`${path}.json`)) {
+    sidecar = JSON.parse(fs.readFileSync(`${path}.json`, 'utf8'));
+  }
+
+  return {
+    numNodes,
+    numClasses,
+    nodeIds,
+    predictions,
+    probabilities,
+    confidences,
+    classNames: sidecar.class_names || [],
+    metadata: sidecar.metadata || {}
+  };
+}